@@ -0,0 +1,105 @@
+"""Benchmark for the in-memory availability index.
+
+Loads a synthetic clinic (doctors working weekdays, a few bookings per doctor
+per day) into AvailabilityIndex and times free-slot queries, cold and warm.
+No database is needed.
+
+    python benchmarks/availability_index.py --doctors 200 --days 62
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.availability import AvailabilityIndex, availability_payload
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection to feed the index's two load queries."""
+
+    def __init__(self, doctors, appointments):
+        self.results = {"doctors": doctors, "appointments": appointments}
+        self.rows = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.rows = self.results["doctors" if "FROM doctors" in sql else "appointments"]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--days", type=int, default=62, help="query range in days")
+    parser.add_argument("--bookings-per-day", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    doctors = [{
+        "doctor_id": i,
+        "first_name": "Doctor",
+        "last_name": f"#{i}",
+        "specialization": rng.choice(["Cardiology", "Dermatology", "Pediatrics"]),
+        "available_days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+        "available_hours": {"start": "08:30", "end": "16:30"},
+    } for i in range(1, args.doctors + 1)]
+    today = datetime.combine(date.today(), datetime.min.time())
+    appointments = []
+    for doctor in doctors:
+        for day in range(args.days):
+            for _ in range(args.bookings_per_day):
+                appointments.append({
+                    "appointment_id": len(appointments) + 1,
+                    "doctor_id": doctor["doctor_id"],
+                    "appointment_date": today + timedelta(days=day, hours=8, minutes=30 + 30 * rng.randrange(16)),
+                })
+
+    index = AvailabilityIndex(lambda: FakeConnection(doctors, appointments))
+    started = time.perf_counter()
+    index.ensure_loaded()
+    print(f"loaded {len(doctors)} doctors / {len(appointments)} bookings in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    query = {"from": date.today().isoformat(), "to": (date.today() + timedelta(days=args.days - 1)).isoformat()}
+    started = time.perf_counter()
+    payload = availability_payload(index, query)
+    print(f"cold: all doctors x {args.days} days in {(time.perf_counter() - started) * 1000:.1f} ms "
+          f"({sum(d['free_count'] for d in payload['doctors'])} free slots)")
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        availability_payload(index, query)
+    print(f"warm: all doctors x {args.days} days in {(time.perf_counter() - started) * 1000 / args.repeat:.1f} ms")
+
+    single = dict(query, doctor_id=str(doctors[0]["doctor_id"]))
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        availability_payload(index, single)
+    print(f"warm: one doctor x {args.days} days in {(time.perf_counter() - started) * 1000 / args.repeat:.2f} ms")
+
+    # A booking only invalidates its own doctor-day
+    index.apply(len(appointments) + 1, doctors[0]["doctor_id"], today + timedelta(days=1, hours=9))
+    started = time.perf_counter()
+    availability_payload(index, query)
+    print(f"after one booking: all doctors x {args.days} days in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
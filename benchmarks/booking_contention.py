@@ -0,0 +1,148 @@
+"""Concurrent booking benchmark.
+
+Fires hundreds of parallel bookings at a handful of slots for one doctor and
+checks that every slot was booked exactly once: the winners get 201, everyone
+else a 409 with alternatives, and the database holds no overlapping pair.
+
+Needs PostgreSQL with init_db.py applied (DB_* variables as for the apps).
+By default requests go through the patient app's POST /api/appointments, so
+start it first; --mode db runs the same INSERT straight against the database.
+
+    python benchmarks/booking_contention.py --requests 500 --slots 20
+    python benchmarks/booking_contention.py --mode db --requests 1000 --workers 64
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    "dbname": os.getenv("DB_NAME", "sehat"),
+    "user": os.getenv("DB_USER", "postgres"),
+    "password": str(os.getenv("DB_PASSWORD", "2108")),
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": os.getenv("DB_PORT", "5432"),
+}
+
+# Marks the benchmark's rows so they can be found and removed afterwards
+REASON = "booking contention benchmark"
+
+OVERLAPS_SQL = """
+    SELECT COUNT(*) FROM appointments a
+    JOIN appointments b
+      ON a.doctor_id = b.doctor_id
+     AND a.appointment_id < b.appointment_id
+     AND a.appointment_date < b.appointment_date + INTERVAL '30 minutes'
+     AND b.appointment_date < a.appointment_date + INTERVAL '30 minutes'
+    WHERE a.doctor_id = %s
+      AND COALESCE(a.status, 'scheduled') <> 'cancelled'
+      AND COALESCE(b.status, 'scheduled') <> 'cancelled'
+"""
+
+
+def book_http(url, doctor_id, slot):
+    body = json.dumps({
+        "doctor_id": doctor_id,
+        "date": slot.date().isoformat(),
+        "time": slot.strftime("%H:%M"),
+        "reason": REASON,
+    }).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except urllib.error.URLError:
+        return "unreachable"
+
+
+_local = threading.local()
+
+def book_db(doctor_id, slot):
+    # One connection per worker thread; keep --workers under the server's max_connections
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO appointments (patient_id, doctor_id, appointment_date, reason) "
+                "VALUES (1, %s, %s, %s)",
+                (doctor_id, slot, REASON)
+            )
+        conn.commit()
+        return 201
+    except psycopg2.errors.ExclusionViolation:
+        conn.rollback()
+        return 409
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["http", "db"], default="http")
+    parser.add_argument("--url", default="http://localhost:5001/api/appointments")
+    parser.add_argument("--doctor", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=500, help="total booking attempts")
+    parser.add_argument("--workers", type=int, default=200, help="parallel clients")
+    parser.add_argument("--slots", type=int, default=20, help="distinct 30 minute slots contended for")
+    parser.add_argument("--date", default=(date.today() + timedelta(days=90)).isoformat())
+    parser.add_argument("--keep", action="store_true", help="leave the benchmark's appointments in place")
+    args = parser.parse_args()
+
+    first = datetime.fromisoformat(args.date).replace(hour=0, minute=0)
+    slots = [first + timedelta(minutes=30 * i) for i in range(args.slots)]
+    attempts = [slots[i % len(slots)] for i in range(args.requests)]
+
+    def attempt(slot):
+        if args.mode == "http":
+            return book_http(args.url, args.doctor, slot)
+        return book_db(args.doctor, slot)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = Counter(pool.map(attempt, attempts))
+    elapsed = time.monotonic() - started
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM appointments WHERE doctor_id = %s AND reason = %s "
+                "AND appointment_date >= %s AND appointment_date < %s",
+                (args.doctor, REASON, first, slots[-1] + timedelta(minutes=30))
+            )
+            stored = cur.fetchone()[0]
+            cur.execute(OVERLAPS_SQL, (args.doctor,))
+            overlaps = cur.fetchone()[0]
+            if not args.keep:
+                cur.execute("DELETE FROM appointments WHERE reason = %s", (REASON,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"{args.requests} bookings for {args.slots} slots from {args.workers} clients ({args.mode}) "
+          f"in {elapsed:.2f}s = {args.requests / elapsed:.0f} req/s")
+    print(f"  responses: {dict(results)}")
+    print(f"  rows stored: {stored} (expected {args.slots})")
+    print(f"  overlapping pairs: {overlaps}")
+    if overlaps or stored != args.slots or results.get(201, 0) != args.slots:
+        print("❌ double booking or lost booking detected")
+        sys.exit(1)
+    print("✅ every slot booked exactly once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Micro-benchmark for JSON responses built from database rows.
+
+Builds RealDictCursor-style rows (datetimes, dates, Decimals, JSONB lists) and
+times turning them into a response body three ways:
+
+  loop+default  the old way: .isoformat() on every row, then Flask's default provider
+  default       Flask's default provider on the raw rows (datetimes as HTTP dates)
+  fast          shared.json_provider.FastJSONProvider (orjson when installed)
+
+No database is needed.
+
+    python benchmarks/json_serialization.py --rows 10000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.json_provider import FastJSONProvider, orjson
+
+
+def make_rows(count):
+    rng = random.Random(7)
+    start = datetime(2025, 1, 1, 8, 0)
+    return [{
+        "appointment_id": i,
+        "appointment_date": start + timedelta(minutes=30 * i),
+        "status": rng.choice(["scheduled", "completed", "cancelled"]),
+        "reason": "Follow-up visit for blood pressure review",
+        "patient_id": rng.randint(1, 5000),
+        "patient_first_name": "Nur",
+        "patient_last_name": "Aisyah",
+        "dob": date(1960, 1, 1) + timedelta(days=rng.randint(0, 20000)),
+        "fee": Decimal("25.50"),
+        "reminder_times": ["08:00", "20:00"],
+        "created_at": start - timedelta(days=rng.randint(0, 365)),
+    } for i in range(count)]
+
+
+def old_way(provider, rows):
+    converted = []
+    for row in rows:
+        row = dict(row)
+        for key in ("appointment_date", "dob", "created_at"):
+            if row[key]:
+                row[key] = row[key].isoformat()
+        row["fee"] = float(row["fee"])
+        converted.append(row)
+    return provider.response(converted).get_data()
+
+
+def time_it(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    rows = make_rows(args.rows)
+
+    with app.app_context():
+        results = [
+            ("loop+default", lambda: old_way(default, rows)),
+            ("default", lambda: default.response(rows).get_data()),
+            ("fast", lambda: fast.response(rows).get_data()),
+        ]
+        print(f"{args.rows} rows, median of {args.repeat} runs "
+              f"(fast provider uses {'orjson' if orjson else 'stdlib json'})")
+        baseline = None
+        for name, fn in results:
+            ms, size = time_it(fn, args.repeat)
+            baseline = baseline or ms
+            print(f"  {name:<13} {ms:8.1f} ms  {size / 1024:8.0f} KB  {baseline / ms:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Load test for the chat gateway using the local stub backend.
+
+Fires more concurrent chat calls than the gateway admits and reports how many
+were answered, how many degraded to the fallback reply, and the gateway's
+latency/queue metrics. No API key or database is needed.
+
+    python benchmarks/llm_gateway_load.py --clients 64 --latency 0.5
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.llm_gateway import LLMGateway, StubBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64, help="concurrent callers")
+    parser.add_argument("--requests", type=int, default=256, help="total chat calls")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub model latency (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="gateway max_concurrency")
+    parser.add_argument("--queue", type=int, default=16, help="gateway max_queue")
+    parser.add_argument("--timeout", type=float, default=5.0, help="gateway per-call timeout (s)")
+    args = parser.parse_args()
+
+    gateway = LLMGateway(
+        StubBackend(latency=args.latency),
+        max_concurrency=args.concurrency,
+        max_queue=args.queue,
+        timeout=args.timeout,
+    )
+
+    def call(i):
+        started = time.monotonic()
+        reply = gateway.reply(f"User's question: benchmark question {i}")
+        return reply.degraded, time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        results = list(pool.map(call, range(args.requests)))
+    elapsed = time.monotonic() - started
+
+    degraded = [t for d, t in results if d]
+    answered = [t for d, t in results if not d]
+    print(f"{args.requests} calls from {args.clients} clients in {elapsed:.2f}s")
+    print(f"  answered: {len(answered)}  (slowest {max(answered, default=0):.3f}s)")
+    print(f"  degraded: {len(degraded)}  (slowest {max(degraded, default=0):.3f}s)")
+    stats = gateway.stats()
+    print(f"  gateway: rejected_busy={stats['rejected_busy']} timeouts={stats['timeouts']} "
+          f"circuit={stats['circuit']} latency={stats['latency_seconds']}")
+
+
+if __name__ == "__main__":
+    main()
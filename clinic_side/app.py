@@ -6,8 +6,33 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 import google.generativeai as genai
 import re, json, random
-from datetime import datetime
-import bcrypt
+from datetime import datetime, timedelta
+import sys
+import threading
+
+# Make the shared/ helpers importable when running `python app.py` from this folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.db_pool import create_pool
+from shared.cache import TTLCache
+from shared.pagination import (
+    BadPageRequest, KeysetPage, paginated_response, parse_date_from, parse_date_to
+)
+from shared.streaming import requested_stream_format, stream_query
+from shared.live import ChangeListener, EventBroker, format_sse, sse_response
+from shared.assistant import (
+    create_response_cache, reply_frames, response_cache_key, stream_chat
+)
+from shared.llm_gateway import GatewayUnavailable, create_gateway
+from shared.conversation import MAX_MESSAGE_TOKENS, clip, create_conversation_store
+from shared.availability import AvailabilityIndex, BadAvailabilityRequest, availability_payload, conflict_payload
+from shared.bulk_import import BadImportRequest, detect_format, read_records, run_import
+from shared.passwords import HashingUnavailable, create_password_hasher
+from shared.patient_detail import patient_detail_response
+from shared.response_layer import install_response_layer
+from shared.json_provider import install_json_provider
+from shared.read_routing import create_read_router, install_read_your_writes, note_primary_checkout, read_db_config, wrote_recently
+from shared.metrics import TimedConnection, install_metrics, instrument_pool
+from shared.slow_queries import create_slow_query_log
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -19,6 +44,14 @@ CORS(app, supports_credentials=True, origins=[
     "http://127.0.0.1:5001", "http://localhost:5001"
 ])
 
+# /metrics: per-route latency, status counts and DB timings (installed first so it times the other hooks)
+install_metrics(app)
+
+# Compression, ETags and content-hashed static URLs for every response
+install_response_layer(app)
+# jsonify through orjson; datetimes, Decimals and JSONB values need no per-row conversion
+install_json_provider(app)
+
 
 # ---------- Gemini AI Configuration ----------
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -27,6 +60,23 @@ if GEMINI_API_KEY:
 else:
     print("⚠️ Gemini API key not found. The AI chat feature will be disabled.")
 
+CHAT_MODEL_NAME = 'gemini-1.5-flash'
+# Bump CHAT_PROMPT_VERSION whenever the template changes so cached answers are not reused
+CHAT_PROMPT_VERSION = 2
+CHAT_PROMPT_TEMPLATE = "You are a helpful AI assistant for a clinic.\n{history}User asks: '{user_message}'"
+
+# Answers to repeated questions, keyed on (prompt version, normalized message)
+chat_cache = create_response_cache()
+
+# All model calls go through the gateway (LLM_BACKEND=stub runs a local fake model)
+chat_gateway = create_gateway(CHAT_MODEL_NAME)
+
+# Recent turns per conversation, trimmed to a token budget before they go in the prompt
+chat_memory = create_conversation_store()
+
+# New patients' passwords are hashed on a process pool instead of the request thread
+password_hasher = create_password_hasher()
+
 # ---------- Database Configuration ----------
 DB_CONFIG = {
     "dbname": os.getenv("DB_NAME", "sehat"),
@@ -36,20 +86,57 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT", "5432")
 }
 
+db_pool = create_pool(DB_CONFIG, cursor_factory=RealDictCursor, connection_factory=TimedConnection)
+instrument_pool("primary", db_pool)
+
+# Dashboard, listing and detail GETs read from DB_READ_HOST when it is set. A
+# client that just wrote reads from the primary for DB_READ_STICKY_SECONDS.
+read_router = create_read_router(DB_CONFIG, db_pool, cursor_factory=RealDictCursor, connection_factory=TimedConnection)
+instrument_pool("replica", read_router.replica)
+install_read_your_writes(app, read_router)
+
+# Statements slower than SLOW_QUERY_MS are kept (with sampled EXPLAIN ANALYZE plans) for /api/db/slow-queries
+slow_queries = create_slow_query_log(DB_CONFIG, read_db_config(DB_CONFIG))
+
+# Free appointment slots per doctor, kept in memory. Writes made here update it
+# directly; clinic_changes notifications (see the live dashboard) cover the patient app.
+availability = AvailabilityIndex(db_pool.connection)
+
 # ---------- Database Helper Functions ----------
 def get_db():
     if 'db' not in g:
         try:
-            g.db = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+            g.db = db_pool.connection()
+            note_primary_checkout()
         except psycopg2.OperationalError as e:
             print(f"❌ Could not connect to the database: {e}")
             return None
     return g.db
 
+def get_read_db():
+    """Connection for read-only queries (the replica when one is configured and current)."""
+    if 'read_db' not in g:
+        try:
+            g.read_db = read_router.connection(primary=wrote_recently())
+        except psycopg2.OperationalError as e:
+            print(f"❌ Could not connect to the database: {e}")
+            return None
+    return g.read_db
+
+# ---------- Dashboard Cache ----------
+# Every open dashboard reads the same stats and overview, so they share one cached result.
+# Clinic writes below call invalidate_dashboard() after committing.
+dashboard_cache = TTLCache(ttl=float(os.getenv("DASHBOARD_CACHE_TTL", "10")))
+
+def invalidate_dashboard():
+    dashboard_cache.invalidate()
+
 def close_db(e=None):
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    for key in ('db', 'read_db'):
+        db = g.pop(key, None)
+        if db is not None:
+            # Returns the connection to the pool (rolling back anything left open)
+            db.close()
 
 # ---------- Routes ----------
 @app.route('/')
@@ -77,25 +164,77 @@ def clinic_appointments():
 ## Chatbot Endpoint
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    if not GEMINI_API_KEY:
+    if not chat_gateway.available:
+        return jsonify({"text": "AI Assistant is currently unavailable."}), 503
+
+    user_message = request.json.get('message')
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    # The client sends back the id from its previous reply to continue a conversation
+    conversation_id = chat_memory.conversation_id(request.json.get('conversation_id'))
+
+    # Only first turns are cached: with history the answer depends on the whole conversation
+    history = chat_memory.context(conversation_id)
+    cache_key = None if history else response_cache_key(CHAT_PROMPT_VERSION, user_message)
+    if cache_key is not None:
+        cached_text = chat_cache.get(cache_key)
+        if cached_text is not None:
+            chat_memory.record(conversation_id, user_message, cached_text)
+            return jsonify({"text": cached_text, "cached": True, "conversation_id": conversation_id})
+
+    # The gateway bounds concurrency and time spent on the model, and answers
+    # with a canned reply (degraded=True) when it is overloaded or failing
+    prompt = CHAT_PROMPT_TEMPLATE.format(history=history, user_message=clip(user_message, MAX_MESSAGE_TOKENS))
+    reply = chat_gateway.reply(prompt)
+    if reply.degraded:
+        return jsonify({"text": reply.text, "degraded": True, "conversation_id": conversation_id})
+    chat_memory.record(conversation_id, user_message, reply.text)
+    if cache_key is not None:
+        chat_cache.set(cache_key, reply.text)
+    return jsonify({"text": reply.text, "conversation_id": conversation_id})
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same as /api/chat, but sends the reply as SSE frames while it is generated."""
+    if not chat_gateway.available:
         return jsonify({"text": "AI Assistant is currently unavailable."}), 503
     user_message = request.json.get('message')
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
+    conversation_id = chat_memory.conversation_id(request.json.get('conversation_id'))
+
+    done_payload = {"conversation_id": conversation_id}
+    history = chat_memory.context(conversation_id)
+    cache_key = None if history else response_cache_key(CHAT_PROMPT_VERSION, user_message)
+    if cache_key is not None:
+        cached_text = chat_cache.get(cache_key)
+        if cached_text is not None:
+            chat_memory.record(conversation_id, user_message, cached_text)
+            return sse_response(reply_frames(cached_text, done_payload, cached=True))
+
+    def remember(text):
+        chat_memory.record(conversation_id, user_message, text)
+        if cache_key is not None:
+            chat_cache.set(cache_key, text)
+
+    prompt = CHAT_PROMPT_TEMPLATE.format(history=history, user_message=clip(user_message, MAX_MESSAGE_TOKENS))
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"You are a helpful AI assistant for a clinic. User asks: '{user_message}'"
-        response = model.generate_content(prompt)
-        ai_text = response.text
-        return jsonify({"text": ai_text})
-    except Exception as e:
-        print(f"Error with Gemini API: {e}")
-        return jsonify({"error": "Failed to get response from AI assistant"}), 500
+        pieces = chat_gateway.stream(prompt)
+    except GatewayUnavailable as e:
+        print(f"⚠️ LLM gateway degraded ({e.reason}), sending fallback reply")
+        return sse_response(reply_frames(chat_gateway.fallback_text, done_payload, degraded=True))
+    return sse_response(stream_chat(
+        pieces, on_complete=remember, done_payload=done_payload, fallback_text=chat_gateway.fallback_text
+    ))
+
+@app.route('/api/chat/stats', methods=['GET'])
+def get_chat_stats():
+    return jsonify({"cache": chat_cache.stats(), "memory": chat_memory.stats(), "gateway": chat_gateway.stats()})
 
 ## Doctors Endpoint
 @app.route('/api/clinic/doctors', methods=['GET'])
 def get_clinic_doctors():
-    conn = get_db()
+    conn = get_read_db()
     if not conn:
         return jsonify({"error": "Database connection failed"}), 500
     try:
@@ -107,62 +246,140 @@ def get_clinic_doctors():
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to fetch doctors"}), 500
 
+## Availability Endpoint
+@app.route('/api/clinic/availability', methods=['GET'])
+def get_clinic_availability():
+    """Free slots for ?doctor_id= or ?specialization= between ?from= and ?to= (YYYY-MM-DD)."""
+    dashboard_listener.start()
+    try:
+        return jsonify(availability_payload(availability, request.args))
+    except BadAvailabilityRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except psycopg2.OperationalError as e:
+        print(f"❌ Could not connect to the database: {e}")
+        return jsonify({"error": "Database connection failed"}), 500
+    except Exception as e:
+        print(f"Database Error: {e}")
+        return jsonify({"error": "Failed to compute availability"}), 500
+
+# ---------- List Pagination ----------
+# List endpoints return one keyset page (?limit=, ?cursor=) plus an X-Next-Cursor
+# header; the filters below are applied in SQL.
+# Patient list columns served from patient_summaries (kept current by triggers, see
+# init_db.py). next_appointment is re-probed only when it has slipped into the past.
+PATIENT_SUMMARY_COLUMNS = """
+    COALESCE(s.appointment_count, 0) as total_appointments,
+    COALESCE(s.medication_count, 0) as total_medications,
+    CASE WHEN s.next_appointment IS NULL OR s.next_appointment >= LOCALTIMESTAMP THEN s.next_appointment
+         ELSE (SELECT MIN(a.appointment_date) FROM appointments a
+               WHERE a.patient_id = p.patient_id AND a.status = 'scheduled'
+                 AND a.appointment_date >= LOCALTIMESTAMP)
+    END as next_appointment,
+    s.last_visit
+"""
+
+PATIENT_SORT = [("p.last_name", "last_name"), ("p.first_name", "first_name"), ("p.patient_id", "patient_id")]
+PATIENT_FILTERS = {
+    "patient_id": ("p.patient_id = %s", int),
+    "doctor_id": ("EXISTS (SELECT 1 FROM appointments a WHERE a.patient_id = p.patient_id AND a.doctor_id = %s)", int),
+}
+
+APPOINTMENT_SORT = [("a.appointment_date", "appointment_date"), ("a.appointment_id", "appointment_id")]
+APPOINTMENT_FILTERS = {
+    "doctor_id": ("a.doctor_id = %s", int),
+    "patient_id": ("a.patient_id = %s", int),
+    "status": ("a.status = %s", str),
+    "date_from": ("a.appointment_date >= %s", parse_date_from),
+    "date_to": ("a.appointment_date < %s", parse_date_to),
+}
+
+## Connection pool counters
+@app.route('/api/db/pool', methods=['GET'])
+def get_pool_stats():
+    return jsonify(db_pool.stats())
+
+## Read replica routing counters
+@app.route('/api/db/reads', methods=['GET'])
+def get_read_routing_stats():
+    return jsonify(read_router.stats())
+
+## Slow Query Log Endpoint
+# Plans can contain literal values from the query, so only local requests may read them
+@app.route('/api/db/slow-queries', methods=['GET'])
+def get_slow_queries():
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "Slow query log is only available locally"}), 403
+    return jsonify({"stats": slow_queries.stats(), "queries": slow_queries.entries()})
+
+## Password hashing pool counters and timings
+@app.route('/api/auth/hashing', methods=['GET'])
+def get_hashing_stats():
+    return jsonify(password_hasher.stats())
+
 # ---------- CLINIC API ROUTES ----------
 
 ## Patients Endpoints
 @app.route('/api/clinic/patients', methods=['GET', 'POST'])
 def clinic_handle_patients():
-    conn = get_db()
+    conn = get_read_db() if request.method == 'GET' else get_db()
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     try:
         if request.method == 'GET':
+            page = KeysetPage(request.args, PATIENT_SORT, filters=PATIENT_FILTERS)
             with conn.cursor() as cur:
-                cur.execute("""
+                cur.execute(f"""
                     SELECT p.patient_id, p.first_name, p.last_name, p.email, p.phone, TO_CHAR(p.dob, 'YYYY-MM-DD') as dob,
-                           COUNT(DISTINCT a.appointment_id) as total_appointments,
-                           COUNT(DISTINCT pr.prescription_id) as total_medications
+                           {PATIENT_SUMMARY_COLUMNS}
                     FROM patients p
-                    LEFT JOIN appointments a ON p.patient_id = a.patient_id
-                    LEFT JOIN prescriptions pr ON p.patient_id = pr.patient_id
-                    GROUP BY p.patient_id
-                    ORDER BY p.last_name, p.first_name;
-                """)
-                return jsonify(cur.fetchall())
+                    LEFT JOIN patient_summaries s ON s.patient_id = p.patient_id
+                    {page.where()}
+                    {page.order_by()}
+                    {page.limit_clause()};
+                """, page.params)
+                rows, next_cursor = page.split(cur.fetchall())
+            return paginated_response(jsonify(rows), next_cursor)
         elif request.method == 'POST':
             data = request.get_json()
             if not all([data.get('first_name'), data.get('last_name'), data.get('email')]):
                 return jsonify({"error": "First name, last name, and email are required"}), 400
-            password_hash = bcrypt.hashpw(data.get('password', 'default').encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
             with conn.cursor() as cur:
                 cur.execute("SELECT patient_id FROM patients WHERE email = %s", (data['email'],))
                 if cur.fetchone(): return jsonify({"error": "Email already exists"}), 409
+                # Without a password every patient gets the same placeholder, hashed once per process
+                password_hash = password_hasher.hash(data['password']) if data.get('password') else password_hasher.placeholder_hash()
                 cur.execute("""
                     INSERT INTO patients (first_name, last_name, email, password_hash, phone, dob) 
                     VALUES (%s, %s, %s, %s, %s, %s) RETURNING patient_id;
                 """, (data['first_name'], data['last_name'], data['email'], password_hash, data.get('phone'), data.get('dob')))
                 patient_id = cur.fetchone()['patient_id']
                 conn.commit()
+                invalidate_dashboard()
             return jsonify({"message": "Patient added successfully!", "patient_id": patient_id}), 201
+    except BadPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except HashingUnavailable as e:
+        conn.rollback()
+        print(f"⚠️ Password hashing unavailable ({e.reason})")
+        return jsonify({"error": "The server is busy, please try again in a moment"}), 503
     except Exception as e:
         conn.rollback()
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to handle patients"}), 500
 
+CLINIC_PATIENT_JSON = """json_build_object(
+    'patient_id', p.patient_id, 'first_name', p.first_name, 'last_name', p.last_name,
+    'email', p.email, 'phone', p.phone, 'dob', TO_CHAR(p.dob, 'YYYY-MM-DD'))"""
+
 @app.route('/api/clinic/patients/<int:patient_id>', methods=['GET', 'PUT', 'DELETE'])
 def clinic_handle_individual_patient(patient_id):
-    conn = get_db()
+    conn = get_read_db() if request.method == 'GET' else get_db()
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     try:
         if request.method == 'GET':
-            with conn.cursor() as cur:
-                cur.execute("SELECT patient_id, first_name, last_name, email, phone, TO_CHAR(dob, 'YYYY-MM-DD') as dob FROM patients WHERE patient_id = %s", (patient_id,))
-                patient = cur.fetchone()
-                if not patient: return jsonify({"error": "Patient not found"}), 404
-                cur.execute("SELECT a.*, d.first_name as doctor_first_name, d.last_name as doctor_last_name, d.specialization FROM appointments a JOIN doctors d ON a.doctor_id = d.doctor_id WHERE a.patient_id = %s ORDER BY a.appointment_date DESC;", (patient_id,))
-                appointments = cur.fetchall()
-                cur.execute("SELECT * FROM prescriptions WHERE patient_id = %s ORDER BY created_at DESC", (patient_id,))
-                medications = cur.fetchall()
-                return jsonify({"patient": patient, "appointments": appointments, "medications": medications})
+            # One query for the whole document, answered with 304 while the client's ETag is current
+            response = patient_detail_response(conn, patient_id, request, CLINIC_PATIENT_JSON)
+            if response is None: return jsonify({"error": "Patient not found"}), 404
+            return response
         elif request.method == 'PUT':
             data = request.get_json()
             if not all([data.get('first_name'), data.get('last_name'), data.get('email')]):
@@ -171,11 +388,13 @@ def clinic_handle_individual_patient(patient_id):
                 cur.execute("UPDATE patients SET first_name = %s, last_name = %s, email = %s, phone = %s, dob = %s WHERE patient_id = %s",
                             (data['first_name'], data['last_name'], data['email'], data.get('phone'), data.get('dob'), patient_id))
                 conn.commit()
+                invalidate_dashboard()
             return jsonify({"message": "Patient updated successfully!"})
         elif request.method == 'DELETE':
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM patients WHERE patient_id = %s", (patient_id,))
                 conn.commit()
+                invalidate_dashboard()
             return jsonify({"message": "Patient deleted successfully!"})
     except Exception as e:
         conn.rollback()
@@ -183,23 +402,47 @@ def clinic_handle_individual_patient(patient_id):
         return jsonify({"error": "Failed to handle patient request"}), 500
 
 ## Appointments Endpoints
+def slot_taken(data):
+    """409 response for a booking that overlaps another one, offering nearby free slots."""
+    try:
+        doctor_id = int(data['doctor_id'])
+        start = datetime.fromisoformat(str(data['appointment_date']))
+    except (KeyError, TypeError, ValueError):
+        # Status-only changes carry no doctor or time to search around
+        return jsonify({"error": "That time is already booked for this doctor.", "alternatives": []}), 409
+    return jsonify(conflict_payload(availability, doctor_id, start)), 409
+
 @app.route('/api/clinic/appointments', methods=['GET', 'POST'])
 def clinic_handle_appointments():
-    conn = get_db()
+    conn = get_read_db() if request.method == 'GET' else get_db()
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     try:
         if request.method == 'GET':
-            with conn.cursor() as cur:
-                cur.execute("""
+            page = KeysetPage(request.args, APPOINTMENT_SORT, descending=True, filters=APPOINTMENT_FILTERS)
+            stream_format = requested_stream_format(request.args)
+            sql = f"""
                     SELECT a.appointment_id, a.appointment_date, a.reason, a.status,
                            p.patient_id, p.first_name as patient_first_name, p.last_name as patient_last_name,
                            d.doctor_id, d.first_name as doctor_first_name, d.last_name as doctor_last_name
                     FROM appointments a
                     JOIN patients p ON a.patient_id = p.patient_id
                     JOIN doctors d ON a.doctor_id = d.doctor_id
-                    ORDER BY a.appointment_date DESC;
-                """)
-                return jsonify(cur.fetchall())
+                    {page.where()}
+                    {page.order_by()}
+                """
+            if stream_format:
+                # The request's connection is returned at teardown, before the body is
+                # sent, so the stream checks out its own and releases it when done
+                stream_conn = read_router.connection(primary=wrote_recently())
+                try:
+                    return stream_query(stream_conn, sql, page.params, stream_format)
+                except Exception:
+                    stream_conn.close()
+                    raise
+            with conn.cursor() as cur:
+                cur.execute(sql + page.limit_clause(), page.params)
+                rows, next_cursor = page.split(cur.fetchall())
+            return paginated_response(jsonify(rows), next_cursor)
         elif request.method == 'POST':
             data = request.get_json()
             if not all([data.get('patient_id'), data.get('doctor_id'), data.get('appointment_date')]):
@@ -207,11 +450,20 @@ def clinic_handle_appointments():
             with conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO appointments (patient_id, doctor_id, appointment_date, reason, status) 
-                    VALUES (%s, %s, %s, %s, 'scheduled') RETURNING appointment_id;
+                    VALUES (%s, %s, %s, %s, 'scheduled') RETURNING appointment_id, doctor_id, appointment_date;
                 """, (data['patient_id'], data['doctor_id'], data['appointment_date'], data.get('reason')))
-                appointment_id = cur.fetchone()['appointment_id']
+                created = cur.fetchone()
+                appointment_id = created['appointment_id']
                 conn.commit()
+                invalidate_dashboard()
+                availability.apply(appointment_id, created['doctor_id'], created['appointment_date'])
             return jsonify({"message": "Appointment created!", "appointment_id": appointment_id}), 201
+    except BadPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except psycopg2.errors.ExclusionViolation:
+        # The no-double-booking constraint rejected the slot (see init_db.py)
+        conn.rollback()
+        return slot_taken(data)
     except Exception as e:
         conn.rollback()
         print(f"Database Error: {e}")
@@ -227,8 +479,15 @@ def clinic_handle_individual_appointment(appointment_id):
             if data.get('status') not in ['scheduled', 'completed', 'cancelled']:
                 return jsonify({"error": "Invalid status"}), 400
             with conn.cursor() as cur:
-                cur.execute("UPDATE appointments SET status = %s WHERE appointment_id = %s", (data['status'], appointment_id))
+                cur.execute(
+                    "UPDATE appointments SET status = %s WHERE appointment_id = %s RETURNING doctor_id, appointment_date",
+                    (data['status'], appointment_id)
+                )
+                updated = cur.fetchone()
                 conn.commit()
+                invalidate_dashboard()
+                if updated:
+                    availability.apply(appointment_id, updated['doctor_id'], updated['appointment_date'], data['status'])
             return jsonify({"message": "Appointment status updated"})
         elif request.method == 'PUT':
             data = request.get_json()
@@ -239,151 +498,254 @@ def clinic_handle_individual_appointment(appointment_id):
                     UPDATE appointments 
                     SET patient_id = %s, doctor_id = %s, appointment_date = %s, reason = %s, status = %s
                     WHERE appointment_id = %s
+                    RETURNING doctor_id, appointment_date, status
                 """, (data['patient_id'], data['doctor_id'], data['appointment_date'], data.get('reason'), data.get('status'), appointment_id))
+                updated = cur.fetchone()
                 conn.commit()
+                invalidate_dashboard()
+                if updated:
+                    availability.apply(appointment_id, updated['doctor_id'], updated['appointment_date'], updated['status'])
             return jsonify({"message": "Appointment updated successfully!"})
         elif request.method == 'DELETE':
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM appointments WHERE appointment_id = %s", (appointment_id,))
                 conn.commit()
+                invalidate_dashboard()
+                availability.discard(appointment_id)
             return jsonify({"message": "Appointment deleted successfully!"})
+    except psycopg2.errors.ExclusionViolation:
+        conn.rollback()
+        return slot_taken(request.get_json(silent=True) or {})
     except Exception as e:
         conn.rollback()
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to handle appointment"}), 500
 
+## Bulk Import Endpoint
+# Takes a CSV or NDJSON file, either as the raw request body or as the "file"
+# field of a form upload, and loads it in one transaction (see shared/bulk_import.py).
+# Rows that fail are listed in the report; the rest are imported.
+@app.route('/api/clinic/import/<table>', methods=['POST'])
+def clinic_bulk_import(table):
+    conn = get_db()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        upload = request.files.get('file')
+        if upload:
+            fmt = detect_format(upload.filename, upload.mimetype, request.args.get('format'))
+            stream = upload.stream
+        else:
+            fmt = detect_format(None, request.content_type, request.args.get('format'))
+            stream = request.stream
+        dry_run = request.args.get('dry_run') in ('1', 'true')
+        report = run_import(conn, table, read_records(stream, fmt), password_hasher, dry_run=dry_run)
+        if report["imported"] and not dry_run:
+            invalidate_dashboard()
+            if table == "appointments":
+                availability.invalidate()
+        return jsonify(report)
+    except BadImportRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except HashingUnavailable as e:
+        print(f"⚠️ Password hashing unavailable during import ({e.reason})")
+        return jsonify({"error": "The server is busy, please try the import again in a moment"}), 503
+    except Exception as e:
+        print(f"Database Error: {e}")
+        return jsonify({"error": "Failed to import file"}), 500
+
 # ---------- Dashboard Endpoints ----------
 
-@app.route('/api/dashboard/stats', methods=['GET'])
-def get_dashboard_stats():
+def query_dashboard_stats(conn):
+    """Computes all dashboard counters in one round trip."""
+    # A half-open range on the raw column lets the appointment_date index serve "today"
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM patients) as total_patients,
+                (SELECT COUNT(*) FROM appointments) as total_appointments,
+                (SELECT COUNT(*) FROM appointments
+                 WHERE appointment_date >= %s AND appointment_date < %s) as today_appointments,
+                (SELECT COUNT(*) FROM prescriptions) as active_medications
+        """, (today, today + timedelta(days=1)))
+        return dict(cur.fetchone())
+
+# Cache fills read the primary: the cache is shared by every client, and a lagging
+# replica could refill it with pre-invalidation rows that then outlive the write.
+def fetch_dashboard_stats():
     conn = get_db()
     if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
+        raise psycopg2.OperationalError("no database connection")
+    return query_dashboard_stats(conn)
+
+def query_recent_appointments(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT a.appointment_id, a.appointment_date, a.status, a.reason,
+                   p.patient_id, p.first_name as patient_first_name, p.last_name as patient_last_name,
+                   d.doctor_id, d.first_name as doctor_first_name, d.last_name as doctor_last_name,
+                   d.specialization
+            FROM appointments a
+            JOIN patients p ON a.patient_id = p.patient_id
+            JOIN doctors d ON a.doctor_id = d.doctor_id
+            ORDER BY a.appointment_date DESC
+            LIMIT 10
+        """)
+        appointments = cur.fetchall()
+    return appointments
+
+def query_recent_activity(conn):
+    with conn.cursor() as cur:
+        # Get recent appointments as activity
+        cur.execute("""
+            SELECT 
+                'appointment' as type,
+                a.appointment_date as time,
+                CONCAT('Appointment ', a.status) as title,
+                CONCAT(p.first_name, ' ', p.last_name, ' with Dr. ', d.first_name, ' ', d.last_name) as description,
+                a.status
+            FROM appointments a
+            JOIN patients p ON a.patient_id = p.patient_id
+            JOIN doctors d ON a.doctor_id = d.doctor_id
+            ORDER BY a.appointment_date DESC
+            LIMIT 8
+        """)
+        activities = cur.fetchall()
+    return activities
+
+@app.route('/api/dashboard/stats', methods=['GET'])
+def get_dashboard_stats():
     try:
-        with conn.cursor() as cur:
-            # Total patients
-            cur.execute("SELECT COUNT(*) as total FROM patients")
-            total_patients = cur.fetchone()['total']
-            
-            # Total appointments
-            cur.execute("SELECT COUNT(*) as total FROM appointments")
-            total_appointments = cur.fetchone()['total']
-            
-            # Today's appointments
-            today = datetime.now().date()
-            cur.execute("SELECT COUNT(*) as total FROM appointments WHERE DATE(appointment_date) = %s", (today,))
-            today_appointments = cur.fetchone()['total']
-            
-            # Active medications
-            cur.execute("SELECT COUNT(DISTINCT prescription_id) as total FROM prescriptions")
-            active_medications = cur.fetchone()['total']
-            
-            return jsonify({
-                "total_patients": total_patients,
-                "total_appointments": total_appointments,
-                "today_appointments": today_appointments,
-                "active_medications": active_medications
-            })
+        return jsonify(dashboard_cache.get_or_set("stats", fetch_dashboard_stats))
+    except psycopg2.OperationalError as e:
+        print(f"❌ Could not connect to the database: {e}")
+        return jsonify({"error": "Database connection failed"}), 500
     except Exception as e:
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to fetch dashboard stats"}), 500
 
 @app.route('/api/dashboard/recent-appointments', methods=['GET'])
 def get_recent_appointments():
-    conn = get_db()
+    conn = get_read_db()
     if not conn:
         return jsonify({"error": "Database connection failed"}), 500
     
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT a.appointment_id, a.appointment_date, a.status, a.reason,
-                       p.patient_id, p.first_name as patient_first_name, p.last_name as patient_last_name,
-                       d.doctor_id, d.first_name as doctor_first_name, d.last_name as doctor_last_name,
-                       d.specialization
-                FROM appointments a
-                JOIN patients p ON a.patient_id = p.patient_id
-                JOIN doctors d ON a.doctor_id = d.doctor_id
-                ORDER BY a.appointment_date DESC
-                LIMIT 10
-            """)
-            appointments = cur.fetchall()
-            
-            # Convert datetime objects to strings for JSON serialization
-            for apt in appointments:
-                if apt['appointment_date']:
-                    apt['appointment_date'] = apt['appointment_date'].isoformat()
-            
-            return jsonify(appointments)
+        return jsonify(query_recent_appointments(conn))
     except Exception as e:
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to fetch recent appointments"}), 500
 
 @app.route('/api/dashboard/recent-activity', methods=['GET'])
 def get_recent_activity():
-    conn = get_db()
+    conn = get_read_db()
     if not conn:
         return jsonify({"error": "Database connection failed"}), 500
     
     try:
-        with conn.cursor() as cur:
-            # Get recent appointments as activity
-            cur.execute("""
-                SELECT 
-                    'appointment' as type,
-                    a.appointment_date as time,
-                    CONCAT('Appointment ', a.status) as title,
-                    CONCAT(p.first_name, ' ', p.last_name, ' with Dr. ', d.first_name, ' ', d.last_name) as description,
-                    a.status
-                FROM appointments a
-                JOIN patients p ON a.patient_id = p.patient_id
-                JOIN doctors d ON a.doctor_id = d.doctor_id
-                ORDER BY a.appointment_date DESC
-                LIMIT 8
-            """)
-            activities = cur.fetchall()
-            
-            # Convert datetime objects to strings
-            for activity in activities:
-                if activity['time']:
-                    activity['time'] = activity['time'].isoformat()
-            
-            return jsonify(activities)
+        return jsonify(query_recent_activity(conn))
     except Exception as e:
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to fetch recent activity"}), 500
 
-@app.route('/api/dashboard/patients-overview', methods=['GET'])
-def get_patients_overview():
+def fetch_patients_overview():
     conn = get_db()
     if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
+        raise psycopg2.OperationalError("no database connection")
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT p.patient_id, p.first_name, p.last_name, p.email, p.phone, p.dob,
+                   {PATIENT_SUMMARY_COLUMNS}
+            FROM patients p
+            LEFT JOIN patient_summaries s ON s.patient_id = p.patient_id
+            ORDER BY p.last_name, p.first_name
+        """)
+        patients = cur.fetchall()
+    return patients
+
+@app.route('/api/dashboard/patients-overview', methods=['GET'])
+def get_patients_overview():
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT p.patient_id, p.first_name, p.last_name, p.email, p.phone, p.dob,
-                       COUNT(DISTINCT a.appointment_id) as total_appointments,
-                       COUNT(DISTINCT pr.prescription_id) as total_medications
-                FROM patients p
-                LEFT JOIN appointments a ON p.patient_id = a.patient_id
-                LEFT JOIN prescriptions pr ON p.patient_id = pr.patient_id
-                GROUP BY p.patient_id
-                ORDER BY p.last_name, p.first_name
-            """)
-            patients = cur.fetchall()
-            
-            # Convert date objects to strings
-            for patient in patients:
-                if patient['dob']:
-                    patient['dob'] = patient['dob'].isoformat()
-            
-            return jsonify(patients)
+        # Shares the dashboard cache so a change pushed to N dashboards costs one query
+        return jsonify(dashboard_cache.get_or_set("patients_overview", fetch_patients_overview))
+    except psycopg2.OperationalError as e:
+        print(f"❌ Could not connect to the database: {e}")
+        return jsonify({"error": "Database connection failed"}), 500
     except Exception as e:
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to fetch patients overview"}), 500
 
+# ---------- Live Dashboard (Server-Sent Events) ----------
+# Triggers on patients/appointments/prescriptions NOTIFY clinic_changes (see
+# init_db.py). One listener thread turns each burst of changes into a single
+# round of queries and fans the results out to every open dashboard, which
+# replaces the per-dashboard 15 second polling.
+dashboard_events = EventBroker()
+live_state = {"stats": None, "appointments": None, "activity": None}
+live_lock = threading.Lock()
+
+def publish_dashboard_changes(changes):
+    tables = {change.get("table") for change in changes}
+    resync = None in tables
+    # Also covers writes made by the patient app, which cannot reach this process directly
+    invalidate_dashboard()
+    if dashboard_events.subscriber_count == 0:
+        return
+
+    new_ids = sorted({
+        change["id"] for change in changes
+        if change.get("table") == "appointments" and change.get("op") == "INSERT"
+    })
+    conn = db_pool.connection()
+    try:
+        with live_lock:
+            stats = query_dashboard_stats(conn)
+            dashboard_cache.set("stats", stats)
+            if stats != live_state["stats"]:
+                live_state["stats"] = stats
+                dashboard_events.publish("stats", stats)
+
+            # Patient renames change the names shown in both lists
+            if resync or tables & {"appointments", "patients"}:
+                appointments = query_recent_appointments(conn)
+                if appointments != live_state["appointments"] or new_ids:
+                    live_state["appointments"] = appointments
+                    dashboard_events.publish("appointments", {"recent": appointments, "new_ids": new_ids})
+                activity = query_recent_activity(conn)
+                if activity != live_state["activity"]:
+                    live_state["activity"] = activity
+                    dashboard_events.publish("activity", activity)
+
+            if resync or tables & {"patients", "appointments", "prescriptions"}:
+                # The overview is large, so clients refetch it (cached per TTL) on this hint
+                dashboard_events.publish("patients", {"tables": sorted(t for t in tables if t)})
+    finally:
+        conn.close()
+
+def handle_clinic_changes(changes):
+    try:
+        availability.apply_changes(changes)
+    except Exception as e:
+        print(f"Error updating availability: {e}")
+    publish_dashboard_changes(changes)
+
+dashboard_listener = ChangeListener(
+    DB_CONFIG, "clinic_changes", handle_clinic_changes,
+    debounce=float(os.getenv("DASHBOARD_EVENTS_DEBOUNCE", "0.25"))
+)
+
+@app.route('/api/dashboard/events', methods=['GET'])
+def dashboard_events_stream():
+    dashboard_listener.start()
+    q = dashboard_events.subscribe()
+    initial = []
+    try:
+        # Each new client starts from the current stats; later frames are deltas
+        initial.append(format_sse("stats", dashboard_cache.get_or_set("stats", fetch_dashboard_stats)))
+    except Exception as e:
+        print(f"Database Error: {e}")
+    return sse_response(dashboard_events.stream(q, initial))
+
 app.teardown_appcontext(close_db)
 
 if __name__ == "__main__":
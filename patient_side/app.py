@@ -7,8 +7,32 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 import google.generativeai as genai
 import re, json, random
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime, timedelta
+import sys
+
+# Make the shared/ helpers importable when running `python app.py` from this folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.db_pool import create_pool
+from shared.cache import TTLCache
+from shared.pagination import (
+    BadPageRequest, KeysetPage, paginated_response, parse_date_from, parse_date_to
+)
+from shared.streaming import requested_stream_format, stream_query
+from shared.live import ChangeListener, sse_response
+from shared.assistant import (
+    create_response_cache, reply_frames, response_cache_key, stream_chat
+)
+from shared.llm_gateway import GatewayUnavailable, create_gateway
+from shared.intents import create_router
+from shared.conversation import MAX_MESSAGE_TOKENS, clip, create_conversation_store
+from shared.availability import AvailabilityIndex, BadAvailabilityRequest, availability_payload, conflict_payload
+from shared.passwords import HashingUnavailable, create_password_hasher
+from shared.patient_detail import patient_detail_response
+from shared.response_layer import install_response_layer
+from shared.json_provider import install_json_provider
+from shared.read_routing import create_read_router, install_read_your_writes, note_primary_checkout, read_db_config, wrote_recently
+from shared.metrics import TimedConnection, install_metrics, instrument_pool
+from shared.slow_queries import create_slow_query_log
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -24,6 +48,14 @@ login_manager.login_view = 'login'
 # Enable CORS for requests from the frontend which runs on a different origin
 CORS(app, supports_credentials=True, origins=["http://127.0.0.1:5500", "http://localhost:5000", "http://127.0.0.1:5001", "http://localhost:5001"])
 
+# /metrics: per-route latency, status counts and DB timings (installed first so it times the other hooks)
+install_metrics(app)
+
+# Compression, ETags and content-hashed static URLs for every response
+install_response_layer(app)
+# jsonify through orjson; datetimes, Decimals and JSONB values need no per-row conversion
+install_json_provider(app)
+
 # ---------- Gemini AI Configuration ----------
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
@@ -31,6 +63,41 @@ if GEMINI_API_KEY:
 else:
     print("⚠️ Gemini API key not found. The AI chat feature will be disabled.")
 
+CHAT_MODEL_NAME = 'gemini-2.5-flash'
+# Bump CHAT_PROMPT_VERSION whenever the template changes so cached answers are not reused
+CHAT_PROMPT_VERSION = 2
+# A simple prompt to guide the model's behavior
+CHAT_PROMPT_TEMPLATE = """You are a friendly and helpful healthcare AI assistant. 
+        Your goal is to assist users with their health-related questions.
+        Provide concise, clear, and safe information.
+
+        You are also based in Brunei Darussalam, so include local context when relevant. such as:
+        - Local healthcare facilities
+        - Health regulations in Brunei
+        - Common health concerns in the region
+        
+        Try to keep your messages short, around a short paragraph, with some bulleted lists if needed. Bolden important points.
+        
+        {history}
+        User's question: "{user_message}"
+        """
+CHAT_SUGGESTIONS = ["Ask about symptoms", "Book an appointment", "Set medication reminder"]
+
+# Answers to repeated questions, keyed on (prompt version, normalized message)
+chat_cache = create_response_cache()
+
+# All model calls go through the gateway (LLM_BACKEND=stub runs a local fake model)
+chat_gateway = create_gateway(CHAT_MODEL_NAME)
+
+# Recent turns per conversation, trimmed to a token budget before they go in the prompt
+chat_memory = create_conversation_store()
+
+# Curated intents/FAQs answered locally before anything reaches the gateway
+chat_router = create_router(os.path.join(os.path.dirname(__file__), 'chat_faq.json'))
+
+# Signup and login hash on a process pool instead of the request thread
+password_hasher = create_password_hasher()
+
 # ---------- Database Configuration ----------
 DB_CONFIG = {
     "dbname": os.getenv("DB_NAME", "sehat"),
@@ -40,31 +107,75 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT", "5432")
 }
 
+db_pool = create_pool(DB_CONFIG, cursor_factory=RealDictCursor, connection_factory=TimedConnection)
+instrument_pool("primary", db_pool)
+
+# Listing and detail GETs read from DB_READ_HOST when it is set. A client that
+# just wrote reads from the primary for DB_READ_STICKY_SECONDS.
+read_router = create_read_router(DB_CONFIG, db_pool, cursor_factory=RealDictCursor, connection_factory=TimedConnection)
+instrument_pool("replica", read_router.replica)
+install_read_your_writes(app, read_router)
+
+# Statements slower than SLOW_QUERY_MS are kept (with sampled EXPLAIN ANALYZE plans) for /api/db/slow-queries
+slow_queries = create_slow_query_log(DB_CONFIG, read_db_config(DB_CONFIG))
+
+# Free appointment slots per doctor, kept in memory. Bookings made here update it
+# directly; the listener picks up writes made by the clinic app.
+availability = AvailabilityIndex(db_pool.connection)
+availability_listener = ChangeListener(DB_CONFIG, "clinic_changes", availability.apply_changes)
+
 # ---------- Database Helper Function ----------
 def get_db_connection():
-    """Establishes a connection to the database."""
+    """Checks a connection out of the pool; conn.close() hands it back."""
     try:
-        conn = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+        conn = db_pool.connection()
+        note_primary_checkout()
         return conn
     except psycopg2.OperationalError as e:
         print(f"❌ Could not connect to the database: {e}")
         return None
 
+def get_read_connection():
+    """Like get_db_connection, for read-only queries (the replica when one is configured and current)."""
+    try:
+        return read_router.connection(primary=wrote_recently())
+    except psycopg2.OperationalError as e:
+        print(f"❌ Could not connect to the database: {e}")
+        return None
+
 # ---------- User Class for Flask-Login ----------
 class User(UserMixin):
     def __init__(self, id, email):
         self.id = id
         self.email = email
 
+# Flask-Login resolves the session's user on every request. Known ids (and ids
+# with no account, e.g. stale cookies) are remembered for USER_CACHE_TTL seconds;
+# signup, login and logout refresh or drop the entry for that user.
+user_cache = TTLCache(
+    ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000"))
+)
+_NOT_CACHED = object()
+
+def remember_user(user):
+    user_cache.set(str(user.id), (user.id, user.email))
+
 @login_manager.user_loader
 def load_user(user_id):
+    cached = user_cache.get(str(user_id), _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return User(id=cached[0], email=cached[1]) if cached else None
     conn = get_db_connection()
+    if conn is None:
+        return None
     try:
         with conn.cursor() as cur:
             cur.execute("SELECT id, email FROM users WHERE id = %s", (user_id,))
             user_data = cur.fetchone()
-            if user_data:
-                return User(id=user_data['id'], email=user_data['email'])
+        user_cache.set(str(user_id), (user_data['id'], user_data['email']) if user_data else None)
+        if user_data:
+            return User(id=user_data['id'], email=user_data['email'])
     except Exception as e:
         print(f"Error loading user: {e}")
     finally:
@@ -92,7 +203,7 @@ def signup():
                     return redirect(url_for('signup'))
                 
                 # Create new user
-                hashed_password = generate_password_hash(password)
+                hashed_password = password_hasher.hash(password)
                 cur.execute(
                     "INSERT INTO users (email, password) VALUES (%s, %s) RETURNING id",
                     (email, hashed_password)
@@ -102,10 +213,14 @@ def signup():
                 
                 # Log the user in
                 user = User(id=user_id, email=email)
+                remember_user(user)
                 login_user(user)
                 flash('Registration successful!', 'success')
                 return redirect(url_for('home'))
                 
+        except HashingUnavailable as e:
+            print(f"⚠️ Password hashing unavailable during signup ({e.reason})")
+            flash('We are handling a lot of sign-ups right now. Please try again in a moment.', 'error')
         except Exception as e:
             conn.rollback()
             print(f"Error during signup: {e}")
@@ -127,14 +242,23 @@ def login():
                 cur.execute("SELECT id, email, password FROM users WHERE email = %s", (email,))
                 user_data = cur.fetchone()
                 
-                if user_data and check_password_hash(user_data['password'], password):
+                check = password_hasher.verify(password, user_data['password']) if user_data else None
+                if check and check.ok:
+                    if check.new_hash:
+                        # Older format or cost: store the upgraded hash now that we know the password
+                        cur.execute("UPDATE users SET password = %s WHERE id = %s", (check.new_hash, user_data['id']))
+                        conn.commit()
                     user = User(id=user_data['id'], email=user_data['email'])
+                    remember_user(user)
                     login_user(user)
                     next_page = request.args.get('next')
                     flash('Login successful!', 'success')
                     return redirect(next_page or url_for('home'))
                 else:
                     flash('Invalid email or password. Please try again.', 'error')
+        except HashingUnavailable as e:
+            print(f"⚠️ Password hashing unavailable during login ({e.reason})")
+            flash('We are handling a lot of logins right now. Please try again in a moment.', 'error')
         except Exception as e:
             print(f"Error during login: {e}")
             flash('An error occurred during login. Please try again.', 'error')
@@ -146,6 +270,7 @@ def login():
 @app.route("/logout")
 @login_required
 def logout():
+    user_cache.invalidate(str(current_user.id))
     logout_user()
     flash('You have been logged out.', 'info')
     return redirect(url_for('home'))
@@ -157,19 +282,18 @@ def contact():
 @app.route("/appointments")
 def appointments():
     # Get available appointments from the database
-    conn = get_db_connection()
+    conn = get_read_connection()
     try:
         with conn.cursor() as cur:
-            # Get all available doctors for booking
-            cur.execute("""
-                SELECT d.*, 
-                       (SELECT COUNT(*) FROM appointments a 
-                        WHERE a.doctor_id = d.id 
-                        AND a.status = 'available') as available_slots
-                FROM doctors d
-                ORDER BY d.specialization, d.last_name
-            """)
+            cur.execute("SELECT * FROM doctors ORDER BY specialization, last_name")
             doctors = cur.fetchall()
+            # Free slots over the coming week, from the availability index
+            availability_listener.start()
+            today = datetime.now().date()
+            for doctor in doctors:
+                doctor["available_slots"] = len(
+                    availability.free_slots(doctor["doctor_id"], today, today + timedelta(days=6))
+                )
             
             # Get upcoming appointments if user is logged in
             user_appointments = []
@@ -177,7 +301,7 @@ def appointments():
                 cur.execute("""
                     SELECT a.*, d.first_name as doctor_first_name, d.last_name as doctor_last_name, d.specialization
                     FROM appointments a
-                    JOIN doctors d ON a.doctor_id = d.id
+                    JOIN doctors d ON a.doctor_id = d.doctor_id
                     WHERE a.patient_id = %s
                     ORDER BY a.appointment_date DESC
                 """, (current_user.id,))
@@ -202,46 +326,109 @@ def appointments():
 ## Chatbot Endpoint
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    if not GEMINI_API_KEY:
+    user_message = request.json.get('message')
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    # The client sends back the id from its previous reply to continue a conversation
+    conversation_id = chat_memory.conversation_id(request.json.get('conversation_id'))
+
+    # Navigation intents and common FAQs are answered on the box, no model call needed
+    local = chat_router.match(user_message)
+    if local is not None:
+        chat_memory.record(conversation_id, user_message, local.answer)
+        return jsonify({"text": local.answer, "suggestions": local.suggestions or CHAT_SUGGESTIONS,
+                        "local": local.id, "conversation_id": conversation_id})
+
+    if not chat_gateway.available:
         return jsonify({"text": "AI Assistant is currently unavailable. Please check the server configuration."}), 503
 
+    # Only first turns are cached: with history the answer depends on the whole conversation
+    history = chat_memory.context(conversation_id)
+    cache_key = None if history else response_cache_key(CHAT_PROMPT_VERSION, user_message)
+    if cache_key is not None:
+        cached_text = chat_cache.get(cache_key)
+        if cached_text is not None:
+            chat_memory.record(conversation_id, user_message, cached_text)
+            return jsonify({"text": cached_text, "suggestions": CHAT_SUGGESTIONS, "cached": True,
+                            "conversation_id": conversation_id})
+
+    # The gateway bounds concurrency and time spent on the model, and answers
+    # with a canned reply (degraded=True) when it is overloaded or failing
+    prompt = CHAT_PROMPT_TEMPLATE.format(history=history, user_message=clip(user_message, MAX_MESSAGE_TOKENS))
+    reply = chat_gateway.reply(prompt)
+    if reply.degraded:
+        return jsonify({"text": reply.text, "suggestions": CHAT_SUGGESTIONS, "degraded": True,
+                        "conversation_id": conversation_id})
+    chat_memory.record(conversation_id, user_message, reply.text)
+    if cache_key is not None:
+        chat_cache.set(cache_key, reply.text)
+    return jsonify({"text": reply.text, "suggestions": CHAT_SUGGESTIONS, "conversation_id": conversation_id})
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same as /api/chat, but sends the reply as SSE frames while it is generated."""
     user_message = request.json.get('message')
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
+    conversation_id = chat_memory.conversation_id(request.json.get('conversation_id'))
 
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        # A simple prompt to guide the model's behavior
-        prompt = f"""You are a friendly and helpful healthcare AI assistant. 
-        Your goal is to assist users with their health-related questions.
-        Provide concise, clear, and safe information.
+    local = chat_router.match(user_message)
+    if local is not None:
+        chat_memory.record(conversation_id, user_message, local.answer)
+        return sse_response(reply_frames(local.answer, {
+            "suggestions": local.suggestions or CHAT_SUGGESTIONS, "conversation_id": conversation_id
+        }, local=local.id))
 
-        You are also based in Brunei Darussalam, so include local context when relevant. such as:
-        - Local healthcare facilities
-        - Health regulations in Brunei
-        - Common health concerns in the region
-        
-        Try to keep your messages short, around a short paragraph, with some bulleted lists if needed. Bolden important points.
-        
-        User's question: "{user_message}"
-        """
-        response = model.generate_content(prompt)
-        
-        # Simple response handling
-        ai_text = response.text if hasattr(response, 'text') else "I'm sorry, I couldn't process that request."
-        
-        return jsonify({"text": ai_text, "suggestions": [
-            "Ask about symptoms", "Book an appointment", "Set medication reminder"
-        ]})
+    if not chat_gateway.available:
+        return jsonify({"text": "AI Assistant is currently unavailable. Please check the server configuration."}), 503
 
-    except Exception as e:
-        print(f"Error with Gemini API: {e}")
-        return jsonify({"error": "Failed to get response from AI assistant"}), 500
+    done_payload = {"suggestions": CHAT_SUGGESTIONS, "conversation_id": conversation_id}
+    history = chat_memory.context(conversation_id)
+    cache_key = None if history else response_cache_key(CHAT_PROMPT_VERSION, user_message)
+    if cache_key is not None:
+        cached_text = chat_cache.get(cache_key)
+        if cached_text is not None:
+            chat_memory.record(conversation_id, user_message, cached_text)
+            return sse_response(reply_frames(cached_text, done_payload, cached=True))
+
+    def remember(text):
+        chat_memory.record(conversation_id, user_message, text)
+        if cache_key is not None:
+            chat_cache.set(cache_key, text)
+
+    prompt = CHAT_PROMPT_TEMPLATE.format(history=history, user_message=clip(user_message, MAX_MESSAGE_TOKENS))
+    try:
+        pieces = chat_gateway.stream(prompt)
+    except GatewayUnavailable as e:
+        print(f"⚠️ LLM gateway degraded ({e.reason}), sending fallback reply")
+        return sse_response(reply_frames(chat_gateway.fallback_text, done_payload, degraded=True))
+    return sse_response(stream_chat(
+        pieces, on_complete=remember, done_payload=done_payload, fallback_text=chat_gateway.fallback_text
+    ))
+
+@app.route('/api/chat/stats', methods=['GET'])
+def get_chat_stats():
+    return jsonify({
+        "local": chat_router.stats(),
+        "cache": chat_cache.stats(),
+        "memory": chat_memory.stats(),
+        "gateway": chat_gateway.stats(),
+    })
+
+## Password hashing pool counters and timings
+@app.route('/api/auth/hashing', methods=['GET'])
+def get_hashing_stats():
+    return jsonify(password_hasher.stats())
+
+## Session user cache counters
+@app.route('/api/auth/user-cache', methods=['GET'])
+def get_user_cache_stats():
+    return jsonify(user_cache.stats())
 
 ## Doctors Endpoint
 @app.route('/api/doctors', methods=['GET'])
 def get_doctors():
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
     
@@ -256,13 +443,29 @@ def get_doctors():
     finally:
         conn.close()
 
+## Availability Endpoint
+@app.route('/api/availability', methods=['GET'])
+def get_availability():
+    """Free slots for ?doctor_id= or ?specialization= between ?from= and ?to= (YYYY-MM-DD)."""
+    availability_listener.start()
+    try:
+        return jsonify(availability_payload(availability, request.args))
+    except BadAvailabilityRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except psycopg2.OperationalError as e:
+        print(f"❌ Could not connect to the database: {e}")
+        return jsonify({"error": "Database connection failed"}), 500
+    except Exception as e:
+        print(f"Database Error: {e}")
+        return jsonify({"error": "Failed to compute availability"}), 500
+
 ## Appointments Endpoint - Fixed duplicate route
 @app.route('/api/appointments', methods=['GET', 'POST'])
 def handle_appointments():
     # For demo, assume patient_id = 1
     patient_id = 1
 
-    conn = get_db_connection()
+    conn = get_read_connection() if request.method == 'GET' else get_db_connection()
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
 
@@ -300,8 +503,13 @@ def handle_appointments():
                 )
                 appointment_id = cur.fetchone()['appointment_id']
                 conn.commit()
+            availability.apply(appointment_id, int(doctor_id), appointment_datetime)
             return jsonify({"message": "Appointment booked successfully!", "appointment_id": appointment_id}), 201
 
+    except psycopg2.errors.ExclusionViolation:
+        # The no-double-booking constraint rejected the slot (see init_db.py)
+        conn.rollback()
+        return jsonify(conflict_payload(availability, int(doctor_id), appointment_datetime)), 409
     except Exception as e:
         conn.rollback()
         print(f"Database Error: {e}")
@@ -312,7 +520,7 @@ def handle_appointments():
 ## Medications Endpoint
 @app.route('/api/medications', methods=['GET', 'POST'])
 def handle_medications():
-    conn = get_db_connection()
+    conn = get_read_connection() if request.method == 'GET' else get_db_connection()
     if conn is None: 
         return jsonify({"error": "Database connection failed"}), 500
     
@@ -356,25 +564,64 @@ def handle_medications():
     finally:
         conn.close()
 
+# ---------- List Pagination ----------
+# List endpoints return one keyset page (?limit=, ?cursor=) plus an X-Next-Cursor
+# header; the filters below are applied in SQL.
+# Patient list columns served from patient_summaries (kept current by triggers, see
+# init_db.py). next_appointment is re-probed only when it has slipped into the past.
+PATIENT_SUMMARY_COLUMNS = """
+    COALESCE(s.appointment_count, 0) as total_appointments,
+    COALESCE(s.medication_count, 0) as total_medications,
+    CASE WHEN s.next_appointment IS NULL OR s.next_appointment >= LOCALTIMESTAMP THEN s.next_appointment
+         ELSE (SELECT MIN(a.appointment_date) FROM appointments a
+               WHERE a.patient_id = p.patient_id AND a.status = 'scheduled'
+                 AND a.appointment_date >= LOCALTIMESTAMP)
+    END as next_appointment,
+    s.last_visit
+"""
+
+APPOINTMENT_SORT = [("a.appointment_date", "appointment_date"), ("a.appointment_id", "appointment_id")]
+APPOINTMENT_FILTERS = {
+    "doctor_id": ("a.doctor_id = %s", int),
+    "patient_id": ("a.patient_id = %s", int),
+    "status": ("a.status = %s", str),
+    "date_from": ("a.appointment_date >= %s", parse_date_from),
+    "date_to": ("a.appointment_date < %s", parse_date_to),
+}
+
+PRESCRIPTION_SORT = [("created_at", "created_at"), ("prescription_id", "prescription_id")]
+PRESCRIPTION_FILTERS = {
+    "patient_id": ("patient_id = %s", int),
+    "appointment_id": ("appointment_id = %s", int),
+    "date_from": ("created_at >= %s", parse_date_from),
+    "date_to": ("created_at < %s", parse_date_to),
+}
+
+REMINDER_SORT = [("r.reminder_time", "reminder_time"), ("r.reminder_id", "reminder_id")]
+REMINDER_FILTERS = {
+    "patient_id": ("p.patient_id = %s", int),
+    "prescription_id": ("r.prescription_id = %s", int),
+    "status": ("r.status = %s", str),
+    "date_from": ("r.reminder_time >= %s", parse_date_from),
+    "date_to": ("r.reminder_time < %s", parse_date_to),
+}
+
 # ---------- CLINIC API ROUTES ----------
 
 ## Get all patients for clinic dashboard
 @app.route('/api/patients', methods=['GET'])
 def get_all_patients():
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
     
     try:
         with conn.cursor() as cur:
-            cur.execute("""
+            cur.execute(f"""
                 SELECT p.patient_id, p.first_name, p.last_name, p.email, p.phone, p.dob,
-                       COUNT(a.appointment_id) as total_appointments,
-                       COUNT(pr.prescription_id) as total_medications
+                       {PATIENT_SUMMARY_COLUMNS}
                 FROM patients p
-                LEFT JOIN appointments a ON p.patient_id = a.patient_id
-                LEFT JOIN prescriptions pr ON p.patient_id = pr.patient_id
-                GROUP BY p.patient_id, p.first_name, p.last_name, p.email, p.phone, p.dob
+                LEFT JOIN patient_summaries s ON s.patient_id = p.patient_id
                 ORDER BY p.last_name, p.first_name;
             """)
             patients = cur.fetchall()
@@ -388,13 +635,15 @@ def get_all_patients():
 ## Get all appointments for clinic dashboard
 @app.route('/api/clinic/appointments', methods=['GET'])
 def get_all_appointments():
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
     
+    streaming = False
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
+        page = KeysetPage(request.args, APPOINTMENT_SORT, descending=True, filters=APPOINTMENT_FILTERS)
+        stream_format = requested_stream_format(request.args)
+        sql = f"""
                 SELECT a.appointment_id, a.appointment_date, a.reason, a.status,
                        p.first_name as patient_first_name, p.last_name as patient_last_name,
                        p.email as patient_email, p.phone as patient_phone,
@@ -403,52 +652,41 @@ def get_all_appointments():
                 FROM appointments a
                 JOIN patients p ON a.patient_id = p.patient_id
                 JOIN doctors d ON a.doctor_id = d.doctor_id
-                ORDER BY a.appointment_date DESC;
-            """)
-            appointments = cur.fetchall()
-        return jsonify(appointments)
+                {page.where()}
+                {page.order_by()}
+            """
+
+        if stream_format:
+            response = stream_query(conn, sql, page.params, stream_format)
+            streaming = True
+            return response
+
+        with conn.cursor() as cur:
+            cur.execute(sql + page.limit_clause(), page.params)
+            appointments, next_cursor = page.split(cur.fetchall())
+        return paginated_response(jsonify(appointments), next_cursor)
+    except BadPageRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to fetch appointments"}), 500
     finally:
-        conn.close()
+        if not streaming:
+            conn.close()
 
 ## Get patient details by ID
 @app.route('/api/clinic/patients/<int:patient_id>', methods=['GET'])
 def get_patient_details(patient_id):
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
     
     try:
-        with conn.cursor() as cur:
-            # Get patient basic info
-            cur.execute("SELECT * FROM patients WHERE patient_id = %s", (patient_id,))
-            patient = cur.fetchone()
-            
-            if not patient:
-                return jsonify({"error": "Patient not found"}), 404
-            
-            # Get patient appointments
-            cur.execute("""
-                SELECT a.*, d.first_name as doctor_first_name, d.last_name as doctor_last_name,
-                       d.specialization
-                FROM appointments a
-                JOIN doctors d ON a.doctor_id = d.doctor_id
-                WHERE a.patient_id = %s
-                ORDER BY a.appointment_date DESC;
-            """, (patient_id,))
-            appointments = cur.fetchall()
-            
-            # Get patient medications
-            cur.execute("SELECT * FROM prescriptions WHERE patient_id = %s ORDER BY created_at DESC", (patient_id,))
-            medications = cur.fetchall()
-            
-            return jsonify({
-                "patient": patient,
-                "appointments": appointments,
-                "medications": medications
-            })
+        # Patient, appointments and medications in one query; 304 if the client's copy is current
+        response = patient_detail_response(conn, patient_id, request, "to_jsonb(p) - 'password_hash'")
+        if response is None:
+            return jsonify({"error": "Patient not found"}), 404
+        return response
             
     except Exception as e:
         print(f"Database Error: {e}")
@@ -489,9 +727,13 @@ def add_appointment_popup():
             )
             new_id = cur.fetchone()['appointment_id']
             conn.commit()
+        availability.apply(new_id, doctor_id, appointment_datetime)
 
         return jsonify({"message": "Appointment added successfully!", "appointment_id": new_id}), 201
 
+    except psycopg2.errors.ExclusionViolation:
+        conn.rollback()
+        return jsonify(conflict_payload(availability, doctor_id, appointment_datetime)), 409
     except Exception as e:
         conn.rollback()
         print(f"Database Error: {e}")
@@ -515,13 +757,22 @@ def update_appointment_status(appointment_id):
             
         with conn.cursor() as cur:
             cur.execute(
-                "UPDATE appointments SET status = %s WHERE appointment_id = %s",
+                "UPDATE appointments SET status = %s WHERE appointment_id = %s "
+                "RETURNING doctor_id, appointment_date",
                 (status, appointment_id)
             )
+            updated = cur.fetchone()
             conn.commit()
+        if updated:
+            # Cancelling frees the slot again
+            availability.apply(appointment_id, updated['doctor_id'], updated['appointment_date'], status)
             
         return jsonify({"message": "Appointment status updated successfully"})
         
+    except psycopg2.errors.ExclusionViolation:
+        # Re-scheduling a cancelled appointment whose slot has since been taken
+        conn.rollback()
+        return jsonify({"error": "That time has been booked by someone else since this appointment was cancelled."}), 409
     except Exception as e:
         conn.rollback()
         print(f"Database Error: {e}")
@@ -531,13 +782,14 @@ def update_appointment_status(appointment_id):
 
 @app.route('/api/reminders', methods=['GET'])
 def get_all_reminders():
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
     
     try:
+        page = KeysetPage(request.args, REMINDER_SORT, filters=REMINDER_FILTERS)
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
                 r.reminder_id,
                 r.prescription_id,
@@ -547,16 +799,39 @@ def get_all_reminders():
                 p.dosage
             FROM reminders r
             JOIN prescriptions p ON r.prescription_id = p.prescription_id
-            ORDER BY r.reminder_time ASC
-        """)
-        reminders = cursor.fetchall()
+            {page.where()}
+            {page.order_by()}
+            {page.limit_clause()}
+        """, page.params)
+        reminders, next_cursor = page.split(cursor.fetchall())
         cursor.close()
-        conn.close()
-        return jsonify(reminders), 200
+        return paginated_response(jsonify(reminders), next_cursor), 200
+    except BadPageRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print("Error fetching reminders:", e)
         return jsonify({"error": "Failed to fetch reminders"}), 500
-    
+    finally:
+        conn.close()
+
+
+## Connection pool counters
+@app.route('/api/db/pool', methods=['GET'])
+def get_pool_stats():
+    return jsonify(db_pool.stats())
+
+## Read replica routing counters
+@app.route('/api/db/reads', methods=['GET'])
+def get_read_routing_stats():
+    return jsonify(read_router.stats())
+
+## Slow Query Log Endpoint
+# Plans can contain literal values from the query, so only local requests may read them
+@app.route('/api/db/slow-queries', methods=['GET'])
+def get_slow_queries():
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "Slow query log is only available locally"}), 403
+    return jsonify({"stats": slow_queries.stats(), "queries": slow_queries.entries()})
 
 # ---------- Delete Medication ----------
 @app.route('/api/medications/<int:medication_id>', methods=['DELETE'])
@@ -588,13 +863,15 @@ def delete_medication(medication_id):
 
 @app.route('/api/prescriptions', methods=['GET'])
 def get_all_prescriptions():
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
 
+    streaming = False
     try:
-        with conn.cursor() as cur:
-            cur.execute('''
+        page = KeysetPage(request.args, PRESCRIPTION_SORT, descending=True, filters=PRESCRIPTION_FILTERS)
+        stream_format = requested_stream_format(request.args)
+        sql = f'''
                 SELECT 
                     prescription_id,
                     patient_id,
@@ -602,40 +879,34 @@ def get_all_prescriptions():
                     medication_name,
                     dosage,
                     frequency,
-                    reminder_times,
+                    -- Rows are served as they come; anything but a JSON array reads as no times
+                    CASE WHEN jsonb_typeof(reminder_times) = 'array' THEN reminder_times ELSE '[]'::jsonb END AS reminder_times,
                     created_at
                 FROM prescriptions
-                ORDER BY created_at DESC;
-            ''')
-            rows = cur.fetchall()
-
-        prescriptions = []
-        for row in rows:
-            reminder_times = row['reminder_times']
-            if isinstance(reminder_times, str):
-                try:
-                    reminder_times = json.loads(reminder_times)
-                except Exception as e:
-                    print(f"Error parsing reminder_times for prescription {row['prescription_id']}: {e}")
-                    reminder_times = []
-
-            prescriptions.append({
-                "prescription_id": row['prescription_id'],
-                "patient_id": row['patient_id'],
-                "appointment_id": row['appointment_id'],
-                "medication_name": row['medication_name'],
-                "dosage": row['dosage'],
-                "frequency": row['frequency'],
-                "reminder_times": reminder_times,
-                "created_at": row['created_at'].isoformat() if row['created_at'] else None
-            })
-
-        return jsonify(prescriptions)
+                {page.where()}
+                {page.order_by()}
+            '''
+
+        if stream_format:
+            # ?stream=json|ndjson sends every matching row in batches instead of one page
+            response = stream_query(conn, sql, page.params, stream_format)
+            streaming = True
+            return response
+
+        with conn.cursor() as cur:
+            cur.execute(sql + page.limit_clause(), page.params)
+            rows, next_cursor = page.split(cur.fetchall())
+
+        return paginated_response(jsonify(rows), next_cursor)
+    except BadPageRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error fetching prescriptions: {e}")
         return jsonify({"error": "Failed to fetch prescriptions"}), 500
     finally:
-        conn.close()
+        # A streamed response closes the connection once the last batch is sent
+        if not streaming:
+            conn.close()
 
 # ---------- Main Execution Block ----------
 if __name__ == "__main__":
@@ -0,0 +1,552 @@
+"""Fills the database with synthetic doctors, patients, appointments, prescriptions and reminders.
+
+    python generate_data.py                                    # a small dataset (see --help)
+    python generate_data.py --doctors 2000 --patients 1000000 --appointments 20000000 \\
+        --prescriptions 20000000 --reminders 20000000 --history-days 3650 --jobs 8
+    python generate_data.py --dry-run --appointments 5000000   # print the plan only
+
+For development and load testing only. Rows are added after the data already
+there, with ids taken from the current maximum, so nothing else may write to
+these tables while it runs. The work is split into tasks (blocks of patients,
+then one task per doctor with that doctor's appointments, prescriptions and
+reminders), and --jobs processes generate rows and COPY them over their own
+connections in parallel.
+
+User triggers (summary counters and change notifications) on the loaded tables
+are disabled during the load and re-enabled afterwards. Then the patient
+summaries are rebuilt in one pass, the sequences are moved past the new ids,
+the tables are ANALYZEd and one IMPORT notification per table tells running
+apps to reload.
+
+Each doctor works 30 minute slots on their available_days and available_hours
+and is never double booked. Appointments fall between --history-days ago and
+--future-days ahead. If the doctors cannot fit all the appointments in that
+window the plan is rejected before anything is written.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import bcrypt
+import psycopg2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.availability import SLOT_MINUTES, WEEKDAYS
+from shared.passwords import BCRYPT_ROUNDS, PLACEHOLDER_PASSWORD
+
+from init_db import DB_CONFIG, MIGRATIONS
+
+PATIENTS_PER_TASK = 50000
+# Lines buffered before each COPY round trip
+COPY_BATCH = 50000
+
+# (table, id column); loaded in this order
+TABLES = [
+    ("doctors", "doctor_id"),
+    ("patients", "patient_id"),
+    ("appointments", "appointment_id"),
+    ("prescriptions", "prescription_id"),
+    ("reminders", "reminder_id"),
+]
+# Tables whose user triggers (summaries, notifications) are disabled during the load
+TRIGGER_TABLES = ("doctors", "patients", "appointments", "prescriptions")
+
+FIRST_NAMES = [
+    "Aisyah", "Nur", "Siti", "Amelia", "Charlotte", "Hana", "Mei", "Priya", "Farah", "Grace",
+    "Ahmad", "Muhammad", "Hafiz", "Benny", "John", "Wei", "Arjun", "Daniel", "Haziq", "Kevin",
+    "Lina", "Zara", "Irfan", "Rahul", "Jia", "Aiman", "Sofia", "Adam", "Yusuf", "Chloe",
+]
+LAST_NAMES = [
+    "Tan", "Chen", "Lim", "Wong", "Lee", "Ng", "Ong", "Goh", "Abdullah", "Rahman",
+    "Hassan", "Ismail", "Yusof", "Ibrahim", "Kumar", "Singh", "Pillai", "Doe", "Smith", "Ali",
+]
+
+# (specialization, weight, typical reasons)
+SPECIALIZATIONS = [
+    ("General Practice", 30, ["Fever and cough", "Annual checkup", "Sore throat", "Follow-up visit", "Vaccination"]),
+    ("Cardiology", 8, ["Routine heart checkup", "Chest pain", "Blood pressure review", "ECG follow-up"]),
+    ("Dermatology", 8, ["Skin rash consultation", "Acne treatment", "Eczema flare-up", "Mole check"]),
+    ("Pediatrics", 12, ["Pediatric checkup", "Child vaccination", "Fever in child", "Growth assessment"]),
+    ("Orthopedics", 7, ["Knee pain", "Back pain", "Fracture follow-up", "Sports injury"]),
+    ("Endocrinology", 6, ["Diabetes review", "Thyroid check", "HbA1c follow-up"]),
+    ("Obstetrics & Gynecology", 8, ["Prenatal visit", "Postnatal checkup", "Routine screening"]),
+    ("ENT", 5, ["Ear infection", "Sinusitis", "Hearing check"]),
+    ("Psychiatry", 4, ["Initial assessment", "Medication review", "Follow-up session"]),
+    ("Ophthalmology", 5, ["Eye examination", "Blurred vision", "Glaucoma follow-up"]),
+]
+
+# (weekdays, weight): most doctors keep a few fixed clinic days
+DAY_PATTERNS = [
+    (["Monday", "Wednesday", "Friday"], 25),
+    (["Tuesday", "Thursday"], 20),
+    (["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"], 25),
+    (["Monday", "Tuesday", "Thursday"], 10),
+    (["Wednesday", "Friday", "Saturday"], 10),
+    (["Tuesday", "Thursday", "Saturday"], 10),
+]
+# (start, end, weight)
+HOUR_PATTERNS = [
+    ("08:00", "16:00", 25),
+    ("08:30", "16:30", 20),
+    ("09:00", "17:00", 35),
+    ("10:00", "18:00", 15),
+    ("14:00", "20:00", 5),
+]
+
+# (name, dosage, frequency, reminder_times)
+MEDICATIONS = [
+    ("Paracetamol", "500mg", "Every 6 hours", ["08:00", "14:00", "20:00"]),
+    ("Amoxicillin", "500mg", "Three times daily", ["08:00", "14:00", "20:00"]),
+    ("Atenolol", "50mg", "Once daily", ["08:00"]),
+    ("Amlodipine", "5mg", "Once daily", ["09:00"]),
+    ("Metformin", "500mg", "Twice daily", ["08:00", "20:00"]),
+    ("Atorvastatin", "20mg", "Once daily at night", ["21:00"]),
+    ("Omeprazole", "20mg", "Once daily before breakfast", ["07:30"]),
+    ("Cetirizine", "10mg", "Once daily", ["20:00"]),
+    ("Hydrocortisone Cream", "Apply thin layer", "Twice daily", ["09:00", "21:00"]),
+    ("Salbutamol Inhaler", "2 puffs", "As needed", ["08:00"]),
+    ("Levothyroxine", "50mcg", "Once daily", ["07:00"]),
+    ("Ibuprofen", "400mg", "Twice daily after meals", ["09:00", "21:00"]),
+]
+
+# Status mixes for appointments before and after now, and for past reminders
+PAST_APPOINTMENT_STATUSES = (["completed", "cancelled", "scheduled"], [82, 13, 5])
+FUTURE_APPOINTMENT_STATUSES = (["scheduled", "cancelled"], [92, 8])
+PAST_REMINDER_STATUSES = (["sent", "dismissed", "missed"], [75, 15, 10])
+
+
+def split(total, weights):
+    """Splits ``total`` in proportion to ``weights`` (largest remainder)."""
+    weight_sum = sum(weights)
+    if total <= 0 or weight_sum <= 0:
+        return [0] * len(weights)
+    exact = [total * w / weight_sum for w in weights]
+    counts = [int(x) for x in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def allocate(total, weights, capacities):
+    """Like split(), but no share exceeds its capacity; the overflow goes to the others.
+
+    Returns None when the capacities cannot hold ``total``.
+    """
+    if total > sum(capacities):
+        return None
+    counts = [0] * len(weights)
+    remaining = total
+    active = [i for i, cap in enumerate(capacities) if cap > 0]
+    while remaining:
+        shares = split(remaining, [weights[i] for i in active])
+        for i, share in zip(active, shares):
+            take = min(share, capacities[i] - counts[i])
+            counts[i] += take
+            remaining -= take
+        active = [i for i in active if counts[i] < capacities[i]]
+    return counts
+
+
+def working_days(days, first_day, last_day):
+    """Dates from ``first_day`` to ``last_day`` that fall on one of ``days``."""
+    weekdays = {WEEKDAYS.index(d) for d in days}
+    span = (last_day - first_day).days + 1
+    return [d for d in (first_day + timedelta(n) for n in range(span)) if d.weekday() in weekdays]
+
+
+def slots_per_day(start, end):
+    start_h, start_m = map(int, start.split(":"))
+    end_h, end_m = map(int, end.split(":"))
+    return max(0, ((end_h * 60 + end_m) - (start_h * 60 + start_m)) // SLOT_MINUTES)
+
+
+def _connect():
+    conn = psycopg2.connect(**DB_CONFIG)
+    with conn.cursor() as cur:
+        # A lost tail after a crash is fine for generated data
+        cur.execute("SET synchronous_commit = off")
+    return conn
+
+
+class CopyWriter:
+    """Buffers tab-separated lines and sends them with COPY every COPY_BATCH lines."""
+
+    def __init__(self, cur, table, columns):
+        self.cur = cur
+        self.sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        self.lines = []
+        self.rows = 0
+
+    def add(self, *values):
+        self.lines.append("\t".join(r"\N" if v is None else str(v) for v in values))
+        if len(self.lines) >= COPY_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.cur.copy_expert(self.sql, io.StringIO("\n".join(self.lines) + "\n"))
+            self.rows += len(self.lines)
+            self.lines = []
+
+
+# ---------- Tasks (run in worker processes) ----------
+def load_patients(task):
+    """Generates and copies patients ``first_id``..``first_id + count - 1``."""
+    rng = random.Random(f"{task['seed']}-patients-{task['first_id']}")
+    now = datetime.fromisoformat(task["now"])
+    today = now.date()
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            patients = CopyWriter(cur, "patients", [
+                "patient_id", "first_name", "last_name", "email", "password_hash", "phone", "dob", "created_at"])
+            for patient_id in range(task["first_id"], task["first_id"] + task["count"]):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                # Ages skew towards adults, with a tail of children and elderly patients
+                age_days = int(min(max(rng.gauss(42, 20), 0.1), 95) * 365.25)
+                patients.add(
+                    patient_id, first, last,
+                    f"{first.lower()}.{last.lower()}.{patient_id}@example.com",
+                    task["password_hash"],
+                    f"+673 {rng.randint(7000000, 8999999)}",
+                    today - timedelta(days=age_days),
+                    now - timedelta(minutes=rng.randint(0, task["history_days"] * 1440)),
+                )
+            patients.flush()
+        conn.commit()
+        return {"patients": patients.rows}
+    finally:
+        conn.close()
+
+
+def load_doctor(task):
+    """Generates and copies one doctor's appointments and their prescriptions and reminders."""
+    rng = random.Random(f"{task['seed']}-doctor-{task['doctor_id']}")
+    now = datetime.fromisoformat(task["now"])
+    days = working_days(task["days"], date.fromisoformat(task["first_day"]), date.fromisoformat(task["last_day"]))
+    per_day = slots_per_day(task["start"], task["end"])
+    start_h, start_m = map(int, task["start"].split(":"))
+    reasons = task["reasons"]
+    patient_base, patient_count = task["patient_base"], task["patient_count"]
+
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            appointments = CopyWriter(cur, "appointments", [
+                "appointment_id", "patient_id", "doctor_id", "appointment_date", "reason", "status", "created_at"])
+            visits = []  # (appointment_id, patient_id, appointment_date) of past, completed visits
+            others = []
+            appointment_id = task["first_appointment_id"]
+            for slot in sorted(rng.sample(range(len(days) * per_day), task["appointments"])):
+                day = days[slot // per_day]
+                at = datetime(day.year, day.month, day.day, start_h, start_m) + timedelta(
+                    minutes=(slot % per_day) * SLOT_MINUTES)
+                # A few patients visit far more often than the rest
+                patient_id = patient_base + 1 + int(patient_count * rng.random() ** 2)
+                statuses, weights = PAST_APPOINTMENT_STATUSES if at < now else FUTURE_APPOINTMENT_STATUSES
+                status = rng.choices(statuses, weights)[0]
+                booked = min(now, at - timedelta(minutes=rng.randint(60, 45 * 1440)))
+                appointments.add(appointment_id, patient_id, task["doctor_id"], at, rng.choice(reasons), status, booked)
+                (visits if status == "completed" else others).append((appointment_id, patient_id, at))
+                appointment_id += 1
+            appointments.flush()
+
+            prescriptions = CopyWriter(cur, "prescriptions", [
+                "prescription_id", "patient_id", "appointment_id", "medication_name", "dosage", "frequency",
+                "reminder_times", "created_at"])
+            reminders = CopyWriter(cur, "reminders", [
+                "reminder_id", "prescription_id", "reminder_time", "status", "created_at"])
+            sources = visits or others
+            per_prescription = split(task["reminders"], [1] * task["prescriptions"])
+            rng.shuffle(per_prescription)
+            prescription_id = task["first_prescription_id"]
+            reminder_id = task["first_reminder_id"]
+            for count in per_prescription:
+                visit_id, patient_id, at = rng.choice(sources)
+                name, dosage, frequency, times = rng.choice(MEDICATIONS)
+                written = at + timedelta(minutes=rng.randint(10, 60))
+                prescriptions.add(prescription_id, patient_id, visit_id, name, dosage, frequency,
+                                  json.dumps(times), written)
+                # One reminder per dose, day after day from the day after the visit
+                day = written.date() + timedelta(days=1)
+                while count > 0:
+                    for hhmm in times[:count]:
+                        hours, minutes = map(int, hhmm.split(":"))
+                        due = datetime(day.year, day.month, day.day, hours, minutes)
+                        if due < now:
+                            statuses, weights = PAST_REMINDER_STATUSES
+                            status = rng.choices(statuses, weights)[0]
+                        else:
+                            status = "pending"
+                        reminders.add(reminder_id, prescription_id, due, status, written)
+                        reminder_id += 1
+                    count -= len(times)
+                    day += timedelta(days=1)
+                prescription_id += 1
+            prescriptions.flush()
+            reminders.flush()
+        conn.commit()
+        return {"appointments": appointments.rows, "prescriptions": prescriptions.rows, "reminders": reminders.rows}
+    finally:
+        conn.close()
+
+
+# ---------- Planning ----------
+def make_doctors(count, first_id, rng):
+    doctors = []
+    for doctor_id in range(first_id, first_id + count):
+        specialization, _, reasons = rng.choices(SPECIALIZATIONS, [s[1] for s in SPECIALIZATIONS])[0]
+        days = rng.choices([p[0] for p in DAY_PATTERNS], [p[1] for p in DAY_PATTERNS])[0]
+        start, end, _ = rng.choices(HOUR_PATTERNS, [p[2] for p in HOUR_PATTERNS])[0]
+        doctors.append({
+            "doctor_id": doctor_id,
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "specialization": specialization,
+            "phone": f"+673 22{rng.randint(10000, 99999)}",
+            "days": days,
+            "start": start,
+            "end": end,
+            "reasons": reasons,
+            # Some doctors are much busier than others
+            "popularity": rng.lognormvariate(0, 0.6),
+        })
+    return doctors
+
+
+def plan(args, bases, now):
+    """Doctors plus the patient and per-doctor tasks, or raises ValueError if it cannot fit."""
+    rng = random.Random(f"{args.seed}-plan")
+    first_day = now.date() - timedelta(days=args.history_days)
+    last_day = now.date() + timedelta(days=args.future_days)
+    doctors = make_doctors(args.doctors, bases["doctors"] + 1, rng)
+
+    capacities = [len(working_days(d["days"], first_day, last_day)) * slots_per_day(d["start"], d["end"])
+                  for d in doctors]
+    appointment_counts = allocate(args.appointments, [d["popularity"] for d in doctors], capacities)
+    if appointment_counts is None:
+        raise ValueError(
+            f"{args.doctors} doctors have only {sum(capacities):,} free slots in the "
+            f"{args.history_days + args.future_days} day window for {args.appointments:,} appointments; "
+            f"add --doctors or raise --history-days")
+    prescription_counts = split(args.prescriptions, appointment_counts)
+    reminder_counts = split(args.reminders, prescription_counts)
+
+    common = {"seed": args.seed, "now": now.isoformat(), "history_days": args.history_days}
+    patient_tasks = [
+        dict(common, first_id=first, count=min(PATIENTS_PER_TASK, bases["patients"] + args.patients + 1 - first))
+        for first in range(bases["patients"] + 1, bases["patients"] + args.patients + 1, PATIENTS_PER_TASK)
+    ]
+    doctor_tasks = []
+    next_ids = {"appointments": bases["appointments"] + 1, "prescriptions": bases["prescriptions"] + 1,
+                "reminders": bases["reminders"] + 1}
+    for doctor, appointments, prescriptions, reminders in zip(
+            doctors, appointment_counts, prescription_counts, reminder_counts):
+        if not appointments:
+            continue
+        doctor_tasks.append(dict(
+            common,
+            doctor_id=doctor["doctor_id"], days=doctor["days"], start=doctor["start"], end=doctor["end"],
+            reasons=doctor["reasons"], first_day=first_day.isoformat(), last_day=last_day.isoformat(),
+            patient_base=bases["patients"], patient_count=args.patients,
+            appointments=appointments, prescriptions=prescriptions, reminders=reminders,
+            first_appointment_id=next_ids["appointments"],
+            first_prescription_id=next_ids["prescriptions"],
+            first_reminder_id=next_ids["reminders"],
+        ))
+        next_ids["appointments"] += appointments
+        next_ids["prescriptions"] += prescriptions
+        next_ids["reminders"] += reminders
+    # Biggest first, so one large doctor does not finish alone at the end
+    doctor_tasks.sort(key=lambda t: t["appointments"] + t["prescriptions"] + t["reminders"], reverse=True)
+    return doctors, patient_tasks, doctor_tasks
+
+
+# ---------- Loading ----------
+# Rebuilds the summaries of the generated patients in one set-based pass
+# (their triggers were off while the rows went in)
+REBUILD_PATIENT_SUMMARIES = '''
+INSERT INTO patient_summaries (patient_id, appointment_count, medication_count, next_appointment, last_visit)
+SELECT p.patient_id, COALESCE(a.total, 0), COALESCE(pr.total, 0), a.next_appointment, a.last_visit
+FROM patients p
+LEFT JOIN (
+    SELECT patient_id,
+           COUNT(*) AS total,
+           MIN(appointment_date) FILTER (WHERE status = 'scheduled' AND appointment_date >= LOCALTIMESTAMP)
+               AS next_appointment,
+           MAX(appointment_date) FILTER (WHERE status = 'completed') AS last_visit
+    FROM appointments WHERE patient_id > %(base)s GROUP BY patient_id
+) a ON a.patient_id = p.patient_id
+LEFT JOIN (
+    SELECT patient_id, COUNT(*) AS total FROM prescriptions WHERE patient_id > %(base)s GROUP BY patient_id
+) pr ON pr.patient_id = p.patient_id
+WHERE p.patient_id > %(base)s
+ON CONFLICT (patient_id) DO UPDATE SET
+    appointment_count = EXCLUDED.appointment_count,
+    medication_count = EXCLUDED.medication_count,
+    next_appointment = EXCLUDED.next_appointment,
+    last_visit = EXCLUDED.last_visit,
+    updated_at = CURRENT_TIMESTAMP;
+'''
+
+
+def run_tasks(executor, fn, tasks, totals, label):
+    """Runs ``tasks`` on the pool, adding their row counts to ``totals``. Returns False if any failed."""
+    ok = True
+    started = time.monotonic()
+    futures = [executor.submit(fn, task) for task in tasks]
+    for done, future in enumerate(as_completed(futures), 1):
+        try:
+            for table, rows in future.result().items():
+                totals[table] += rows
+        except Exception as e:
+            ok = False
+            print(f"❌ A {label} task failed: {e}")
+        if done % max(1, len(futures) // 20) == 0 or done == len(futures):
+            rows = sum(totals.values())
+            elapsed = time.monotonic() - started
+            print(f"  {label}: {done}/{len(futures)} tasks, {rows:,} rows in total, {elapsed:.0f}s")
+    return ok
+
+
+def finish(conn, patient_base, loaded):
+    """Moves the sequences past the new ids, rebuilds summaries, analyzes and notifies."""
+    with conn.cursor() as cur:
+        for table, column in TABLES:
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                f"COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false)"
+            )
+        print("Rebuilding patient summaries...")
+        cur.execute(REBUILD_PATIENT_SUMMARIES, {"base": patient_base})
+        for table, _ in TABLES:
+            if loaded.get(table):
+                cur.execute(
+                    "SELECT pg_notify('clinic_changes', %s)",
+                    (json.dumps({"table": table, "op": "IMPORT", "id": None}),)
+                )
+    conn.commit()
+    print("Analyzing...")
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for table, _ in TABLES:
+            cur.execute(f"ANALYZE {table}")
+        cur.execute("ANALYZE patient_summaries")
+    conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0], formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--appointments", type=int, default=200000)
+    parser.add_argument("--prescriptions", type=int, default=100000)
+    parser.add_argument("--reminders", type=int, default=400000)
+    parser.add_argument("--history-days", type=int, default=730, help="appointments start this many days ago")
+    parser.add_argument("--future-days", type=int, default=90, help="and run until this many days ahead")
+    parser.add_argument("--jobs", type=int, default=min(8, os.cpu_count() or 1), help="parallel COPY streams")
+    parser.add_argument("--seed", type=int, default=42, help="same seed, same data")
+    parser.add_argument("--password", default=PLACEHOLDER_PASSWORD, help="login password of every generated patient")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan and exit")
+    args = parser.parse_args()
+
+    counts = [args.doctors, args.patients, args.appointments, args.prescriptions, args.reminders,
+              args.history_days, args.future_days]
+    if min(counts) < 0 or args.jobs < 1:
+        parser.error("counts, days and --jobs must not be negative (and --jobs at least 1)")
+    if args.appointments and not (args.doctors and args.patients):
+        parser.error("appointments need at least one doctor and one patient")
+    if args.prescriptions and not args.appointments:
+        parser.error("prescriptions need appointments")
+    if args.reminders and not args.prescriptions:
+        parser.error("reminders need prescriptions")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            version = cur.fetchone()[0]
+            if version < MIGRATIONS[-1][0]:
+                print(f"❌ Schema is at version {version}; run python init_db.py first.")
+                sys.exit(1)
+            bases = {}
+            for table, column in TABLES:
+                cur.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+                bases[table] = cur.fetchone()[0]
+        conn.rollback()
+
+        now = datetime.now().replace(second=0, microsecond=0)
+        try:
+            doctors, patient_tasks, doctor_tasks = plan(args, bases, now)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+        print(f"Plan: {args.doctors:,} doctors, {args.patients:,} patients, {args.appointments:,} appointments, "
+              f"{args.prescriptions:,} prescriptions, {args.reminders:,} reminders "
+              f"({len(patient_tasks) + len(doctor_tasks)} tasks on {args.jobs} streams)")
+        if args.dry_run:
+            busiest = doctor_tasks[0]["appointments"] if doctor_tasks else 0
+            print(f"  ids start after {bases}; busiest doctor has {busiest:,} appointments")
+            return
+
+        password_hash = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("utf-8")
+        for task in patient_tasks:
+            task["password_hash"] = password_hash
+
+        started = time.monotonic()
+        totals = {table: 0 for table, _ in TABLES}
+        with conn.cursor() as cur:
+            for table in TRIGGER_TABLES:
+                cur.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+        conn.commit()
+        ok = False
+        try:
+            with conn.cursor() as cur:
+                doctor_rows = CopyWriter(cur, "doctors", [
+                    "doctor_id", "first_name", "last_name", "specialization", "phone",
+                    "available_days", "available_hours", "created_at"])
+                for d in doctors:
+                    doctor_rows.add(d["doctor_id"], d["first_name"], d["last_name"], d["specialization"], d["phone"],
+                                    json.dumps(d["days"]), json.dumps({"start": d["start"], "end": d["end"]}),
+                                    now - timedelta(days=args.history_days))
+                doctor_rows.flush()
+            conn.commit()
+            totals["doctors"] = doctor_rows.rows
+
+            with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                ok = run_tasks(executor, load_patients, patient_tasks, totals, "patients")
+                if ok:
+                    ok = run_tasks(executor, load_doctor, doctor_tasks, totals, "appointments")
+        finally:
+            conn.rollback()
+            with conn.cursor() as cur:
+                for table in TRIGGER_TABLES:
+                    cur.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+            conn.commit()
+            finish(conn, bases["patients"], totals)
+
+        elapsed = time.monotonic() - started
+        rows = sum(totals.values())
+        summary = ", ".join(f"{n:,} {table}" for table, n in totals.items())
+        if not ok:
+            print(f"⚠️ Some tasks failed; loaded {summary} in {elapsed:.0f}s")
+            sys.exit(1)
+        print(f"✅ Loaded {summary} in {elapsed:.0f}s ({rows / max(elapsed, 0.001):,.0f} rows/s)")
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
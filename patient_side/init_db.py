@@ -1,5 +1,7 @@
 import psycopg2
 import os
+import re
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,14 +18,22 @@ DB_CONFIG = {
 
 # ----------  Table Creation Queries ----------
 
-# -- Drop existing tables to ensure a clean slate
+# -- Drop existing tables (only used by `python init_db.py --reset`)
 DROP_TABLES = '''
-DROP TABLE IF EXISTS reminders, prescriptions, appointments, doctors, patients CASCADE;
+DROP TABLE IF EXISTS schema_migrations, patient_summaries, reminders, prescriptions, appointments, doctors, patients CASCADE;
 '''
 
+# -- Tracks which numbered migrations have been applied
+CREATE_TABLE_SCHEMA_MIGRATIONS = '''
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);'''
+
 # -- Patients (for future login/signup functionality)
 CREATE_TABLE_PATIENTS = '''
-CREATE TABLE patients (
+CREATE TABLE IF NOT EXISTS patients (
     patient_id SERIAL PRIMARY KEY,
     first_name VARCHAR(50) NOT NULL,
     last_name VARCHAR(50) NOT NULL,
@@ -36,7 +46,7 @@ CREATE TABLE patients (
 
 # -- Doctors
 CREATE_TABLE_DOCTORS = '''
-CREATE TABLE doctors (
+CREATE TABLE IF NOT EXISTS doctors (
     doctor_id SERIAL PRIMARY KEY,
     first_name VARCHAR(50) NOT NULL,
     last_name VARCHAR(50) NOT NULL,
@@ -49,7 +59,7 @@ CREATE TABLE doctors (
 
 # -- Appointments (Updated with Foreign Keys)
 CREATE_TABLE_APPOINTMENT = '''
-CREATE TABLE appointments (
+CREATE TABLE IF NOT EXISTS appointments (
     appointment_id SERIAL PRIMARY KEY,
     patient_id INT REFERENCES patients(patient_id) ON DELETE CASCADE,
     doctor_id INT REFERENCES doctors(doctor_id) ON DELETE SET NULL,
@@ -61,7 +71,7 @@ CREATE TABLE appointments (
 
 # -- Prescriptions (Updated with Foreign Keys)
 CREATE_TABLE_PRESCRIPTIONS = '''
-CREATE TABLE prescriptions (
+CREATE TABLE IF NOT EXISTS prescriptions (
     prescription_id SERIAL PRIMARY KEY,
     patient_id INT REFERENCES patients(patient_id) ON DELETE CASCADE,
     appointment_id INT REFERENCES appointments(appointment_id) ON DELETE SET NULL,
@@ -74,11 +84,11 @@ CREATE TABLE prescriptions (
 
 # -- Reminders (Updated with Foreign Keys)
 CREATE_TABLE_REMINDERS = '''
-CREATE TABLE reminders (
+CREATE TABLE IF NOT EXISTS reminders (
     reminder_id SERIAL PRIMARY KEY,
     prescription_id INT REFERENCES prescriptions(prescription_id) ON DELETE CASCADE,
     reminder_time TIMESTAMP NOT NULL,
-    status VARCHAR(20) DEFAULT 'pending', -- pending, sent, dismissed
+    status VARCHAR(20) DEFAULT 'pending', -- pending, sent, dismissed, missed
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );'''
 
@@ -124,34 +134,415 @@ INSERT INTO reminders (prescription_id, reminder_time, status) VALUES
 '''
 
 
+# ---------- Patient Summaries ----------
+# One row per patient with counters kept current by triggers, so patient lists
+# read a single row instead of aggregating appointments x prescriptions.
+CREATE_TABLE_PATIENT_SUMMARIES = '''
+CREATE TABLE IF NOT EXISTS patient_summaries (
+    patient_id INT PRIMARY KEY REFERENCES patients(patient_id) ON DELETE CASCADE,
+    appointment_count INT NOT NULL DEFAULT 0,
+    medication_count INT NOT NULL DEFAULT 0,
+    next_appointment TIMESTAMP, -- earliest scheduled appointment that was upcoming at the last write
+    last_visit TIMESTAMP, -- latest completed appointment
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);'''
+
+# -- Recomputes next/last appointment for one patient (two index probes)
+CREATE_FUNCTION_REFRESH_PATIENT_SCHEDULE = '''
+CREATE OR REPLACE FUNCTION refresh_patient_schedule(pid INT) RETURNS VOID AS $$
+    UPDATE patient_summaries SET
+        next_appointment = (
+            SELECT MIN(appointment_date) FROM appointments
+            WHERE patient_id = pid AND status = 'scheduled' AND appointment_date >= LOCALTIMESTAMP
+        ),
+        last_visit = (
+            SELECT MAX(appointment_date) FROM appointments
+            WHERE patient_id = pid AND status = 'completed'
+        ),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE patient_id = pid;
+$$ LANGUAGE sql;'''
+
+CREATE_FUNCTION_SUMMARY_PATIENTS = '''
+CREATE OR REPLACE FUNCTION patient_summary_on_patient() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO patient_summaries (patient_id) VALUES (NEW.patient_id)
+    ON CONFLICT (patient_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;'''
+
+CREATE_FUNCTION_SUMMARY_APPOINTMENTS = '''
+CREATE OR REPLACE FUNCTION patient_summary_on_appointment() RETURNS TRIGGER AS $$
+DECLARE
+    moved BOOLEAN := TG_OP = 'UPDATE' AND NEW.patient_id IS DISTINCT FROM OLD.patient_id;
+BEGIN
+    IF TG_OP = 'DELETE' OR moved THEN
+        IF OLD.patient_id IS NOT NULL THEN
+            UPDATE patient_summaries SET appointment_count = appointment_count - 1
+            WHERE patient_id = OLD.patient_id;
+            PERFORM refresh_patient_schedule(OLD.patient_id);
+        END IF;
+    END IF;
+    IF TG_OP = 'INSERT' OR moved THEN
+        IF NEW.patient_id IS NOT NULL THEN
+            INSERT INTO patient_summaries (patient_id, appointment_count) VALUES (NEW.patient_id, 1)
+            ON CONFLICT (patient_id) DO UPDATE
+            SET appointment_count = patient_summaries.appointment_count + 1;
+        END IF;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        IF NEW.patient_id IS NOT NULL THEN
+            PERFORM refresh_patient_schedule(NEW.patient_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;'''
+
+CREATE_FUNCTION_SUMMARY_PRESCRIPTIONS = '''
+CREATE OR REPLACE FUNCTION patient_summary_on_prescription() RETURNS TRIGGER AS $$
+DECLARE
+    moved BOOLEAN := TG_OP = 'UPDATE' AND NEW.patient_id IS DISTINCT FROM OLD.patient_id;
+BEGIN
+    IF TG_OP = 'DELETE' OR moved THEN
+        IF OLD.patient_id IS NOT NULL THEN
+            UPDATE patient_summaries SET medication_count = medication_count - 1, updated_at = CURRENT_TIMESTAMP
+            WHERE patient_id = OLD.patient_id;
+        END IF;
+    END IF;
+    IF TG_OP = 'INSERT' OR moved THEN
+        IF NEW.patient_id IS NOT NULL THEN
+            INSERT INTO patient_summaries (patient_id, medication_count) VALUES (NEW.patient_id, 1)
+            ON CONFLICT (patient_id) DO UPDATE
+            SET medication_count = patient_summaries.medication_count + 1, updated_at = CURRENT_TIMESTAMP;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;'''
+
+CREATE_SUMMARY_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS trg_patient_summary ON patients",
+    "CREATE TRIGGER trg_patient_summary AFTER INSERT ON patients "
+    "FOR EACH ROW EXECUTE FUNCTION patient_summary_on_patient()",
+    "DROP TRIGGER IF EXISTS trg_patient_summary ON appointments",
+    "CREATE TRIGGER trg_patient_summary AFTER INSERT OR DELETE OR UPDATE OF patient_id, appointment_date, status "
+    "ON appointments FOR EACH ROW EXECUTE FUNCTION patient_summary_on_appointment()",
+    "DROP TRIGGER IF EXISTS trg_patient_summary ON prescriptions",
+    "CREATE TRIGGER trg_patient_summary AFTER INSERT OR DELETE OR UPDATE OF patient_id "
+    "ON prescriptions FOR EACH ROW EXECUTE FUNCTION patient_summary_on_prescription()",
+]
+
+# -- Backfill for databases that already hold data (runs in the same transaction
+#    as the triggers, so no write can slip between the two)
+BACKFILL_PATIENT_SUMMARIES = '''
+INSERT INTO patient_summaries (patient_id, appointment_count, medication_count, next_appointment, last_visit)
+SELECT p.patient_id,
+       (SELECT COUNT(*) FROM appointments a WHERE a.patient_id = p.patient_id),
+       (SELECT COUNT(*) FROM prescriptions pr WHERE pr.patient_id = p.patient_id),
+       (SELECT MIN(a.appointment_date) FROM appointments a
+        WHERE a.patient_id = p.patient_id AND a.status = 'scheduled' AND a.appointment_date >= LOCALTIMESTAMP),
+       (SELECT MAX(a.appointment_date) FROM appointments a
+        WHERE a.patient_id = p.patient_id AND a.status = 'completed')
+FROM patients p
+ON CONFLICT (patient_id) DO UPDATE SET
+    appointment_count = EXCLUDED.appointment_count,
+    medication_count = EXCLUDED.medication_count,
+    next_appointment = EXCLUDED.next_appointment,
+    last_visit = EXCLUDED.last_visit,
+    updated_at = CURRENT_TIMESTAMP;
+'''
+
+# ---------- Change Notifications ----------
+# Writes to the clinic tables publish {"table", "op", "id"} on the clinic_changes
+# channel; the clinic dashboard LISTENs and pushes updates over SSE.
+CREATE_FUNCTION_NOTIFY_CLINIC_CHANGE = '''
+CREATE OR REPLACE FUNCTION notify_clinic_change() RETURNS TRIGGER AS $$
+DECLARE
+    changed JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := to_jsonb(OLD);
+    ELSE
+        changed := to_jsonb(NEW);
+    END IF;
+    PERFORM pg_notify('clinic_changes', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'id', (changed ->> TG_ARGV[0])::INT
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;'''
+
+# -- Same function, skipping rows written while sehat.bulk_import is on (migration 9)
+CREATE_FUNCTION_NOTIFY_CLINIC_CHANGE_V2 = '''
+CREATE OR REPLACE FUNCTION notify_clinic_change() RETURNS TRIGGER AS $$
+DECLARE
+    changed JSONB;
+BEGIN
+    -- Bulk imports set this and send one notification for the whole load
+    IF current_setting('sehat.bulk_import', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        changed := to_jsonb(OLD);
+    ELSE
+        changed := to_jsonb(NEW);
+    END IF;
+    PERFORM pg_notify('clinic_changes', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'id', (changed ->> TG_ARGV[0])::INT
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;'''
+
+CREATE_NOTIFY_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS trg_notify_clinic_change ON patients",
+    "CREATE TRIGGER trg_notify_clinic_change AFTER INSERT OR UPDATE OR DELETE ON patients "
+    "FOR EACH ROW EXECUTE FUNCTION notify_clinic_change('patient_id')",
+    "DROP TRIGGER IF EXISTS trg_notify_clinic_change ON appointments",
+    "CREATE TRIGGER trg_notify_clinic_change AFTER INSERT OR UPDATE OR DELETE ON appointments "
+    "FOR EACH ROW EXECUTE FUNCTION notify_clinic_change('appointment_id')",
+    "DROP TRIGGER IF EXISTS trg_notify_clinic_change ON prescriptions",
+    "CREATE TRIGGER trg_notify_clinic_change AFTER INSERT OR UPDATE OR DELETE ON prescriptions "
+    "FOR EACH ROW EXECUTE FUNCTION notify_clinic_change('prescription_id')",
+]
+
+# -- No two live appointments for the same doctor may overlap. Every booking is
+# treated as one 30 minute slot (SLOT_MINUTES in shared/availability.py); the GiST
+# exclusion constraint makes concurrent inserts of the same slot conflict in
+# the database, so the loser gets a 23P01 error instead of a double booking.
+CHECK_NO_DOUBLE_BOOKINGS = '''
+DO $$
+DECLARE
+    clashes INT;
+BEGIN
+    SELECT COUNT(*) INTO clashes
+    FROM appointments a
+    JOIN appointments b
+      ON a.doctor_id = b.doctor_id
+     AND a.appointment_id < b.appointment_id
+     AND a.appointment_date < b.appointment_date + INTERVAL '30 minutes'
+     AND b.appointment_date < a.appointment_date + INTERVAL '30 minutes'
+    WHERE COALESCE(a.status, 'scheduled') <> 'cancelled'
+      AND COALESCE(b.status, 'scheduled') <> 'cancelled';
+    IF clashes > 0 THEN
+        RAISE EXCEPTION '% pairs of overlapping appointments exist; cancel or move them before applying this migration', clashes;
+    END IF;
+END
+$$;'''
+
+ADD_NO_DOUBLE_BOOKING_CONSTRAINT = '''
+ALTER TABLE appointments ADD CONSTRAINT appointments_no_double_booking
+EXCLUDE USING gist (
+    doctor_id WITH =,
+    tsrange(appointment_date, appointment_date + INTERVAL '30 minutes') WITH &&
+) WHERE (COALESCE(status, 'scheduled') <> 'cancelled');'''
+
+# ---------- Migrations ----------
+# Append new entries to the end; never edit a migration that has already shipped.
+# Each entry is (version, name, statements, transactional). Non-transactional
+# migrations run in autocommit mode, which CREATE INDEX CONCURRENTLY requires.
+
+HOT_PATH_INDEXES = [
+    # Patient history and the patient detail view
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_patient_date ON appointments (patient_id, appointment_date)",
+    # Doctor schedules
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_doctor_date ON appointments (doctor_id, appointment_date)",
+    # Clinic listings, recent appointments and today's count on the dashboard
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_date ON appointments (appointment_date)",
+    # Medications per patient, newest first
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prescriptions_patient_created ON prescriptions (patient_id, created_at)",
+    # Reminder listings and due-reminder lookups
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reminders_time ON reminders (reminder_time)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reminders_prescription ON reminders (prescription_id)",
+]
+
+MIGRATIONS = [
+    (1, "base tables", [
+        CREATE_TABLE_PATIENTS,
+        CREATE_TABLE_DOCTORS,
+        CREATE_TABLE_APPOINTMENT,
+        CREATE_TABLE_PRESCRIPTIONS,
+        CREATE_TABLE_REMINDERS,
+    ], True),
+    (2, "hot path indexes", HOT_PATH_INDEXES, False),
+    (3, "keyset pagination indexes", [
+        # Clinic patient list, ordered by name with patient_id as tie-breaker
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_patients_name ON patients (last_name, first_name, patient_id)",
+        # Prescription listing, newest first
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prescriptions_created ON prescriptions (created_at, prescription_id)",
+    ], False),
+    (4, "patient summaries", [
+        CREATE_TABLE_PATIENT_SUMMARIES,
+        CREATE_FUNCTION_REFRESH_PATIENT_SCHEDULE,
+        CREATE_FUNCTION_SUMMARY_PATIENTS,
+        CREATE_FUNCTION_SUMMARY_APPOINTMENTS,
+        CREATE_FUNCTION_SUMMARY_PRESCRIPTIONS,
+        *CREATE_SUMMARY_TRIGGERS,
+        BACKFILL_PATIENT_SUMMARIES,
+    ], True),
+    (5, "clinic change notifications", [
+        CREATE_FUNCTION_NOTIFY_CLINIC_CHANGE,
+        *CREATE_NOTIFY_TRIGGERS,
+    ], True),
+    (6, "doctor schedule notifications", [
+        # Schedule edits make the availability index in both apps reload
+        "DROP TRIGGER IF EXISTS trg_notify_clinic_change ON doctors",
+        "CREATE TRIGGER trg_notify_clinic_change AFTER INSERT OR UPDATE OR DELETE ON doctors "
+        "FOR EACH ROW EXECUTE FUNCTION notify_clinic_change('doctor_id')",
+    ], True),
+    (7, "no double bookings", [
+        # btree_gist lets the exclusion constraint compare doctor_id with =
+        "CREATE EXTENSION IF NOT EXISTS btree_gist",
+        CHECK_NO_DOUBLE_BOOKINGS,
+        ADD_NO_DOUBLE_BOOKING_CONSTRAINT,
+    ], True),
+    (8, "reminder scheduler indexes", [
+        # Materializing skips reminders that already exist for (prescription, time)
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reminders_prescription_time ON reminders (prescription_id, reminder_time)",
+        # The dispatcher only ever looks at pending reminders, ordered by time
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reminders_pending ON reminders (reminder_time) WHERE status = 'pending'",
+    ], False),
+    (9, "quiet bulk imports", [
+        # Re-creates notify_clinic_change with the sehat.bulk_import check
+        CREATE_FUNCTION_NOTIFY_CLINIC_CHANGE_V2,
+    ], True),
+]
+# Re-runs every concurrent index build above. Before migrate() dropped INVALID
+# leftovers, a retried build could skip one and still be recorded as applied;
+# valid indexes are skipped by IF NOT EXISTS, so this only rebuilds broken ones.
+MIGRATIONS.append((10, "rebuild invalid indexes", [
+    statement
+    for _, _, statements, transactional in MIGRATIONS if not transactional
+    for statement in statements
+], False))
+
+# Name of the index a "CREATE INDEX CONCURRENTLY IF NOT EXISTS <name>" statement builds
+CONCURRENT_INDEX = re.compile(r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+# Arbitrary key so two deployments running migrations at once take turns
+MIGRATION_LOCK_KEY = 727001
+
+
+def get_schema_version(cur):
+    cur.execute(CREATE_TABLE_SCHEMA_MIGRATIONS)
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cur.fetchone()[0]
+
+
+def drop_invalid_index(cur, statement):
+    """Drops what a failed CREATE INDEX CONCURRENTLY left behind before it is retried.
+
+    The failed build leaves an INVALID index that IF NOT EXISTS would then
+    skip, so the migration would be recorded with an unusable index.
+    """
+    match = CONCURRENT_INDEX.match(statement)
+    if not match:
+        return
+    cur.execute(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+        (match.group(1),)
+    )
+    row = cur.fetchone()
+    if row and row[0]:
+        print(f"Dropping invalid index {match.group(1)} left by an earlier failed build...")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+
+def migrate(conn):
+    """Applies every pending migration in order and returns the new schema version."""
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        try:
+            version = get_schema_version(cur)
+            for number, name, statements, transactional in MIGRATIONS:
+                if number <= version:
+                    continue
+                print(f"Applying migration {number}: {name}...")
+                if transactional:
+                    cur.execute("BEGIN")
+                try:
+                    for statement in statements:
+                        if not transactional:
+                            drop_invalid_index(cur, statement)
+                        cur.execute(statement)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (number, name)
+                    )
+                    if transactional:
+                        cur.execute("COMMIT")
+                except Exception:
+                    if transactional:
+                        cur.execute("ROLLBACK")
+                    raise
+                version = number
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    conn.autocommit = False
+    return version
+
+
+def seed(conn):
+    """Seeds demo data, but only into an empty database."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT EXISTS (SELECT 1 FROM doctors) OR EXISTS (SELECT 1 FROM patients)")
+        if cur.fetchone()[0]:
+            print("Existing data found, skipping seed.")
+            return
+        print("Seeding data...")
+        cur.execute(SEED_DOCTORS)
+        cur.execute(SEED_PATIENTS)
+        cur.execute(SEED_APPOINTMENTS)
+        cur.execute(SEED_PRESCRIPTIONS)
+        cur.execute(SEED_REMINDERS)
+    conn.commit()
+
+
 # ---------- Main Function ----------
 
-def init_db():
-    """Initializes the database by creating and seeding tables."""
+def init_db(reset=False):
+    """Brings the schema up to date in place, seeding demo data into an empty database.
+
+    With reset=True every table is dropped first (the old behaviour).
+    """
     try:
         with psycopg2.connect(**DB_CONFIG) as conn:
-            with conn.cursor() as cur:
-                print("Dropping existing tables...")
-                cur.execute(DROP_TABLES)
-                
-                print("Creating tables...")
-                cur.execute(CREATE_TABLE_PATIENTS)
-                cur.execute(CREATE_TABLE_DOCTORS)
-                cur.execute(CREATE_TABLE_APPOINTMENT)
-                cur.execute(CREATE_TABLE_PRESCRIPTIONS)
-                cur.execute(CREATE_TABLE_REMINDERS)
-                
-                print("Seeding data...")
-                cur.execute(SEED_DOCTORS)
-                cur.execute(SEED_PATIENTS)
-                cur.execute(SEED_APPOINTMENTS)
-                cur.execute(SEED_PRESCRIPTIONS)
-                cur.execute(SEED_REMINDERS)
-
+            if reset:
+                with conn.cursor() as cur:
+                    print("Dropping existing tables...")
+                    cur.execute(DROP_TABLES)
                 conn.commit()
+
+            version = migrate(conn)
+            print(f"Schema is at version {version}.")
+            seed(conn)
         print("✅ Database initialized successfully!")
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
 
+def show_status():
+    """Prints applied and pending migrations."""
+    try:
+        with psycopg2.connect(**DB_CONFIG) as conn:
+            with conn.cursor() as cur:
+                version = get_schema_version(cur)
+            conn.commit()
+        print(f"Schema version: {version}")
+        for number, name, _, _ in MIGRATIONS:
+            state = "applied" if number <= version else "pending"
+            print(f"  {number:>3}  {name:<40} {state}")
+    except Exception as e:
+        print(f"❌ Error reading schema version: {e}")
+
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    if "--status" in sys.argv:
+        show_status()
+    else:
+        init_db(reset="--reset" in sys.argv)
@@ -0,0 +1,279 @@
+"""Background process that turns prescriptions into reminders and sends them when due.
+
+    python reminder_scheduler.py          # run until interrupted
+    python reminder_scheduler.py --once   # one materialize + dispatch pass (for cron)
+
+Materializing expands every prescription's daily reminder_times into reminder
+rows for the next REMINDER_HORIZON_HOURS, one set-based INSERT per batch of
+prescriptions. Dispatching keeps the pending reminders of the next few minutes
+in a heap, sleeps until the earliest is due and marks everything due at once as
+'sent' in one UPDATE; the patient app's reminder history shows that status.
+Only one scheduler runs at a time (guarded by an advisory lock). If the
+database connection drops, the scheduler reconnects with backoff and takes
+the lock again.
+"""
+import heapq
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    "dbname": os.getenv("DB_NAME", "sehat"),
+    "user": os.getenv("DB_USER", "postgres"),
+    "password": str(os.getenv("DB_PASSWORD", "2108")),
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": os.getenv("DB_PORT", "5432"),
+}
+
+HORIZON = timedelta(hours=float(os.getenv("REMINDER_HORIZON_HOURS", "24")))
+MATERIALIZE_EVERY = float(os.getenv("REMINDER_MATERIALIZE_EVERY", "900"))
+LOOKAHEAD = timedelta(seconds=float(os.getenv("REMINDER_LOOKAHEAD", "300")))
+# Pending reminders older than this are marked 'missed' instead of being sent late
+GRACE = timedelta(minutes=float(os.getenv("REMINDER_GRACE_MINUTES", "60")))
+PRESCRIPTION_BATCH = int(os.getenv("REMINDER_PRESCRIPTION_BATCH", "5000"))
+UPDATE_BATCH = 1000
+# Backoff between reconnect attempts after the database goes away (seconds)
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = float(os.getenv("REMINDER_RECONNECT_MAX", "60"))
+
+# Arbitrary key so a second scheduler waits instead of sending everything twice
+SCHEDULER_LOCK_KEY = 727002
+
+# -- One batch of prescriptions expanded into reminder rows. reminder_times is a
+# JSON array of "HH:MM" strings; anything else is ignored.
+MATERIALIZE_SQL = '''
+INSERT INTO reminders (prescription_id, reminder_time, status)
+SELECT slot.prescription_id, slot.reminder_time, 'pending'
+FROM (
+    SELECT p.prescription_id, d.day::date + t.at AS reminder_time
+    FROM prescriptions p
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN value ~ '^([01]?[0-9]|2[0-3]):[0-5][0-9]$' THEN value::time END AS at
+        FROM jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(p.reminder_times) = 'array' THEN p.reminder_times ELSE '[]'::jsonb END
+        ) AS value
+    ) t
+    CROSS JOIN generate_series(%(first_day)s::date, %(last_day)s::date, INTERVAL '1 day') AS d(day)
+    WHERE p.prescription_id > %(after)s AND p.prescription_id <= %(upto)s
+      AND t.at IS NOT NULL
+) slot
+WHERE slot.reminder_time >= %(start)s AND slot.reminder_time < %(end)s
+  AND NOT EXISTS (
+      SELECT 1 FROM reminders r
+      WHERE r.prescription_id = slot.prescription_id AND r.reminder_time = slot.reminder_time
+  )
+'''
+
+
+def log(message):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+
+# ---------- Materializing ----------
+
+def materialize(conn, now=None):
+    """Creates missing reminder rows for [now, now + HORIZON); returns how many were added."""
+    now = now or datetime.now()
+    end = now + HORIZON
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(prescription_id), 0) FROM prescriptions")
+        last_id = cur.fetchone()[0]
+    added = 0
+    after = 0
+    # Batches by prescription_id keep each transaction short on large clinics
+    while after < last_id:
+        upto = after + PRESCRIPTION_BATCH
+        with conn.cursor() as cur:
+            cur.execute(MATERIALIZE_SQL, {
+                "first_day": now.date(), "last_day": end.date(),
+                "after": after, "upto": upto, "start": now, "end": end,
+            })
+            added += cur.rowcount
+        conn.commit()
+        after = upto
+    return added
+
+
+# ---------- Dispatching ----------
+
+class Dispatcher:
+    """Heap of upcoming pending reminders, drained in batches as they fall due."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.heap = []  # (reminder_time, reminder_id)
+        self.queued = set()
+        self.loaded_until = None
+        self.sent = 0
+        self.missed = 0
+
+    def expire_stale(self, now):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "UPDATE reminders SET status = 'missed' WHERE status = 'pending' AND reminder_time < %s",
+                (now - GRACE,)
+            )
+            self.missed += cur.rowcount
+        self.conn.commit()
+
+    def refill(self, now):
+        """Loads every pending reminder due by now + LOOKAHEAD that is not queued yet."""
+        until = now + LOOKAHEAD
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT reminder_id, reminder_time FROM reminders "
+                "WHERE status = 'pending' AND reminder_time >= %s AND reminder_time <= %s",
+                (now - GRACE, until)
+            )
+            rows = cur.fetchall()
+        self.conn.commit()
+        for reminder_id, reminder_time in rows:
+            if reminder_id not in self.queued:
+                self.queued.add(reminder_id)
+                heapq.heappush(self.heap, (reminder_time, reminder_id))
+        self.loaded_until = until
+
+    def pop_due(self, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, reminder_id = heapq.heappop(self.heap)
+            self.queued.discard(reminder_id)
+            due.append(reminder_id)
+        return due
+
+    def send(self, reminder_ids):
+        """Marks reminders sent, UPDATE_BATCH ids per statement."""
+        for i in range(0, len(reminder_ids), UPDATE_BATCH):
+            chunk = reminder_ids[i:i + UPDATE_BATCH]
+            with self.conn.cursor() as cur:
+                # Skips reminders dismissed since they were queued
+                cur.execute(
+                    "UPDATE reminders SET status = 'sent' WHERE reminder_id = ANY(%s) AND status = 'pending'",
+                    (chunk,)
+                )
+                sent = cur.rowcount
+            self.conn.commit()
+            self.sent += sent
+
+    def next_wakeup(self, now):
+        refill_at = self.loaded_until - LOOKAHEAD / 2
+        wakeup = min(self.heap[0][0], refill_at) if self.heap else refill_at
+        return max(0.0, (wakeup - now).total_seconds())
+
+    def run_once(self, now=None):
+        now = now or datetime.now()
+        self.expire_stale(now)
+        self.refill(now)
+        due = self.pop_due(now)
+        if due:
+            self.send(due)
+        return len(due)
+
+
+def acquire_lock(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (SCHEDULER_LOCK_KEY,))
+        locked = cur.fetchone()[0]
+    conn.commit()
+    return locked
+
+
+def serve(conn, stop, totals):
+    """Materializes and dispatches on ``conn`` until ``stop`` is set or a query fails."""
+    dispatcher = Dispatcher(conn)
+    next_materialize = 0.0
+    try:
+        dispatcher.run_once()
+        while not stop.is_set():
+            if time.monotonic() >= next_materialize:
+                started = time.monotonic()
+                added = materialize(conn)
+                dispatcher.expire_stale(datetime.now())
+                log(f"Materialized {added} reminders in {time.monotonic() - started:.2f}s")
+                next_materialize = time.monotonic() + MATERIALIZE_EVERY
+                # New rows may fall inside the window that is already loaded
+                dispatcher.refill(datetime.now())
+
+            now = datetime.now()
+            if now >= dispatcher.loaded_until - LOOKAHEAD / 2:
+                dispatcher.refill(now)
+            due = dispatcher.pop_due(now)
+            if due:
+                dispatcher.send(due)
+                log(f"📨 Sent {len(due)} reminders ({totals['sent'] + dispatcher.sent} total)")
+
+            wait = min(dispatcher.next_wakeup(datetime.now()), max(0.0, next_materialize - time.monotonic()))
+            stop.wait(wait)
+    finally:
+        totals["sent"] += dispatcher.sent
+        totals["missed"] += dispatcher.missed
+
+
+def run_once():
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if not acquire_lock(conn):
+            log("⚠️ Another reminder scheduler is already running, exiting.")
+            return
+        dispatcher = Dispatcher(conn)
+        added = materialize(conn)
+        sent = dispatcher.run_once()
+        log(f"✅ Materialized {added} reminders, sent {sent}, marked {dispatcher.missed} missed.")
+    except psycopg2.Error as e:
+        log(f"❌ Database error in reminder scheduler: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+def run(once=False):
+    if once:
+        run_once()
+        return
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    log("⏰ Reminder scheduler started.")
+    totals = {"sent": 0, "missed": 0}
+    held = False
+    delay = RECONNECT_MIN
+    # A restart or failover drops the connection (and with it the advisory lock);
+    # reconnect with backoff and take the lock again rather than stop sending reminders
+    while not stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            if acquire_lock(conn):
+                if held:
+                    log("🔌 Reconnected to the database, resuming.")
+                held = True
+                delay = RECONNECT_MIN
+                serve(conn, stop, totals)
+            elif not held:
+                log("⚠️ Another reminder scheduler is already running, exiting.")
+                return
+            else:
+                # Our old session may not have been cleaned up yet, or another scheduler took over
+                log(f"⚠️ Scheduler lock is held elsewhere, retrying in {delay:.0f}s")
+        except psycopg2.Error as e:
+            log(f"❌ Database error in reminder scheduler, reconnecting in {delay:.0f}s: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+        if not stop.is_set():
+            stop.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+    log(f"Reminder scheduler stopped ({totals['sent']} sent, {totals['missed']} missed).")
+
+
+if __name__ == "__main__":
+    run(once="--once" in sys.argv)
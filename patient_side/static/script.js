@@ -21,7 +21,7 @@ async function apiRequest(endpoint, method = 'GET', data = null) {
         const response = await fetch(`${API_BASE_URL}${endpoint}`, config);
         if (!response.ok) {
             const errorData = await response.json().catch(() => ({}));
-            throw new Error(errorData.message || 'API request failed');
+            throw new Error(errorData.message || errorData.error || 'API request failed');
         }
         return await response.json();
     } catch (error) {
@@ -30,11 +30,35 @@ async function apiRequest(endpoint, method = 'GET', data = null) {
     }
 }
 
+// List endpoints return one page per request; follow X-Next-Cursor until the last page
+async function apiRequestAll(endpoint) {
+    const rows = [];
+    const separator = endpoint.includes('?') ? '&' : '?';
+    let cursor = null;
+    do {
+        const page = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+        const response = await fetch(`${API_BASE_URL}${endpoint}${separator}limit=500${page}`, {
+            headers: { 'Accept': 'application/json' },
+            credentials: 'include',
+            mode: 'cors'
+        });
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.message || errorData.error || 'API request failed');
+        }
+        rows.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return rows;
+}
+
 let currentSection = 'chat';
 let doctors = [];
 let medications = [];
 let reminders = [];
 let isTyping = false;
+// Id the server gave this chat; sending it back lets the assistant see earlier turns
+let conversationId = null;
 
 // API Helper Functions
 async function fetchWithErrorHandling(endpoint, options = {}) {
@@ -122,23 +146,64 @@ async function sendMessage() {
     input.value = '';
     input.disabled = true;
 
+    let botMessage = null;
+    let botText = '';
+
     try {
         // Show typing indicator
         showTypingIndicator();
 
-        // Send message to backend
-        const data = await fetchWithErrorHandling(`/chat`, {
+        // Stream the reply so text appears as soon as the model produces it
+        const response = await fetch(`${API_BASE_URL}/chat/stream`, {
             method: 'POST',
-            body: JSON.stringify({ message })
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            credentials: 'include',
+            mode: 'cors',
+            body: JSON.stringify({ message, conversation_id: conversationId })
         });
 
-        // Add bot response to chat
-        if (data.text) {
-            addMessage(data.text, 'bot', data.suggestions || []);
+        if (!response.ok || !response.body) {
+            // Older browsers / errors: fall back to the one-shot endpoint
+            const data = await fetchWithErrorHandling(`/chat`, {
+                method: 'POST',
+                body: JSON.stringify({ message, conversation_id: conversationId })
+            });
+            conversationId = data.conversation_id || conversationId;
+            if (data.text) {
+                addMessage(data.text, 'bot', data.suggestions || []);
+            }
+            return;
         }
+
+        await readEventStream(response, (event, data) => {
+            if (event === 'delta') {
+                botText += data.text;
+                if (!botMessage) {
+                    hideTypingIndicator();
+                    botMessage = addMessage(botText, 'bot');
+                } else {
+                    renderMessageContent(botMessage, botText);
+                }
+            } else if (event === 'done') {
+                botText = data.text || botText;
+                conversationId = data.conversation_id || conversationId;
+                if (!botMessage) {
+                    botMessage = addMessage(botText, 'bot', data.suggestions || []);
+                } else {
+                    renderMessageContent(botMessage, botText, data.suggestions || []);
+                }
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
+        });
     } catch (error) {
         console.error('Chat error:', error);
-        addMessage("I'm having trouble connecting right now. Please try again later.", 'bot');
+        if (!botMessage) {
+            addMessage("I'm having trouble connecting right now. Please try again later.", 'bot');
+        }
     } finally {
         // Always clean up
         hideTypingIndicator();
@@ -147,6 +212,33 @@ async function sendMessage() {
     }
 }
 
+// Reads a text/event-stream response body and calls onEvent(event, data) per frame
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 function showTypingIndicator() {
     isTyping = true;
     document.getElementById('typing-indicator').classList.remove('hidden');
@@ -164,6 +256,16 @@ function addMessage(text, type, suggestions = []) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${type}`;
 
+    renderMessageContent(messageDiv, text, suggestions);
+    messagesContainer.appendChild(messageDiv);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    return messageDiv;
+}
+
+// (Re)renders a message bubble; called repeatedly while a reply streams in
+function renderMessageContent(messageDiv, text, suggestions = []) {
+    const messagesContainer = document.getElementById('chat-messages');
+
     // Render Markdown (bold, italic, lists, etc.)
     let messageContent = `<div class="message-content">${marked.parse(text)}`;
 
@@ -177,7 +279,6 @@ function addMessage(text, type, suggestions = []) {
 
     messageContent += '</div>';
     messageDiv.innerHTML = messageContent;
-    messagesContainer.appendChild(messageDiv);
 
     // Scroll to bottom
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
@@ -303,7 +404,7 @@ let prescriptions = [];
 async function loadPrescriptions() {
     try {
         setLoading(true);
-        const data = await fetchWithErrorHandling('/prescriptions');
+        const data = await apiRequestAll('/prescriptions');
         prescriptions = data || [];
         displayPrescriptions();
     } catch (error) {
@@ -347,7 +448,7 @@ function displayPrescriptions() {
 async function loadReminders() {
     try {
         setLoading(true);
-        const data = await fetchWithErrorHandling('/reminders');
+        const data = await apiRequestAll('/reminders');
         reminders = data || [];
         displayReminders();
     } catch (error) {
@@ -0,0 +1 @@
+"""Helpers shared by the patient_side and clinic_side Flask apps."""
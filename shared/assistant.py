@@ -0,0 +1,95 @@
+import os
+import re
+import threading
+
+from shared.cache import TTLCache
+from shared.live import format_sse
+from shared.llm_gateway import GatewayUnavailable
+
+# Questions longer than this are unlikely to repeat verbatim, so they skip the cache
+MAX_CACHEABLE_MESSAGE = 300
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(name):
+    """Returns a process-wide GenerativeModel for ``name``, building it on first use."""
+    model = _models.get(name)
+    if model is None:
+        import google.generativeai as genai
+        with _models_lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = genai.GenerativeModel(name)
+    return model
+
+
+def normalize_message(message):
+    """Case-folds and collapses whitespace/punctuation so trivially different phrasings share a key."""
+    text = message.casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def create_response_cache():
+    return TTLCache(
+        ttl=float(os.getenv("CHAT_CACHE_TTL", "3600")),
+        maxsize=int(os.getenv("CHAT_CACHE_SIZE", "1000")),
+    )
+
+
+def response_cache_key(prompt_version, message):
+    """Cache key for an answer, or None when the message should not be cached."""
+    normalized = normalize_message(message)
+    if not normalized or len(normalized) > MAX_CACHEABLE_MESSAGE:
+        return None
+    return (prompt_version, normalized)
+
+
+# ---------- Streaming Replies ----------
+# Streamed replies are sent as SSE frames: any number of `delta` events with
+# the next piece of text, then one `done` event carrying the full text (or an
+# `error` event if generation fails part-way).
+
+def stream_chat(pieces, on_complete=None, done_payload=None, fallback_text=None):
+    """Turns an iterator of text pieces (from LLMGateway.stream) into SSE frames.
+
+    If the gateway gives up before anything was sent, the fallback text is
+    delivered instead and the `done` frame is marked degraded.
+    ``on_complete`` receives the full text once generation finishes cleanly.
+    """
+    parts = []
+    try:
+        for text in pieces:
+            if text:
+                parts.append(text)
+                yield format_sse("delta", {"text": text})
+    except GatewayUnavailable as e:
+        print(f"⚠️ LLM gateway degraded ({e.reason}) while streaming")
+        if not parts and fallback_text:
+            yield format_sse("delta", {"text": fallback_text})
+            yield format_sse("done", dict(done_payload or {}, text=fallback_text, degraded=True))
+            return
+        yield format_sse("error", {"error": "The AI assistant stopped responding", "text": "".join(parts)})
+        return
+    except Exception as e:
+        print(f"Error while streaming from the AI backend: {e}")
+        yield format_sse("error", {"error": "The AI assistant stopped responding", "text": "".join(parts)})
+        return
+    full_text = "".join(parts)
+    if on_complete is not None and full_text:
+        on_complete(full_text)
+    yield format_sse("done", dict(done_payload or {}, text=full_text))
+
+
+def reply_frames(text, done_payload=None, **flags):
+    """SSE frames for an answer that is already complete (cached, local or fallback).
+
+    They have the same shape as a live stream; ``flags`` (cached=True,
+    degraded=True, ...) are added to the `done` frame.
+    """
+    return [
+        format_sse("delta", {"text": text}),
+        format_sse("done", dict(done_payload or {}, text=text, **flags)),
+    ]
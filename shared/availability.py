@@ -0,0 +1,387 @@
+import json
+import os
+import threading
+from bisect import bisect_right, insort
+from datetime import date, datetime, time, timedelta
+
+# Fixed by the appointments_no_double_booking constraint (init_db.py migration 7), which
+# blocks overlaps of 30 minute ranges; changing it needs a new migration as well
+SLOT_MINUTES = 30
+MAX_RANGE_DAYS = int(os.getenv("AVAILABILITY_MAX_DAYS", "62"))
+
+# Memoized doctor-days kept before the memo is cleared (days in the past are never read again)
+MAX_CACHED_DAYS = 200000
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+class BadAvailabilityRequest(ValueError):
+    """Raised for a malformed doctor, specialization or date range (answered with 400)."""
+
+
+def _load_json(value, default):
+    if value is None:
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return value
+
+
+def _parse_hhmm(value):
+    hours, minutes = str(value).split(":")[:2]
+    return time(int(hours), int(minutes))
+
+
+def _minute(value):
+    """Minutes since 0001-01-01 for a naive datetime (appointments are minute-aligned)."""
+    return value.toordinal() * 1440 + value.hour * 60 + value.minute
+
+
+class DoctorSchedule:
+    """Weekly working pattern of one doctor, from the available_days/available_hours JSONB."""
+
+    def __init__(self, row, slot_minutes):
+        self.doctor_id = row["doctor_id"]
+        self.first_name = row.get("first_name")
+        self.last_name = row.get("last_name")
+        self.specialization = row.get("specialization")
+        days = _load_json(row.get("available_days"), [])
+        self.weekdays = {WEEKDAYS.index(str(d).capitalize()) for d in days if str(d).capitalize() in WEEKDAYS}
+        hours = _load_json(row.get("available_hours"), {}) or {}
+        try:
+            start, end = _parse_hhmm(hours["start"]), _parse_hhmm(hours["end"])
+            first, close = start.hour * 60 + start.minute, end.hour * 60 + end.minute
+        except (KeyError, ValueError, TypeError, AttributeError):
+            first, close = 0, 0
+        # Slot start times as minutes into the day, plus their "HH:MM" labels
+        self.offsets = list(range(first, close - slot_minutes + 1, slot_minutes))
+        self.labels = [f"{m // 60:02d}:{m % 60:02d}" for m in self.offsets]
+
+    def info(self):
+        return {
+            "doctor_id": self.doctor_id,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "specialization": self.specialization,
+        }
+
+
+# ---------- Availability Index ----------
+class AvailabilityIndex:
+    """In-memory free-slot engine.
+
+    Keeps every doctor's schedule and, per doctor, a sorted list of the start
+    minutes of upcoming non-cancelled appointments. Appointments are treated as
+    ``slot_minutes`` long, so with equal-length intervals sorted starts are also
+    sorted ends and one doctor-day is a single merge walk. Each doctor-day's
+    free slots are memoized until a booking on that day changes, so wide
+    queries are mostly dictionary lookups and never touch the database.
+
+    The index loads lazily on first use. Write handlers call ``apply`` /
+    ``discard`` after committing, and ``apply_changes`` consumes clinic_changes
+    notifications so writes made by the other app are picked up too; a RESYNC
+    notification or a doctors change triggers a reload on the next read.
+    """
+
+    def __init__(self, connect, slot_minutes=SLOT_MINUTES):
+        self.connect = connect
+        self.slot_minutes = slot_minutes
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._doctors = {}
+        self._starts = {}  # doctor_id -> sorted appointment start minutes
+        self._booked = {}  # appointment_id -> (doctor_id, start minute)
+        self._days = {}  # (doctor_id, day ordinal) -> (free slot indexes, their "HH:MM" labels)
+        self._loaded = False
+        self._pending = None  # changes seen while a reload is running, replayed after it
+        self.loads = 0
+
+    # -- loading --
+
+    def ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._reload()
+
+    def _reload(self):
+        with self._lock:
+            self._pending = []
+        try:
+            conn = self.connect()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT doctor_id, first_name, last_name, specialization, available_days, available_hours
+                        FROM doctors
+                    """)
+                    doctors = {row["doctor_id"]: DoctorSchedule(row, self.slot_minutes) for row in cur.fetchall()}
+                    # Only the future matters for booking; the doctor/date index serves this.
+                    # A NULL status still occupies the slot, as in appointments_no_double_booking.
+                    cur.execute("""
+                        SELECT appointment_id, doctor_id, appointment_date
+                        FROM appointments
+                        WHERE appointment_date >= %s AND COALESCE(status, 'scheduled') <> 'cancelled'
+                          AND doctor_id IS NOT NULL
+                    """, (datetime.combine(date.today(), time()) - timedelta(minutes=self.slot_minutes),))
+                    rows = cur.fetchall()
+            finally:
+                conn.close()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        starts, booked = {}, {}
+        for row in rows:
+            minute = _minute(row["appointment_date"])
+            starts.setdefault(row["doctor_id"], []).append(minute)
+            booked[row["appointment_id"]] = (row["doctor_id"], minute)
+        for values in starts.values():
+            values.sort()
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._doctors, self._starts, self._booked, self._days = doctors, starts, booked, {}
+            for args in pending:
+                self._apply(*args)
+            self._loaded = True
+            self.loads += 1
+
+    def invalidate(self):
+        """Forces a full reload on the next read."""
+        with self._lock:
+            self._loaded = False
+
+    # -- updates --
+
+    def apply(self, appointment_id, doctor_id, start, status="scheduled"):
+        """Records the current state of an appointment (after an INSERT or UPDATE).
+
+        A ``status`` of None counts as scheduled, like the database constraint does.
+        """
+        if status is None:
+            status = "scheduled"
+        if isinstance(start, str):
+            start = datetime.fromisoformat(start)
+        minute = _minute(start) if start is not None else None
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((appointment_id, doctor_id, minute, status))
+            self._apply(appointment_id, doctor_id, minute, status)
+
+    def discard(self, appointment_id):
+        """Forgets an appointment (after a DELETE)."""
+        self.apply(appointment_id, None, None, "cancelled")
+
+    def _apply(self, appointment_id, doctor_id, minute, status):
+        old = self._booked.pop(appointment_id, None)
+        if old is not None:
+            starts = self._starts.get(old[0], [])
+            i = bisect_right(starts, old[1]) - 1
+            if i >= 0 and starts[i] == old[1]:
+                del starts[i]
+            self._forget_days(*old)
+        if doctor_id is None or minute is None or status == "cancelled":
+            return
+        self._booked[appointment_id] = (doctor_id, minute)
+        insort(self._starts.setdefault(doctor_id, []), minute)
+        self._forget_days(doctor_id, minute)
+
+    def _forget_days(self, doctor_id, minute):
+        # A booking can spill into the next day when it starts just before midnight
+        for m in (minute, minute + self.slot_minutes - 1):
+            self._days.pop((doctor_id, m // 1440), None)
+
+    def apply_changes(self, changes):
+        """ChangeListener callback: re-reads the appointments named in a batch of notifications."""
+        # Schedule edits and bulk imports (one notification, no ids) need a full reload
+        if any(c.get("table") in (None, "doctors") or
+               (c.get("table") == "appointments" and c.get("op") == "IMPORT") for c in changes):
+            self.invalidate()
+            return
+        if not self._loaded:
+            return
+        deleted = {c["id"] for c in changes if c.get("table") == "appointments" and c.get("op") == "DELETE"}
+        changed = {c["id"] for c in changes if c.get("table") == "appointments" and c.get("op") != "DELETE"}
+        changed -= deleted
+        for appointment_id in deleted:
+            self.discard(appointment_id)
+        if not changed:
+            return
+        conn = self.connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT appointment_id, doctor_id, appointment_date, status FROM appointments "
+                    "WHERE appointment_id = ANY(%s)",
+                    (sorted(changed),)
+                )
+                rows = {row["appointment_id"]: row for row in cur.fetchall()}
+        finally:
+            conn.close()
+        for appointment_id in changed:
+            row = rows.get(appointment_id)
+            if row is None:
+                self.discard(appointment_id)
+            else:
+                self.apply(appointment_id, row["doctor_id"], row["appointment_date"], row["status"])
+
+    # -- queries --
+
+    def doctors(self, doctor_id=None, specialization=None):
+        self.ensure_loaded()
+        with self._lock:
+            doctors = list(self._doctors.values())
+        if doctor_id is not None:
+            doctors = [d for d in doctors if d.doctor_id == doctor_id]
+        if specialization:
+            wanted = specialization.casefold()
+            doctors = [d for d in doctors if (d.specialization or "").casefold() == wanted]
+        return sorted(doctors, key=lambda d: (d.specialization or "", d.last_name or "", d.doctor_id))
+
+    def _free_day(self, schedule, ordinal):
+        """(indexes into schedule.offsets, labels) of the slots no booking overlaps (lock held)."""
+        key = (schedule.doctor_id, ordinal)
+        cached = self._days.get(key)
+        if cached is not None:
+            return cached
+        if len(self._days) >= MAX_CACHED_DAYS:
+            self._days.clear()
+        starts = self._starts.get(schedule.doctor_id, [])
+        base = ordinal * 1440
+        length = self.slot_minutes
+        i = bisect_right(starts, base + schedule.offsets[0] - length)
+        free = []
+        for n, offset in enumerate(schedule.offsets):
+            slot_start = base + offset
+            # Skip bookings that end before this slot; what is left overlaps iff it starts before the slot ends
+            while i < len(starts) and starts[i] <= slot_start - length:
+                i += 1
+            if i < len(starts) and starts[i] < slot_start + length:
+                continue
+            free.append(n)
+        cached = self._days[key] = (tuple(free), tuple(schedule.labels[n] for n in free))
+        return cached
+
+    def _walk(self, doctor_id, start_day, end_day, now):
+        """[(day ordinal, schedule, free slot indexes, labels)] for each working day in the range."""
+        self.ensure_loaded()
+        now_minute = _minute(now)
+        today = now_minute // 1440
+        days = []
+        with self._lock:
+            schedule = self._doctors.get(doctor_id)
+            if schedule is None or not schedule.offsets:
+                return days
+            for ordinal in range(max(start_day.toordinal(), today), end_day.toordinal() + 1):
+                # Ordinal 1 (0001-01-01) was a Monday
+                if (ordinal - 1) % 7 not in schedule.weekdays:
+                    continue
+                free, labels = self._free_day(schedule, ordinal)
+                if ordinal == today:
+                    free = [n for n in free if ordinal * 1440 + schedule.offsets[n] >= now_minute]
+                    labels = [schedule.labels[n] for n in free]
+                days.append((ordinal, schedule, free, labels))
+        return days
+
+    def free_slots(self, doctor_id, start_day, end_day, now=None):
+        """Free slot start times for one doctor from ``start_day`` to ``end_day`` inclusive."""
+        return [
+            datetime.fromordinal(ordinal) + timedelta(minutes=schedule.offsets[n])
+            for ordinal, schedule, free, _ in self._walk(doctor_id, start_day, end_day, now or datetime.now())
+            for n in free
+        ]
+
+    def free_labels(self, doctor_id, start_day, end_day, now=None):
+        """Like free_slots, but as {"YYYY-MM-DD": ["HH:MM", ...]} for JSON responses."""
+        return {
+            date.fromordinal(ordinal).isoformat(): labels
+            for ordinal, _, _, labels in self._walk(doctor_id, start_day, end_day, now or datetime.now())
+            if labels
+        }
+
+    def is_free(self, doctor_id, start):
+        """True when ``start`` is a slot in the doctor's hours that no booking overlaps."""
+        return start in self.free_slots(doctor_id, start.date(), start.date(), now=start)
+
+    def nearest_free(self, doctor_id, around, count=3, days=7):
+        """Up to ``count`` free slots closest to ``around`` within ``days`` either side."""
+        slots = self.free_slots(
+            doctor_id, max(date.today(), (around - timedelta(days=days)).date()), (around + timedelta(days=days)).date()
+        )
+        return sorted(sorted(slots, key=lambda s: abs(s - around))[:count])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "loads": self.loads,
+                "doctors": len(self._doctors),
+                "booked_slots": len(self._booked),
+                "cached_days": len(self._days),
+                "slot_minutes": self.slot_minutes,
+            }
+
+
+# ---------- Request Handling ----------
+
+def parse_availability_args(args):
+    """Returns (doctor_id, specialization, start_day, end_day) from the query string."""
+    doctor_id = args.get("doctor_id")
+    if doctor_id not in (None, ""):
+        try:
+            doctor_id = int(doctor_id)
+        except ValueError:
+            raise BadAvailabilityRequest("doctor_id must be an integer")
+    else:
+        doctor_id = None
+    try:
+        start_day = date.fromisoformat(args["from"]) if args.get("from") else date.today()
+        end_day = date.fromisoformat(args["to"]) if args.get("to") else start_day + timedelta(days=6)
+    except ValueError:
+        raise BadAvailabilityRequest("from and to must be dates (YYYY-MM-DD)")
+    if end_day < start_day:
+        raise BadAvailabilityRequest("to must not be before from")
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        raise BadAvailabilityRequest(f"The date range is limited to {MAX_RANGE_DAYS} days")
+    return doctor_id, args.get("specialization"), start_day, end_day
+
+
+def availability_payload(index, args):
+    """JSON body for an availability request: free slots grouped by doctor and day."""
+    doctor_id, specialization, start_day, end_day = parse_availability_args(args)
+    doctors = []
+    for doctor in index.doctors(doctor_id, specialization):
+        days = index.free_labels(doctor.doctor_id, start_day, end_day)
+        doctors.append(dict(doctor.info(), free_slots=days, free_count=sum(len(v) for v in days.values())))
+    return {
+        "from": start_day.isoformat(),
+        "to": end_day.isoformat(),
+        "slot_minutes": index.slot_minutes,
+        "doctors": doctors,
+    }
+
+
+def conflict_payload(index, doctor_id, start, count=3):
+    """Body of the 409 sent when ``start`` is already taken, with nearby free slots to offer."""
+    alternatives = []
+    if start is not None:
+        try:
+            slots = index.nearest_free(doctor_id, start, count + 1)
+        except Exception as e:
+            print(f"Error finding alternative slots: {e}")
+            slots = []
+        # The index may not have heard about the booking that beat this one yet
+        alternatives = [{
+            "date": slot.date().isoformat(),
+            "time": slot.strftime("%H:%M"),
+            "appointment_date": slot.isoformat(),
+        } for slot in slots if slot != start][:count]
+    message = "That time is already booked for this doctor."
+    if alternatives:
+        message += " Free times nearby: " + ", ".join(f"{a['date']} {a['time']}" for a in alternatives)
+    return {"error": message, "alternatives": alternatives}
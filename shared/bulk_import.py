@@ -0,0 +1,410 @@
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime
+
+import psycopg2
+import psycopg2.extensions
+
+IMPORT_FORMATS = ("csv", "ndjson")
+# The report lists at most this many row errors (the counts always cover every row)
+MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+# Rows are validated and written to the COPY buffer this many at a time
+CHUNK_SIZE = 1000
+# Buffer kept in memory before it spills to a temporary file
+SPOOL_BYTES = 16 * 1024 * 1024
+
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_TIME_OF_DAY = re.compile(r"^([01]?[0-9]|2[0-3]):[0-5][0-9]$")
+APPOINTMENT_STATUSES = ("scheduled", "completed", "cancelled")
+
+
+class BadImportRequest(ValueError):
+    """Raised for an unknown table or format, or a file that cannot be read (answered with 400)."""
+
+
+class RowError(ValueError):
+    """One row failed validation; the message goes into the import report."""
+
+
+# ---------- Reading ----------
+
+def detect_format(filename=None, content_type=None, requested=None):
+    """Picks 'csv' or 'ndjson' from an explicit choice, the file extension or the content type."""
+    if requested:
+        if requested not in IMPORT_FORMATS:
+            raise BadImportRequest(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+        return requested
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    content_type = (content_type or "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    if "csv" in content_type:
+        return "csv"
+    raise BadImportRequest("Could not tell the file format; pass format=csv or format=ndjson")
+
+
+def read_records(stream, fmt):
+    """Yields ``(row_number, record, error)`` for each row of a binary stream, one at a time.
+
+    Row numbers count data rows from 1 (the CSV header is not a row). Blank
+    NDJSON lines are skipped; a line that is not a JSON object yields an error.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            if not reader.fieldnames:
+                return
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+            for number, record in enumerate(reader, start=1):
+                yield number, record, None
+        else:
+            number = 0
+            for line in text:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    yield number, None, "Not valid JSON"
+                    continue
+                if not isinstance(record, dict):
+                    yield number, None, "Each line must be a JSON object"
+                    continue
+                yield number, record, None
+    except UnicodeDecodeError:
+        raise BadImportRequest("File must be UTF-8 encoded")
+    finally:
+        text.detach()
+
+
+# ---------- Field Validation ----------
+
+def _text(record, field, max_length=None, required=False):
+    value = record.get(field)
+    if value is not None and not isinstance(value, str):
+        value = str(value)
+    value = value.strip() if value else None
+    if not value:
+        if required:
+            raise RowError(f"{field} is required")
+        return None
+    if max_length and len(value) > max_length:
+        raise RowError(f"{field} must be at most {max_length} characters")
+    return value
+
+def _int(record, field, required=False):
+    value = _text(record, field, required=required)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f"{field} must be a whole number")
+
+def _date(record, field):
+    value = _text(record, field)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"{field} must be a date (YYYY-MM-DD)")
+
+def _datetime(record, field):
+    value = _text(record, field, required=True)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"{field} must be a date and time (YYYY-MM-DDTHH:MM)")
+
+def _reminder_times(record):
+    value = record.get("reminder_times")
+    if isinstance(value, str):
+        value = value.strip()
+        # CSV cells hold either a JSON array or times separated by ';'
+        if value.startswith("["):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise RowError("reminder_times is not a valid JSON array")
+        else:
+            value = [part for part in re.split(r"[;,\s]+", value) if part]
+    if not value:
+        return []
+    if not isinstance(value, list) or not all(isinstance(t, str) and _TIME_OF_DAY.match(t.strip()) for t in value):
+        raise RowError("reminder_times must be a list of HH:MM times")
+    return [t.strip().zfill(5) for t in value]
+
+
+# ---------- Import Specs ----------
+# Each table lists the staging columns filled from validated rows, set-based
+# checks that drop bad staged rows (one statement each, reported per row) and
+# the INSERT ... SELECT that moves the survivors into the real table. Tables
+# with a uniqueness rule insert with ON CONFLICT DO NOTHING and return a key,
+# so rows that lost to a conflict can be reported too.
+
+class ImportSpec:
+    def __init__(self, table, staging, validate, checks, insert, key=None, conflict_error=None):
+        self.table = table
+        self.staging = staging  # [(column, SQL type)]
+        self.validate = validate
+        self.checks = checks  # [(condition on staged row s, error message)]
+        self.insert = insert
+        self.key = key  # staging columns matching what the INSERT returns
+        self.conflict_error = conflict_error
+
+    @property
+    def columns(self):
+        return [column for column, _ in self.staging]
+
+
+def _validate_patient(record, seen):
+    email = _text(record, "email", 100, required=True)
+    if not _EMAIL.match(email):
+        raise RowError("email is not a valid address")
+    if email in seen:
+        raise RowError("Email appears more than once in this file")
+    row = (
+        _text(record, "first_name", 50, required=True),
+        _text(record, "last_name", 50, required=True),
+        email,
+        # Passwords are taken as given (no trimming)
+        str(record["password"]) if record.get("password") else None,
+        _text(record, "phone", 20),
+        _date(record, "dob"),
+    )
+    seen.add(email)
+    return row
+
+def _validate_appointment(record, seen):
+    status = _text(record, "status") or "scheduled"
+    if status not in APPOINTMENT_STATUSES:
+        raise RowError(f"status must be one of: {', '.join(APPOINTMENT_STATUSES)}")
+    return (
+        _int(record, "patient_id", required=True),
+        _int(record, "doctor_id", required=True),
+        _datetime(record, "appointment_date"),
+        _text(record, "reason"),
+        status,
+    )
+
+def _validate_prescription(record, seen):
+    return (
+        _int(record, "patient_id", required=True),
+        _int(record, "appointment_id"),
+        _text(record, "medication_name", 100, required=True),
+        _text(record, "dosage", 50),
+        _text(record, "frequency", 50),
+        json.dumps(_reminder_times(record)),
+    )
+
+
+IMPORTS = {
+    "patients": ImportSpec(
+        "patients",
+        [("first_name", "TEXT"), ("last_name", "TEXT"), ("email", "TEXT"), ("password_hash", "TEXT"),
+         ("phone", "TEXT"), ("dob", "DATE")],
+        _validate_patient,
+        [("EXISTS (SELECT 1 FROM patients p WHERE p.email = s.email)", "Email already exists")],
+        """
+            INSERT INTO patients (first_name, last_name, email, password_hash, phone, dob)
+            SELECT first_name, last_name, email, password_hash, phone, dob
+            FROM import_rows ORDER BY row_number
+            ON CONFLICT DO NOTHING
+            RETURNING email
+        """,
+        key=["email"],
+        conflict_error="Email already exists",
+    ),
+    "appointments": ImportSpec(
+        "appointments",
+        [("patient_id", "INT"), ("doctor_id", "INT"), ("appointment_date", "TIMESTAMP"),
+         ("reason", "TEXT"), ("status", "TEXT")],
+        _validate_appointment,
+        [
+            ("NOT EXISTS (SELECT 1 FROM patients p WHERE p.patient_id = s.patient_id)", "Patient not found"),
+            ("NOT EXISTS (SELECT 1 FROM doctors d WHERE d.doctor_id = s.doctor_id)", "Doctor not found"),
+        ],
+        # The no-double-booking constraint turns overlaps into skipped rows
+        # instead of aborting the whole import; earlier rows in the file win
+        """
+            INSERT INTO appointments (patient_id, doctor_id, appointment_date, reason, status)
+            SELECT patient_id, doctor_id, appointment_date, reason, status
+            FROM import_rows ORDER BY row_number
+            ON CONFLICT DO NOTHING
+            RETURNING patient_id, doctor_id, appointment_date
+        """,
+        key=["patient_id", "doctor_id", "appointment_date"],
+        conflict_error="That time is already booked for this doctor.",
+    ),
+    "prescriptions": ImportSpec(
+        "prescriptions",
+        [("patient_id", "INT"), ("appointment_id", "INT"), ("medication_name", "TEXT"),
+         ("dosage", "TEXT"), ("frequency", "TEXT"), ("reminder_times", "JSONB")],
+        _validate_prescription,
+        [
+            ("NOT EXISTS (SELECT 1 FROM patients p WHERE p.patient_id = s.patient_id)", "Patient not found"),
+            ("s.appointment_id IS NOT NULL AND NOT EXISTS "
+             "(SELECT 1 FROM appointments a WHERE a.appointment_id = s.appointment_id)", "Appointment not found"),
+        ],
+        """
+            INSERT INTO prescriptions (patient_id, appointment_id, medication_name, dosage, frequency, reminder_times)
+            SELECT patient_id, appointment_id, medication_name, dosage, frequency, reminder_times
+            FROM import_rows ORDER BY row_number
+        """,
+    ),
+}
+
+
+def get_spec(table):
+    spec = IMPORTS.get(table)
+    if spec is None:
+        raise BadImportRequest(f"Can only import: {', '.join(IMPORTS)}")
+    return spec
+
+
+# ---------- Importing ----------
+
+class ImportReport:
+    def __init__(self, table, dry_run):
+        self.table = table
+        self.dry_run = dry_run
+        self.received = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    def error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def to_dict(self):
+        self.errors.sort(key=lambda e: e["row"])
+        return {
+            "table": self.table,
+            "dry_run": self.dry_run,
+            "received": self.received,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(time.monotonic() - self.started, 3),
+        }
+
+
+def _hash_passwords(rows, hasher):
+    # Hashing goes through the shared worker pool and its queue limit, so an
+    # import cannot take every core from logins. Rows without a password share
+    # the placeholder hash the single-patient endpoint uses.
+    given = [i for i, row in enumerate(rows) if row[3] is not None]
+    hashes = [hasher.placeholder_hash() if len(given) < len(rows) else None] * len(rows)
+    for i, h in zip(given, hasher.hash_many([rows[i][3] for i in given])):
+        hashes[i] = h
+    return [row[:3] + (h,) + row[4:] for row, h in zip(rows, hashes)]
+
+
+def _stage(records, spec, report, buffer, hasher):
+    """Validates records a chunk at a time and writes the good ones to ``buffer`` as CSV."""
+    writer = csv.writer(buffer)
+    seen = set()
+    if spec.table != "patients":
+        hasher = None
+    chunk = []
+    for row_number, record, error in records:
+        report.received += 1
+        if error:
+            report.error(row_number, error)
+            continue
+        try:
+            chunk.append((row_number, spec.validate(record, seen)))
+        except RowError as e:
+            report.error(row_number, str(e))
+        if len(chunk) >= CHUNK_SIZE:
+            _write_chunk(writer, chunk, hasher)
+            chunk = []
+    _write_chunk(writer, chunk, hasher)
+
+
+def _write_chunk(writer, chunk, hasher):
+    if not chunk:
+        return
+    numbers = [number for number, _ in chunk]
+    rows = [row for _, row in chunk]
+    if hasher is not None:
+        rows = _hash_passwords(rows, hasher)
+    writer.writerows((number,) + row for number, row in zip(numbers, rows))
+
+
+def run_import(conn, table, records, hasher, dry_run=False):
+    """Validates ``records`` and loads the valid rows into ``table`` in one transaction.
+
+    ``records`` comes from read_records(); patient passwords are hashed with
+    ``hasher`` (a shared.passwords.PasswordHasher), which raises
+    HashingUnavailable when its pool is saturated. Valid rows are streamed into a
+    temporary staging table with COPY; database-side checks (unknown ids,
+    existing emails, overlapping bookings) drop individual rows rather than
+    failing the import. Returns the report dict. With ``dry_run`` nothing is
+    kept. The caller owns ``conn``; it is committed or rolled back here.
+    """
+    spec = get_spec(table)
+    report = ImportReport(table, dry_run)
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES, mode="w+", newline="") as buffer:
+        _stage(records, spec, report, buffer, hasher)
+        buffer.seek(0)
+        try:
+            # Plain tuples, whatever cursor_factory the connection was opened with
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                # One clinic_changes notification for the whole import instead of one per row
+                cur.execute("SET LOCAL sehat.bulk_import = 'on'")
+                columns = ", ".join(f"{column} {sql_type}" for column, sql_type in spec.staging)
+                cur.execute(f"CREATE TEMP TABLE import_rows (row_number INT PRIMARY KEY, {columns}) ON COMMIT DROP")
+                cur.copy_expert(
+                    f"COPY import_rows (row_number, {', '.join(spec.columns)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+                for condition, message in spec.checks:
+                    cur.execute(f"DELETE FROM import_rows s WHERE {condition} RETURNING row_number")
+                    for (row_number,) in cur.fetchall():
+                        report.error(row_number, message)
+
+                cur.execute(spec.insert)
+                if spec.key:
+                    inserted = Counter(tuple(row) for row in cur.fetchall())
+                    report.imported = sum(inserted.values())
+                    cur.execute(f"SELECT row_number, {', '.join(spec.key)} FROM import_rows ORDER BY row_number")
+                    for row_number, *key in cur.fetchall():
+                        key = tuple(key)
+                        if inserted[key]:
+                            inserted[key] -= 1
+                        else:
+                            report.error(row_number, spec.conflict_error)
+                else:
+                    report.imported = cur.rowcount
+
+                if report.imported:
+                    cur.execute(
+                        "SELECT pg_notify('clinic_changes', %s)",
+                        (json.dumps({"table": spec.table, "op": "IMPORT", "id": None}),)
+                    )
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return report.to_dict()
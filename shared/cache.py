@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# ---------- In-process TTL Cache ----------
+class TTLCache:
+    """Small thread-safe key/value cache whose entries expire after ``ttl`` seconds.
+
+    With ``maxsize`` set it is also an LRU: reads refresh an entry's recency
+    and inserting past the limit evicts the least recently used entry.
+
+    ``get_or_set`` lets concurrent callers that miss on the same cache share a
+    single computation, and ``invalidate`` bumps a generation counter so a
+    value computed before a write is never stored after it.
+    """
+
+    def __init__(self, ttl, maxsize=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self._fill_lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                self._data.move_to_end(key)
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+
+    def get_or_set(self, key, compute):
+        """Return the cached value for ``key`` or compute, store and return it."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        with self._fill_lock:
+            # Another thread may have filled the entry while we waited
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+                generation = self._generation
+            value = compute()
+            self.set(key, value, generation)
+            return value
+
+    def invalidate(self, key=None):
+        """Drop ``key`` (or every entry when no key is given)."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,135 @@
+import math
+import os
+import re
+import threading
+import uuid
+from collections import deque
+
+from shared.cache import TTLCache
+
+_CONVERSATION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Longer messages are cut before they reach the prompt
+MAX_MESSAGE_TOKENS = 500
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def clip(text, max_tokens):
+    """Cuts ``text`` down to roughly ``max_tokens`` tokens."""
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rstrip() + "…"
+
+
+class Conversation:
+    def __init__(self):
+        self.turns = deque()  # (user message, assistant reply), oldest first
+        self.summary = deque()  # one short line per turn folded out of `turns`
+        self.lock = threading.Lock()
+
+
+# ---------- Conversation Memory ----------
+class ConversationStore:
+    """Per-conversation chat history that keeps prompts under a fixed size.
+
+    Each conversation holds at most ``max_turns`` recent turns and the history
+    sent with a prompt never exceeds ``token_budget`` tokens. When a new turn
+    pushes it over, the oldest turns are folded into a one-line-per-turn
+    summary of what the user asked (itself capped at ``summary_budget``
+    tokens, oldest lines dropped first). Conversations idle for ``idle_ttl``
+    seconds are forgotten, and at most ``max_conversations`` are kept.
+    """
+
+    def __init__(self, token_budget=1000, max_turns=10, summary_budget=150,
+                 idle_ttl=1800, max_conversations=10000):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_budget = summary_budget
+        # A single long answer may use at most half the budget, so the latest turn always fits
+        self.max_turn_tokens = max(1, (token_budget - summary_budget) // 2)
+        self._conversations = TTLCache(ttl=idle_ttl, maxsize=max_conversations)
+        self._lock = threading.Lock()
+        self.summarized_turns = 0
+
+    def conversation_id(self, requested=None):
+        """Returns ``requested`` if it looks like one of our ids, else a fresh id."""
+        if requested and _CONVERSATION_ID.match(str(requested)):
+            return requested
+        return uuid.uuid4().hex
+
+    def context(self, conversation_id):
+        """History block to put in front of the next question ('' for a new conversation)."""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return ""
+        with conversation.lock:
+            lines = []
+            if conversation.summary:
+                lines.append("Earlier in this conversation the user asked about:")
+                lines.extend(f"- {point}" for point in conversation.summary)
+            if conversation.turns:
+                lines.append("Recent conversation:")
+                for question, answer in conversation.turns:
+                    lines.append(f"User: {question}")
+                    lines.append(f"Assistant: {answer}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def record(self, conversation_id, user_message, reply):
+        """Adds a finished turn, summarizing older turns to stay within the budget."""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            with self._lock:
+                conversation = self._conversations.get(conversation_id)
+                if conversation is None:
+                    conversation = Conversation()
+                    self._conversations.set(conversation_id, conversation)
+        turn = (clip(user_message, self.max_turn_tokens // 2), clip(reply, self.max_turn_tokens))
+        folded = 0
+        with conversation.lock:
+            conversation.turns.append(turn)
+            while conversation.turns and (
+                len(conversation.turns) > self.max_turns or self._tokens(conversation) > self.token_budget
+            ):
+                question, _ = conversation.turns.popleft()
+                conversation.summary.append(clip(question, 30))
+                folded += 1
+                while conversation.summary and self._summary_tokens(conversation) > self.summary_budget:
+                    conversation.summary.popleft()
+        # Re-storing refreshes the idle timer
+        self._conversations.set(conversation_id, conversation)
+        if folded:
+            with self._lock:
+                self.summarized_turns += folded
+
+    def _summary_tokens(self, conversation):
+        return sum(estimate_tokens(point) + 1 for point in conversation.summary)
+
+    def _tokens(self, conversation):
+        turns = sum(estimate_tokens(q) + estimate_tokens(a) + 4 for q, a in conversation.turns)
+        return turns + self._summary_tokens(conversation)
+
+    def stats(self):
+        stats = self._conversations.stats()
+        with self._lock:
+            summarized = self.summarized_turns
+        return {
+            "conversations": stats["size"],
+            "max_conversations": stats["maxsize"],
+            "evicted": stats["evictions"],
+            "token_budget": self.token_budget,
+            "max_turns": self.max_turns,
+            "summarized_turns": summarized,
+        }
+
+
+def create_conversation_store():
+    return ConversationStore(
+        token_budget=int(os.getenv("CHAT_MEMORY_TOKENS", "1000")),
+        max_turns=int(os.getenv("CHAT_MEMORY_TURNS", "10")),
+        idle_ttl=float(os.getenv("CHAT_MEMORY_IDLE", "1800")),
+    )
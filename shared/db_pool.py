@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no connection becomes free within the checkout timeout."""
+
+
+# ---------- Pooled Connection Proxy ----------
+class PooledConnection:
+    """Wraps a psycopg2 connection so that close() hands it back to the pool.
+
+    Route handlers keep calling conn.cursor() / commit() / rollback() / close()
+    exactly like they did with a plain psycopg2 connection.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    @property
+    def raw(self):
+        return self._conn
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.putconn(conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._conn is not None:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        self.close()
+
+
+# ---------- Connection Pool ----------
+class ConnectionPool:
+    """Bounded, thread-safe psycopg2 connection pool.
+
+    Idle connections are kept in a LIFO stack so the warmest socket is reused
+    first. Checkout validates the connection (closed flag, transaction state
+    and, after a period of idleness, a ``SELECT 1`` ping) before handing it out.
+    """
+
+    def __init__(self, min_size=1, max_size=10, timeout=5.0, ping_after=30.0, **connect_kwargs):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("invalid pool size: min=%s max=%s" % (min_size, max_size))
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._connect_kwargs = connect_kwargs
+        self._idle = deque()  # (connection, returned_at)
+        self._size = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._warmed = False
+        self._closed = False
+        # Optional callable(seconds) told how long each connection() checkout took
+        self.on_checkout = None
+        self._counters = {
+            "checkouts": 0,
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "discarded": 0,
+        }
+
+    def _connect(self):
+        return psycopg2.connect(**self._connect_kwargs)
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        status = conn.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        if idle_for >= self.ping_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _discard(self, conn):
+        # Caller holds self._cond
+        self._size -= 1
+        self._counters["discarded"] += 1
+        self._cond.notify()
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _warm(self):
+        """Open min_size connections on first use rather than at import time."""
+        self._warmed = True
+        while self._size < self.min_size:
+            self._size += 1
+            self._cond.release()
+            try:
+                conn = self._connect()
+            except psycopg2.Error:
+                self._cond.acquire()
+                self._size -= 1
+                return
+            self._cond.acquire()
+            self._idle.append((conn, time.monotonic()))
+
+    def getconn(self, timeout=None):
+        """Check out a raw psycopg2 connection, waiting up to ``timeout`` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        with self._cond:
+            if self._closed:
+                raise psycopg2.InterfaceError("connection pool is closed")
+            if not self._warmed:
+                self._warm()
+            self._counters["checkouts"] += 1
+
+        while True:
+            candidate = None
+            with self._cond:
+                while candidate is None:
+                    if self._idle:
+                        candidate = self._idle.pop()
+                    elif self._size < self.max_size:
+                        self._size += 1
+                        self._counters["misses"] += 1
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._counters["timeouts"] += 1
+                            raise PoolTimeout("timed out after %.1fs waiting for a database connection" % timeout)
+                        if not waited:
+                            waited = True
+                            self._counters["waits"] += 1
+                        self._cond.wait(remaining)
+
+            if candidate is None:
+                break
+            # Validate outside the lock: a ping is a network round trip
+            conn, returned_at = candidate
+            if self._is_healthy(conn, time.monotonic() - returned_at):
+                with self._cond:
+                    self._counters["hits"] += 1
+                return conn
+            with self._cond:
+                self._discard(conn)
+
+        # Open the new connection outside the lock so slow handshakes don't block returns
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn):
+        """Return a connection to the pool, rolling back any open transaction."""
+        with self._cond:
+            if self._closed or conn.closed:
+                self._discard(conn)
+                return
+        try:
+            if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            with self._cond:
+                self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def connection(self, timeout=None):
+        """Check out a connection wrapped so that ``close()`` returns it to the pool."""
+        started = time.perf_counter()
+        conn = self.getconn(timeout)
+        if self.on_checkout is not None:
+            self.on_checkout(time.perf_counter() - started)
+        return PooledConnection(self, conn)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            })
+        return stats
+
+
+def create_pool(db_config, **connect_kwargs):
+    """Build a pool for ``db_config`` sized from the DB_POOL_* environment variables."""
+    return ConnectionPool(
+        min_size=int(os.getenv("DB_POOL_MIN", "1")),
+        max_size=int(os.getenv("DB_POOL_MAX", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30")),
+        **db_config,
+        **connect_kwargs,
+    )
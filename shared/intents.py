@@ -0,0 +1,148 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, namedtuple
+
+from shared.assistant import normalize_message
+
+LocalMatch = namedtuple("LocalMatch", ["id", "type", "answer", "suggestions", "score"])
+
+# Function words that carry no meaning for matching ("how do i ..." vs "can i ...")
+STOP_WORDS = frozenset(
+    "a an and are can could do does for how i in is it me my of on please the to what "
+    "when where which who will with would you your".split()
+)
+
+
+# Symptoms that may need urgent care. Messages mentioning any of them always go
+# to the model, which gives safety guidance, however well they match a canned
+# answer ("I need to see a doctor about chest pain" is not a booking question).
+RED_FLAGS = re.compile(r"\b(?:" + "|".join([
+    r"chest (?:pain|pains|tightness|pressure)", r"heart attack", r"stroke", r"breath\w*",
+    r"bleed\w*", r"blood", r"unconscious", r"pass(?:ed|ing)? out", r"faint\w*", r"collaps\w*",
+    r"seizures?", r"convuls\w*", r"chok\w*", r"numb(?:ness)?", r"paralys\w*", r"slurred",
+    r"overdos\w*", r"poison\w*", r"suicid\w*", r"kill (?:myself|me)", r"self harm",
+    r"anaphyla\w*", r"swollen (?:throat|tongue|face)", r"severe",
+]) + r")\b")
+
+
+def is_red_flag(text):
+    """True when the message mentions a symptom that should never get a canned reply."""
+    return RED_FLAGS.search(normalize_message(text)) is not None
+
+
+def tokenize(text):
+    """Unigrams plus adjacent-word bigrams of the normalized message."""
+    words = [w for w in normalize_message(text).split() if w not in STOP_WORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+# ---------- TF-IDF Index ----------
+class TfidfIndex:
+    """Small in-memory TF-IDF index with cosine-similarity lookup.
+
+    Documents are short example phrasings, so vectors are plain dicts and a
+    query is scored against every document; with a few hundred phrasings this
+    takes well under a millisecond.
+    """
+
+    def __init__(self, documents):
+        """``documents`` is a list of (label, text) pairs."""
+        tokenized = [(label, tokenize(text)) for label, text in documents]
+        df = Counter()
+        for _, tokens in tokenized:
+            df.update(set(tokens))
+        n = len(tokenized)
+        self.idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        # Words never seen in the corpus are weighted like the rarest ones, so a
+        # query full of unknown words scores low instead of matching on the rest
+        self.unknown_idf = math.log(1 + n) + 1
+        self.documents = [(label, self._vector(tokens)) for label, tokens in tokenized]
+
+    def _vector(self, tokens):
+        counts = Counter(tokens)
+        vector = {t: (1 + math.log(c)) * self.idf.get(t, self.unknown_idf) for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {t: v / norm for t, v in vector.items()} if norm else {}
+
+    def search(self, text):
+        """Returns (label, cosine score) of the closest document, or (None, 0.0)."""
+        query = self._vector(tokenize(text))
+        best_label, best_score = None, 0.0
+        if not query:
+            return best_label, best_score
+        for label, vector in self.documents:
+            score = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            if score > best_score:
+                best_label, best_score = label, score
+        return best_label, best_score
+
+
+# ---------- Local Intent Router ----------
+class IntentRouter:
+    """Answers navigation intents and common FAQs without calling the model.
+
+    The corpus is a JSON list of entries with ``id``, ``type`` ('intent' or
+    'faq'), example ``questions``, an ``answer`` and optional ``suggestions``.
+    A message is answered locally only when its best match scores at least
+    ``threshold`` and it mentions no RED_FLAGS symptom; everything else goes
+    on to the LLM.
+    """
+
+    def __init__(self, entries, threshold=0.6, max_words=20):
+        self.entries = {entry["id"]: entry for entry in entries}
+        self.threshold = threshold
+        # Long messages are usually specific questions that deserve the model
+        self.max_words = max_words
+        self.index = TfidfIndex([
+            (entry["id"], question)
+            for entry in entries
+            for question in entry["questions"]
+        ])
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def match(self, message):
+        """Returns a LocalMatch for a confident hit, or None to fall through to the model."""
+        label, score = (None, 0.0)
+        red_flag = is_red_flag(message)
+        if not red_flag and len(message.split()) <= self.max_words:
+            label, score = self.index.search(message)
+        with self._lock:
+            self._counters["messages"] += 1
+            if red_flag:
+                self._counters["red_flags"] += 1
+            if label is None or score < self.threshold:
+                self._counters["forwarded"] += 1
+                return None
+            entry = self.entries[label]
+            self._counters[f"local_{entry['type']}"] += 1
+        return LocalMatch(entry["id"], entry["type"], entry["answer"], entry.get("suggestions"), round(score, 4))
+
+    def stats(self):
+        with self._lock:
+            messages = self._counters["messages"]
+            local = self._counters["local_intent"] + self._counters["local_faq"]
+            return {
+                "entries": len(self.entries),
+                "threshold": self.threshold,
+                "messages": messages,
+                "answered_locally": local,
+                "intents": self._counters["local_intent"],
+                "faqs": self._counters["local_faq"],
+                "forwarded": self._counters["forwarded"],
+                "red_flags": self._counters["red_flags"],
+                "local_answer_rate": round(local / messages, 4) if messages else 0.0,
+            }
+
+
+def create_router(path):
+    """Loads the router for the corpus at ``path``; CHAT_LOCAL_THRESHOLD tunes how eagerly it answers."""
+    return IntentRouter.from_file(path, threshold=float(os.getenv("CHAT_LOCAL_THRESHOLD", "0.6")))
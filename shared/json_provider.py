@@ -0,0 +1,78 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from time import perf_counter
+from uuid import UUID
+
+from flask.json.provider import JSONProvider
+
+from shared.metrics import record_serialization
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """Types neither encoder handles on its own."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if orjson is None:
+        if isinstance(value, (datetime, date, time)):
+            return value.isoformat()
+        if isinstance(value, UUID):
+            return str(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode("utf-8")
+
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps_bytes(obj):
+        return dumps(obj).encode("utf-8")
+
+    loads = json.loads
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (stdlib json if it is not installed).
+
+    datetime/date/time come out as ISO 8601 strings, Decimal as a number and
+    JSONB values (already lists/dicts from psycopg2) as themselves, so rows
+    from RealDictCursor can be passed to jsonify as they are. Output is
+    compact and keys keep their query order.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        started = perf_counter()
+        body = dumps_bytes(obj) + b"\n"
+        record_serialization(perf_counter() - started)
+        return self._app.response_class(body, mimetype="application/json")
+
+
+def install_json_provider(app):
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,158 @@
+import json
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+from flask import Response
+
+from shared.json_provider import dumps
+
+
+# ---------- Server-Sent Events Broker ----------
+class EventBroker:
+    """Fans events out to every connected SSE client.
+
+    Each subscriber gets a small bounded queue; a client too slow to drain it
+    is dropped rather than letting memory grow (its browser will reconnect).
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event, data):
+        message = format_sse(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                self.unsubscribe(q)
+                try:
+                    q.get_nowait()
+                    q.put_nowait(None)  # tell the stream to end
+                except (queue.Empty, queue.Full):
+                    pass
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, q, initial=(), heartbeat=15.0):
+        """Generator of SSE frames for one client; unsubscribes when the client leaves."""
+        try:
+            for message in initial:
+                yield message
+            while True:
+                try:
+                    message = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment frames keep proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(q)
+
+
+def format_sse(event, data):
+    payload = dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sse_response(frames):
+    """Wraps an iterable of SSE frames in an unbuffered text/event-stream response."""
+    response = Response(frames, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop nginx-style proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+# ---------- PostgreSQL LISTEN/NOTIFY ----------
+class ChangeListener:
+    """Background thread that LISTENs on a channel and hands batches of changes to a callback.
+
+    Notifications arriving within ``debounce`` seconds of the first one are
+    delivered together, so a burst of writes triggers one refresh. The
+    listener keeps its own autocommit connection (LISTEN does not work through
+    a pooled connection that gets rolled back) and reconnects after failures.
+    """
+
+    def __init__(self, db_config, channel, on_changes, debounce=0.25, retry_delay=5.0):
+        self.db_config = db_config
+        self.channel = channel
+        self.on_changes = on_changes
+        self.debounce = debounce
+        self.retry_delay = retry_delay
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=f"listen-{self.channel}", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel};")
+                # Anything committed while we were not listening was missed: ask for a full refresh
+                self.on_changes([{"table": None, "op": "RESYNC", "id": None}])
+                self._listen(conn)
+            except Exception as e:
+                print(f"⚠️ LISTEN {self.channel} failed, retrying in {self.retry_delay}s: {e}")
+                self._stop.wait(self.retry_delay)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            # Collect everything that arrives within `debounce` seconds of the first notification
+            deadline = time.monotonic() + self.debounce
+            while time.monotonic() < deadline:
+                if select.select([conn], [], [], max(0.0, deadline - time.monotonic())) != ([], [], []):
+                    conn.poll()
+            changes = []
+            while conn.notifies:
+                note = conn.notifies.pop(0)
+                try:
+                    changes.append(json.loads(note.payload))
+                except ValueError:
+                    changes.append({"table": None, "op": None, "id": None})
+            if changes:
+                try:
+                    self.on_changes(changes)
+                except Exception as e:
+                    print(f"Error handling {self.channel} notifications: {e}")
@@ -0,0 +1,319 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+DEFAULT_FALLBACK_TEXT = (
+    "The AI assistant is very busy right now. Please try again in a moment, "
+    "or contact the clinic directly if your question is urgent."
+)
+
+GatewayReply = namedtuple("GatewayReply", ["text", "degraded"])
+
+
+class GatewayUnavailable(Exception):
+    """The gateway would not (or could not in time) get an answer from the backend.
+
+    ``reason`` is one of 'busy', 'circuit_open' or 'timeout'.
+    """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# ---------- Backends ----------
+class LLMBackend:
+    """Interface the gateway calls. Implementations must be thread-safe."""
+
+    name = "base"
+
+    @property
+    def available(self):
+        return True
+
+    def generate(self, prompt):
+        """Returns the full reply text for ``prompt``."""
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        """Yields the reply text in pieces as they are produced."""
+        yield self.generate(prompt)
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    @property
+    def available(self):
+        return bool(os.getenv("GEMINI_API_KEY"))
+
+    def _model(self):
+        from shared.assistant import get_model
+        return get_model(self.model_name)
+
+    def generate(self, prompt):
+        response = self._model().generate_content(prompt)
+        return response.text
+
+    def stream(self, prompt):
+        for chunk in self._model().generate_content(prompt, stream=True):
+            text = chunk.text
+            if text:
+                yield text
+
+
+class StubBackend(LLMBackend):
+    """Deterministic local backend for tests, benchmarks and offline development.
+
+    The reply depends only on the prompt, and ``latency`` seconds are spent
+    before answering (spread across chunks when streaming) to mimic a model.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, chunk_words=4):
+        self.latency = latency
+        self.chunk_words = chunk_words
+
+    def generate(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(prompt)
+
+    def stream(self, prompt):
+        words = self._reply(prompt).split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) for i in range(0, len(words), self.chunk_words)]
+        for i, chunk in enumerate(chunks):
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield chunk if i == len(chunks) - 1 else chunk + " "
+
+    @staticmethod
+    def _reply(prompt):
+        lines = [line.strip() for line in prompt.strip().splitlines() if line.strip()]
+        question = lines[-1] if lines else ""
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        return f"[stub {digest}] This is a canned reply for: {question[:120]}"
+
+
+# ---------- Gateway ----------
+class LLMGateway:
+    """Bounded front door for model calls.
+
+    - At most ``max_concurrency`` backend calls run at once on a dedicated
+      pool; up to ``max_queue`` more may wait, anything beyond is rejected
+      immediately instead of tying up a web worker.
+    - Every call has a deadline of ``timeout`` seconds (between chunks when
+      streaming).
+    - After ``failure_threshold`` consecutive failures the circuit opens and
+      calls are answered with the fallback text for ``reset_after`` seconds,
+      then a single trial call decides whether to close it again.
+    """
+
+    def __init__(self, backend, max_concurrency=4, max_queue=16, timeout=20.0,
+                 failure_threshold=5, reset_after=30.0, fallback_text=DEFAULT_FALLBACK_TEXT):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.fallback_text = fallback_text
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._pending = 0  # admitted calls not yet finished (queued + running)
+        self._running = 0
+        self._failures = 0
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._latencies = deque(maxlen=1000)
+        self._counters = {
+            "calls": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "rejected_busy": 0,
+            "rejected_open": 0,
+        }
+
+    @property
+    def available(self):
+        return self.backend.available
+
+    # -- admission and circuit breaker --
+
+    def _admit(self):
+        with self._lock:
+            self._counters["calls"] += 1
+            if self._pending >= self.max_concurrency + self.max_queue:
+                self._counters["rejected_busy"] += 1
+                raise GatewayUnavailable("busy")
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_after or self._probe_in_flight:
+                    self._counters["rejected_open"] += 1
+                    raise GatewayUnavailable("circuit_open")
+                # Half-open: let exactly one call through to test the backend
+                self._probe_in_flight = True
+            self._pending += 1
+
+    def _record(self, ok, started, timed_out=False):
+        with self._lock:
+            self._probe_in_flight = False
+            if ok:
+                self._counters["succeeded"] += 1
+                self._latencies.append(time.monotonic() - started)
+                self._failures = 0
+                self._state = "closed"
+                return
+            self._counters["timeouts" if timed_out else "failed"] += 1
+            self._failures += 1
+            if self._state == "open" or self._failures >= self.failure_threshold:
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    def _run(self, fn, *args):
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+
+    # -- calls --
+
+    def generate(self, prompt):
+        """Returns the reply text or raises GatewayUnavailable / the backend's error."""
+        self._admit()
+        started = time.monotonic()
+        future = self._executor.submit(self._run, self.backend.generate, prompt)
+        try:
+            text = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # The call keeps its pool slot until the backend returns, so a hung
+            # upstream still cannot exceed max_concurrency
+            self._record(False, started, timed_out=True)
+            raise GatewayUnavailable("timeout")
+        except Exception:
+            self._record(False, started)
+            raise
+        self._record(True, started)
+        return text
+
+    def reply(self, prompt):
+        """Like generate(), but degrades to the fallback text instead of raising."""
+        try:
+            return GatewayReply(self.generate(prompt), False)
+        except GatewayUnavailable as e:
+            print(f"⚠️ LLM gateway degraded ({e.reason}), sending fallback reply")
+        except Exception as e:
+            print(f"Error with {self.backend.name} backend: {e}")
+        return GatewayReply(self.fallback_text, True)
+
+    def stream(self, prompt):
+        """Admits the call and returns an iterator of text pieces.
+
+        Admission happens before returning (so rejections raise in the caller);
+        the iterator raises GatewayUnavailable('timeout') if the backend goes
+        quiet for longer than ``timeout``.
+        """
+        self._admit()
+        started = time.monotonic()
+        pieces = queue.Queue()
+
+        def produce():
+            try:
+                for piece in self.backend.stream(prompt):
+                    pieces.put(("piece", piece))
+                pieces.put(("end", None))
+            except Exception as e:
+                pieces.put(("error", e))
+
+        self._executor.submit(self._run, produce)
+
+        def consume():
+            recorded = False
+            try:
+                while True:
+                    try:
+                        kind, value = pieces.get(timeout=self.timeout)
+                    except queue.Empty:
+                        recorded = True
+                        self._record(False, started, timed_out=True)
+                        raise GatewayUnavailable("timeout")
+                    if kind == "piece":
+                        yield value
+                    elif kind == "end":
+                        recorded = True
+                        self._record(True, started)
+                        return
+                    else:
+                        recorded = True
+                        self._record(False, started)
+                        raise value
+            finally:
+                if not recorded:
+                    # The client went away mid-stream; don't leave a half-open probe pending
+                    with self._lock:
+                        self._probe_in_flight = False
+
+        return consume()
+
+    # -- metrics --
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self._counters)
+            stats.update({
+                "backend": self.backend.name,
+                "circuit": self._state,
+                "consecutive_failures": self._failures,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+            })
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        stats["latency_seconds"] = {
+            "samples": len(latencies),
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else None,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+        }
+        return stats
+
+
+def create_gateway(model_name):
+    """Builds the chat gateway from the LLM_* environment variables.
+
+    LLM_BACKEND=stub swaps Gemini for the deterministic local StubBackend.
+    """
+    if os.getenv("LLM_BACKEND", "gemini") == "stub":
+        backend = StubBackend(latency=float(os.getenv("LLM_STUB_LATENCY", "0")))
+    else:
+        backend = GeminiBackend(model_name)
+    return LLMGateway(
+        backend,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+        max_queue=int(os.getenv("LLM_MAX_QUEUE", "16")),
+        timeout=float(os.getenv("LLM_TIMEOUT", "20")),
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_after=float(os.getenv("LLM_BREAKER_RESET", "30")),
+    )
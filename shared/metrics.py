@@ -0,0 +1,341 @@
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from psycopg2 import extensions
+
+# Send a Server-Timing header (db, pool, json, total) on every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes", "on")
+# Bearer token that lets non-local scrapers read /metrics (local requests never need it)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Label for queries run outside a request (listeners, background refreshes)
+BACKGROUND_ROUTE = "(background)"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ---------- Metric Types ----------
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = self._header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+# ---------- Registry ----------
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce a response (first byte for streams).",
+    ("method", "route"))
+REQUESTS = Counter("http_requests_total", "Responses sent, by status code.", ("method", "route", "status"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time spent in each execute/executemany/copy call.",
+    ("route",), QUERY_BUCKETS)
+QUERY_ROWS = Counter("db_rows_total", "Rows returned or affected by queries.", ("route",))
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Total query time per request.", ("route",), QUERY_BUCKETS)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Queries run per request.", ("route",), COUNT_BUCKETS)
+CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time to check a connection out of the pool (including connects).",
+    ("pool",), QUERY_BUCKETS)
+SERIALIZE_SECONDS = Histogram(
+    "http_response_serialize_seconds", "Time spent encoding JSON response bodies.",
+    ("route",), QUERY_BUCKETS)
+
+METRICS = (REQUEST_SECONDS, REQUESTS, IN_FLIGHT, QUERY_SECONDS, QUERY_ROWS,
+           REQUEST_DB_SECONDS, REQUEST_QUERIES, CHECKOUT_SECONDS, SERIALIZE_SECONDS)
+
+
+def current_route():
+    if not has_request_context():
+        return BACKGROUND_ROUTE
+    return request.url_rule.rule if request.url_rule is not None else "(unmatched)"
+
+
+def _request_timings():
+    """Per-request accumulator, or None outside a request."""
+    if not has_request_context():
+        return None
+    timings = g.get("_timings")
+    if timings is None:
+        timings = g._timings = {"db": 0.0, "queries": 0, "rows": 0, "pool": 0.0, "json": 0.0}
+    return timings
+
+
+def record_query(seconds, rows):
+    route = current_route()
+    QUERY_SECONDS.observe(seconds, route)
+    if rows > 0:
+        QUERY_ROWS.inc(route, amount=rows)
+    timings = _request_timings()
+    if timings is not None:
+        timings["db"] += seconds
+        timings["queries"] += 1
+        timings["rows"] += max(rows, 0)
+
+
+def record_serialization(seconds):
+    timings = _request_timings()
+    if timings is not None:
+        timings["json"] += seconds
+        SERIALIZE_SECONDS.observe(seconds, current_route())
+
+
+def checkout_observer(pool_name):
+    """Callback for ConnectionPool.on_checkout that records checkout time."""
+
+    def observe(seconds):
+        CHECKOUT_SECONDS.observe(seconds, pool_name)
+        timings = _request_timings()
+        if timings is not None:
+            timings["pool"] += seconds
+
+    return observe
+
+
+# ---------- Cursor Instrumentation ----------
+# Callables(cursor, query, vars, seconds) run after every timed statement (e.g. the slow-query log)
+_query_listeners = []
+
+
+def add_query_listener(listener):
+    _query_listeners.append(listener)
+
+
+def _finish(cursor, query, vars, started):
+    seconds = time.perf_counter() - started
+    record_query(seconds, cursor.rowcount)
+    for listener in _query_listeners:
+        listener(cursor, query, vars, seconds)
+
+
+class _TimedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _finish(self, query, vars, started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _finish(self, query, None, started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            _finish(self, sql, None, started)
+
+
+_timed_classes = {}
+_timed_lock = threading.Lock()
+
+
+def timed_cursor_class(factory):
+    """``factory`` with query timing mixed in (one subclass per cursor class)."""
+    if issubclass(factory, _TimedCursorMixin):
+        return factory
+    with _timed_lock:
+        cls = _timed_classes.get(factory)
+        if cls is None:
+            cls = _timed_classes[factory] = type("Timed" + factory.__name__, (_TimedCursorMixin, factory), {})
+    return cls
+
+
+class TimedConnection(extensions.connection):
+    """psycopg2 connection whose cursors, of any cursor_factory, time their queries.
+
+    Pass ``connection_factory=TimedConnection`` to create_pool().
+    """
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or extensions.cursor
+        kwargs["cursor_factory"] = timed_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+
+# ---------- Flask Integration ----------
+_pools = {}
+
+
+def instrument_pool(name, pool):
+    """Records checkout times for ``pool`` and adds its connection counts to /metrics."""
+    if pool is not None:
+        pool.on_checkout = checkout_observer(name)
+        _pools[name] = pool
+
+
+def _server_timing(timings, total):
+    entries = []
+    if timings is not None:
+        entries.append(f'db;dur={timings["db"] * 1000:.1f};desc="{timings["queries"]} queries, {timings["rows"]} rows"')
+        if timings["pool"]:
+            entries.append(f'pool;dur={timings["pool"] * 1000:.1f}')
+        if timings["json"]:
+            entries.append(f'json;dur={timings["json"] * 1000:.1f}')
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ", ".join(entries)
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    if _pools:
+        lines += ["# HELP db_pool_connections Pool connections by state.", "# TYPE db_pool_connections gauge"]
+        events = ["# HELP db_pool_events_total Pool checkout outcomes.", "# TYPE db_pool_events_total counter"]
+        for name, pool in _pools.items():
+            stats = pool.stats()
+            for state in ("size", "idle", "in_use", "max_size"):
+                lines.append(f'db_pool_connections{{pool="{name}",state="{state}"}} {stats[state]}')
+            for event in ("checkouts", "hits", "misses", "waits", "timeouts", "discarded"):
+                events.append(f'db_pool_events_total{{pool="{name}",event="{event}"}} {stats[event]}')
+        lines += events
+    return "\n".join(lines) + "\n"
+
+
+def metrics_allowed():
+    """Local requests, or ones carrying ``Authorization: Bearer <METRICS_TOKEN>``."""
+    if request.remote_addr in ("127.0.0.1", "::1"):
+        return True
+    if not METRICS_TOKEN:
+        return False
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+
+
+def install_metrics(app):
+    """Per-route latency, status and DB metrics for ``app``, served at /metrics.
+
+    Install it before other after_request hooks (compression, cookies) so the
+    measured time includes them. Query timings come from connections opened
+    with TimedConnection; pool checkout times from instrument_pool(). Route
+    names and pool sizes describe the deployment, so /metrics answers local
+    requests only unless METRICS_TOKEN is set (see metrics_allowed()).
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g._request_started = time.perf_counter()
+        g._in_flight = True
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("_request_started", None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        route = current_route()
+        REQUEST_SECONDS.observe(total, request.method, route)
+        REQUESTS.inc(request.method, route, str(response.status_code))
+        timings = g.get("_timings")
+        if timings is not None:
+            REQUEST_DB_SECONDS.observe(timings["db"], route)
+            REQUEST_QUERIES.observe(timings["queries"], route)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = _server_timing(timings, total)
+        return response
+
+    @app.teardown_request
+    def end_request(exc=None):
+        if g.pop("_in_flight", False):
+            IN_FLIGHT.dec()
+
+    @app.route("/metrics")
+    def metrics():
+        if not metrics_allowed():
+            return Response("metrics are only available locally or with METRICS_TOKEN\n",
+                            status=403, mimetype="text/plain")
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
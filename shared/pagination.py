@@ -0,0 +1,133 @@
+import base64
+import json
+import os
+from datetime import datetime, date, timedelta
+
+DEFAULT_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "500"))
+
+
+class BadPageRequest(ValueError):
+    """Raised for a malformed limit, cursor or filter value (answered with 400)."""
+
+
+# ---------- Cursors ----------
+# A cursor is the sort key of the last row on the previous page, base64 encoded
+# so clients treat it as opaque. The next page is the rows strictly after it.
+
+def _to_jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def encode_cursor(values):
+    raw = json.dumps([_to_jsonable(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, width):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise BadPageRequest("Invalid cursor")
+    if not isinstance(values, list) or len(values) != width:
+        raise BadPageRequest("Invalid cursor")
+    return values
+
+
+# ---------- Request Parsing ----------
+
+def parse_limit(args):
+    raw = args.get("limit")
+    if raw is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise BadPageRequest("limit must be an integer")
+    if limit < 1:
+        raise BadPageRequest("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+def parse_date_from(value):
+    """Inclusive lower bound; accepts YYYY-MM-DD or an ISO timestamp."""
+    return datetime.fromisoformat(value)
+
+def parse_date_to(value):
+    """Exclusive upper bound; a bare date covers that whole day."""
+    parsed = datetime.fromisoformat(value)
+    if len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def build_filters(args, spec):
+    """Turns query-string filters into SQL clauses using ``spec``.
+
+    ``spec`` maps a parameter name to ``(sql_fragment, parser)``, where the
+    fragment holds a single ``%s`` placeholder. Returns ``(clauses, params)``.
+    """
+    clauses, params = [], []
+    for name, (fragment, parser) in spec.items():
+        raw = args.get(name)
+        if raw in (None, ""):
+            continue
+        try:
+            params.append(parser(raw))
+        except ValueError:
+            raise BadPageRequest(f"Invalid value for {name}")
+        clauses.append(fragment)
+    return clauses, params
+
+
+# ---------- Keyset Pages ----------
+
+class KeysetPage:
+    """Builds one keyset-paginated query over ``sort_columns``.
+
+    ``sort_columns`` is a list of ``(sql_column, result_key)`` pairs ending in a
+    unique column so the ordering is total. All columns share one direction so
+    the row comparison can be served by a matching composite index.
+    """
+
+    def __init__(self, args, sort_columns, descending=False, filters=None):
+        self.sort_columns = sort_columns
+        self.descending = descending
+        self.limit = parse_limit(args)
+        self.clauses, self.params = build_filters(args, filters or {})
+        cursor = args.get("cursor")
+        if cursor:
+            values = decode_cursor(cursor, len(sort_columns))
+            columns = ", ".join(col for col, _ in sort_columns)
+            placeholders = ", ".join(["%s"] * len(sort_columns))
+            op = "<" if descending else ">"
+            self.clauses.append(f"({columns}) {op} ({placeholders})")
+            self.params.extend(values)
+
+    def where(self, prefix="WHERE"):
+        if not self.clauses:
+            return ""
+        return f"{prefix} " + " AND ".join(self.clauses)
+
+    def order_by(self):
+        direction = " DESC" if self.descending else ""
+        return "ORDER BY " + ", ".join(col + direction for col, _ in self.sort_columns)
+
+    def limit_clause(self):
+        # One extra row tells us whether another page exists
+        return "LIMIT %d" % (self.limit + 1)
+
+    def split(self, rows):
+        """Returns ``(page_rows, next_cursor)`` from rows fetched with limit_clause()."""
+        if len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        last = rows[-1]
+        return rows, encode_cursor([last[key] for _, key in self.sort_columns])
+
+
+def paginated_response(response, next_cursor):
+    """Adds the next-page cursor headers; the body stays a plain JSON array."""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor"
+    return response
@@ -0,0 +1,243 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+# bcrypt cost for new hashes; stored hashes with any other cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+# Stored for accounts created without a password (the clinic used to hash this per request)
+PLACEHOLDER_PASSWORD = "default"
+
+PasswordCheck = namedtuple("PasswordCheck", ["ok", "new_hash"])
+
+
+class HashingUnavailable(Exception):
+    """The hashing pool was full, did not answer in time, or lost a worker.
+
+    ``reason`` is 'busy', 'timeout' or 'unavailable'.
+    """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# ---------- Worker Functions ----------
+# Run in the pool's processes; each returns its result and the seconds spent hashing.
+
+def _hash(password, rounds):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    return hashed, time.perf_counter() - started
+
+def _verify(password, stored):
+    started = time.perf_counter()
+    try:
+        if is_bcrypt(stored):
+            ok = bcrypt.checkpw(password.encode("utf-8"), stored.encode("utf-8"))
+        else:
+            # Accounts created before hashing moved here use werkzeug's format
+            from werkzeug.security import check_password_hash
+            ok = check_password_hash(stored, password)
+    except ValueError:
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def is_bcrypt(stored):
+    return stored.startswith(("$2a$", "$2b$", "$2y$"))
+
+def bcrypt_rounds(stored):
+    """Cost factor of a bcrypt hash, or None for any other format."""
+    if not is_bcrypt(stored):
+        return None
+    try:
+        return int(stored[4:6])
+    except ValueError:
+        return None
+
+
+# ---------- Hashing Pool ----------
+class PasswordHasher:
+    """Runs password hashing and verification on a pool of worker processes.
+
+    Each hash costs hundreds of milliseconds of CPU, so they run in
+    ``workers`` separate processes instead of on the web worker's thread.
+    Up to ``max_queue`` more calls may wait; anything beyond is rejected
+    immediately with HashingUnavailable('busy'), a call that is not
+    answered within ``timeout`` seconds raises ('timeout') and one whose
+    worker died raises ('unavailable').
+    """
+
+    def __init__(self, workers=2, max_queue=32, timeout=10.0, rounds=BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.rounds = rounds
+        self._executor = None
+        self._placeholder = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._hash_seconds = deque(maxlen=1000)
+        self._wait_seconds = deque(maxlen=1000)
+        self._counters = {
+            "hashed": 0,
+            "verified": 0,
+            "upgraded": 0,
+            "rejected_busy": 0,
+            "timeouts": 0,
+        }
+
+    def _pool(self):
+        # Workers must not fork from the web process: by the first login it runs
+        # listener, gateway and request threads, and a child could inherit a held
+        # lock. forkserver forks them from a separate single-threaded server
+        # (which imports the app once, so each worker does not); spawn elsewhere.
+        if self._executor is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["__main__", "shared.passwords", "bcrypt", "werkzeug.security"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _broken(self, pool):
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        with self._lock:
+            if self._executor is pool:
+                self._executor = None
+        return HashingUnavailable("unavailable")
+
+    def _submit(self, fn, *args):
+        """Queues ``fn(*args)``; returns (future, pool, submitted_at) for _result()."""
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._counters["rejected_busy"] += 1
+                raise HashingUnavailable("busy")
+            self._pending += 1
+            try:
+                pool = self._pool()
+            except Exception:
+                self._pending -= 1
+                raise
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            raise self._broken(pool) from None
+        # The slot is held until the worker finishes, even if the caller stops waiting
+        future.add_done_callback(self._release)
+        return future, pool, time.perf_counter()
+
+    def _result(self, job):
+        future, pool, started = job
+        try:
+            result, hash_seconds = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise HashingUnavailable("timeout") from None
+        except BrokenProcessPool:
+            raise self._broken(pool) from None
+        with self._lock:
+            self._hash_seconds.append(hash_seconds)
+            self._wait_seconds.append(max(0.0, time.perf_counter() - started - hash_seconds))
+        return result
+
+    def _call(self, fn, *args):
+        return self._result(self._submit(fn, *args))
+
+    def hash(self, password):
+        """bcrypt hash of ``password`` at the configured cost."""
+        hashed = self._call(_hash, password, self.rounds)
+        with self._lock:
+            self._counters["hashed"] += 1
+        return hashed
+
+    def hash_many(self, passwords):
+        """Hashes of ``passwords``, in order, for batch jobs such as imports.
+
+        At most ``workers`` of them are queued at a time, so a long batch
+        shares the pool with logins instead of filling its queue.
+        """
+        hashes = []
+        for start in range(0, len(passwords), self.workers):
+            jobs = [self._submit(_hash, password, self.rounds)
+                    for password in passwords[start:start + self.workers]]
+            hashes.extend(self._result(job) for job in jobs)
+        with self._lock:
+            self._counters["hashed"] += len(hashes)
+        return hashes
+
+    def placeholder_hash(self):
+        """Hash stored for accounts created without a password (computed once per process)."""
+        if self._placeholder is None or bcrypt_rounds(self._placeholder) != self.rounds:
+            self._placeholder = self.hash(PLACEHOLDER_PASSWORD)
+        return self._placeholder
+
+    def needs_rehash(self, stored):
+        return bcrypt_rounds(stored) != self.rounds
+
+    def verify(self, password, stored):
+        """Checks ``password`` against ``stored``.
+
+        Returns PasswordCheck(ok, new_hash). ``new_hash`` is set when the
+        password matched but ``stored`` uses another format or cost; the
+        caller should save it so the account is upgraded.
+        """
+        if not password or not stored:
+            return PasswordCheck(False, None)
+        ok = self._call(_verify, password, stored)
+        with self._lock:
+            self._counters["verified"] += 1
+        if not ok or not self.needs_rehash(stored):
+            return PasswordCheck(ok, None)
+        new_hash = self.hash(password)
+        with self._lock:
+            self._counters["upgraded"] += 1
+        return PasswordCheck(True, new_hash)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._pending,
+                "bcrypt_rounds": self.rounds,
+            })
+            hash_seconds = sorted(self._hash_seconds)
+            wait_seconds = sorted(self._wait_seconds)
+
+        def summary(samples):
+            if not samples:
+                return {"samples": 0, "mean": None, "p50": None, "p95": None}
+            return {
+                "samples": len(samples),
+                "mean": round(sum(samples) / len(samples), 4),
+                "p50": round(samples[len(samples) // 2], 4),
+                "p95": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 4),
+            }
+
+        stats["hash_seconds"] = summary(hash_seconds)
+        stats["queue_wait_seconds"] = summary(wait_seconds)
+        return stats
+
+
+def create_password_hasher():
+    """Builds the hashing pool from the PASSWORD_* environment variables."""
+    return PasswordHasher(
+        workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+        max_queue=int(os.getenv("PASSWORD_HASH_QUEUE", "32")),
+        timeout=float(os.getenv("PASSWORD_HASH_TIMEOUT", "10")),
+    )
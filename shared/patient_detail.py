@@ -0,0 +1,77 @@
+import psycopg2.extensions
+from flask import Response
+
+# Part of every ETag; bump when the document's shape changes so clients refetch
+DETAIL_FORMAT_VERSION = 1
+
+# One statement builds the whole patient detail document in PostgreSQL and a
+# version for it. The version hashes the xmin (last writing transaction) of
+# every row the document is built from, so any insert, update or delete of the
+# patient, their appointments (and those appointments' doctors) or their
+# prescriptions changes it. When the client already holds that version the
+# document itself is never built.
+DETAIL_SQL = '''
+WITH pat AS (
+    SELECT p.* FROM patients p WHERE p.patient_id = %(patient_id)s
+), ver AS (
+    SELECT md5(concat_ws('|',
+        %(format)s::text,
+        (SELECT xmin::text FROM patients WHERE patient_id = %(patient_id)s),
+        (SELECT string_agg(a.appointment_id::text || ':' || a.xmin::text || ':' || d.xmin::text, ','
+                           ORDER BY a.appointment_id)
+         FROM appointments a JOIN doctors d ON a.doctor_id = d.doctor_id
+         WHERE a.patient_id = %(patient_id)s),
+        (SELECT string_agg(m.prescription_id::text || ':' || m.xmin::text, ',' ORDER BY m.prescription_id)
+         FROM prescriptions m WHERE m.patient_id = %(patient_id)s)
+    )) AS version
+)
+SELECT ver.version,
+       CASE WHEN ver.version = ANY(%(known)s) THEN NULL ELSE json_build_object(
+           'patient', (SELECT {patient_json} FROM pat p),
+           'appointments', COALESCE((
+               SELECT json_agg(to_jsonb(a) || jsonb_build_object(
+                          'doctor_first_name', d.first_name,
+                          'doctor_last_name', d.last_name,
+                          'specialization', d.specialization)
+                      ORDER BY a.appointment_date DESC)
+               FROM appointments a JOIN doctors d ON a.doctor_id = d.doctor_id
+               WHERE a.patient_id = %(patient_id)s
+           ), '[]'),
+           'medications', COALESCE((
+               SELECT json_agg(m ORDER BY m.created_at DESC)
+               FROM prescriptions m WHERE m.patient_id = %(patient_id)s
+           ), '[]')
+       )::text END AS detail
+FROM ver
+WHERE EXISTS (SELECT 1 FROM pat)
+'''
+
+
+def patient_detail_response(conn, patient_id, request, patient_json):
+    """Answers a patient detail GET in one round trip, with ETag / 304 support.
+
+    ``patient_json`` is the SQL expression (over alias ``p``) for the patient
+    object. Returns None when the patient does not exist.
+    """
+    # Weak matches count: the compression layer weakens the tag when it gzips the body
+    known = sorted(request.if_none_match.as_set(include_weak=True))
+    # Plain tuples, whatever cursor_factory the connection was opened with
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute(DETAIL_SQL.format(patient_json=patient_json), {
+            "patient_id": patient_id,
+            "format": DETAIL_FORMAT_VERSION,
+            "known": known,
+        })
+        row = cur.fetchone()
+    if row is None:
+        return None
+    version, detail = row
+    if detail is None:
+        response = Response(status=304)
+    else:
+        # Already JSON text from PostgreSQL; no parse and re-serialize here
+        response = Response(detail, mimetype="application/json")
+    response.set_etag(version)
+    # Browsers keep the copy but revalidate it on every use
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
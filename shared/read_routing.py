@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+from flask import g, has_request_context, request
+
+from shared.db_pool import create_pool
+
+# Set after a successful write; while it is valid this browser reads from the primary
+READ_PRIMARY_COOKIE = "sehat_read_primary"
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# Replica position: 0 when it has replayed everything it received, else the age of the last replayed commit
+REPLICA_LAG_SQL = """
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+"""
+
+
+class ReadRouter:
+    """Hands out connections for read-only queries, from a replica when it is safe.
+
+    Reads go to the replica pool unless the caller asks for the primary (the
+    client wrote something within the last ``sticky_seconds``), the replica
+    was more than ``max_lag`` seconds behind at its last check (re-checked
+    every ``lag_check_every`` seconds), or it could not be reached (then it is
+    left alone for ``retry_after`` seconds). Without a replica every read
+    uses the primary pool, exactly as before.
+    """
+
+    def __init__(self, primary, replica=None, sticky_seconds=5.0, max_lag=2.0,
+                 lag_check_every=5.0, retry_after=30.0):
+        self.primary = primary
+        self.replica = replica
+        self.sticky_seconds = sticky_seconds
+        self.max_lag = max_lag
+        self.lag_check_every = lag_check_every
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._lag = None
+        self._lag_checked_at = 0.0
+        self._counters = {
+            "replica_reads": 0,
+            "primary_reads": 0,
+            "sticky_reads": 0,
+            "lagging_reads": 0,
+            "replica_errors": 0,
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self._counters[key] += 1
+
+    def connection(self, primary=False):
+        """A pooled connection for reads; ``primary=True`` skips the replica."""
+        if self.replica is None:
+            self._count("primary_reads")
+            return self.primary.connection()
+        if primary:
+            self._count("sticky_reads")
+            return self.primary.connection()
+        now = time.monotonic()
+        with self._lock:
+            down = now < self._down_until
+            check_lag = now - self._lag_checked_at >= self.lag_check_every
+            lagging = self._lag is not None and self._lag > self.max_lag
+        if down or (lagging and not check_lag):
+            self._count("lagging_reads" if lagging else "primary_reads")
+            return self.primary.connection()
+
+        conn = None
+        try:
+            conn = self.replica.connection()
+            if check_lag:
+                with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                    cur.execute(REPLICA_LAG_SQL)
+                    lag = float(cur.fetchone()[0] or 0)
+                conn.rollback()
+                with self._lock:
+                    self._lag = lag
+                    self._lag_checked_at = now
+                if lag > self.max_lag:
+                    conn.close()
+                    self._count("lagging_reads")
+                    return self.primary.connection()
+        except psycopg2.Error as e:
+            if conn is not None:
+                conn.close()
+            print(f"⚠️ Read replica unavailable, using the primary for {self.retry_after:.0f}s: {e}")
+            with self._lock:
+                self._down_until = now + self.retry_after
+                self._counters["replica_errors"] += 1
+            self._count("primary_reads")
+            return self.primary.connection()
+        self._count("replica_reads")
+        return conn
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "replica_configured": self.replica is not None,
+                "replica_down": time.monotonic() < self._down_until,
+                "replica_lag_seconds": self._lag,
+                "max_lag_seconds": self.max_lag,
+                "sticky_seconds": self.sticky_seconds,
+            })
+        if self.replica is not None:
+            stats["replica_pool"] = self.replica.stats()
+        return stats
+
+
+def read_db_config(db_config):
+    """DB settings for the read replica from DB_READ_*, or None when DB_READ_HOST is unset.
+
+    Unset DB_READ_* values fall back to the primary's.
+    """
+    host = os.getenv("DB_READ_HOST")
+    if not host:
+        return None
+    return {
+        "dbname": os.getenv("DB_READ_NAME", db_config["dbname"]),
+        "user": os.getenv("DB_READ_USER", db_config["user"]),
+        "password": str(os.getenv("DB_READ_PASSWORD", db_config["password"])),
+        "host": host,
+        "port": os.getenv("DB_READ_PORT", db_config["port"]),
+    }
+
+
+def create_read_router(db_config, primary_pool, **connect_kwargs):
+    """Builds the router from the DB_READ_* environment variables."""
+    replica_config = read_db_config(db_config)
+    replica = None
+    if replica_config:
+        # Read-only sessions, so a write sent here by mistake fails instead of landing anywhere
+        replica = create_pool(replica_config, options="-c default_transaction_read_only=on", **connect_kwargs)
+    return ReadRouter(
+        primary_pool,
+        replica,
+        sticky_seconds=float(os.getenv("DB_READ_STICKY_SECONDS", "5")),
+        max_lag=float(os.getenv("DB_READ_MAX_LAG", "2")),
+        lag_check_every=float(os.getenv("DB_READ_LAG_CHECK", "5")),
+        retry_after=float(os.getenv("DB_READ_RETRY_AFTER", "30")),
+    )
+
+
+# ---------- Read-your-writes ----------
+def wrote_recently():
+    """True while the current client's read-your-writes cookie is valid."""
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def note_primary_checkout():
+    """Called when a request takes a primary connection; a write request that did is a write."""
+    if has_request_context() and request.method in WRITE_METHODS:
+        g.db_write = True
+
+
+def install_read_your_writes(app, router):
+    """Marks clients that just wrote so their next reads come from the primary."""
+
+    @app.after_request
+    def mark_recent_write(response):
+        if router.replica is not None and g.get("db_write") and response.status_code < 400:
+            until = time.time() + router.sticky_seconds
+            response.set_cookie(
+                READ_PRIMARY_COOKIE, f"{until:.3f}",
+                max_age=int(router.sticky_seconds) + 1, httponly=True, samesite="Lax"
+            )
+        return response
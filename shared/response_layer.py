@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import os
+import threading
+
+from flask import request
+
+from shared.cache import TTLCache
+
+try:
+    import brotli  # optional: `pip install brotli` adds Content-Encoding: br
+except ImportError:
+    brotli = None
+
+# Smaller bodies are sent as they are (compression would barely help)
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "500"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+# Cache lifetime for fingerprinted (?v=<content hash>) static URLs
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", str(365 * 24 * 3600)))
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/x-javascript", "image/svg+xml",
+)
+
+
+def _compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress(data, encoding, best=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else COMPRESS_LEVEL, mtime=0)
+
+
+# ---------- Static Fingerprints ----------
+class StaticVersions:
+    """Content hash per static file, re-read only when the file's mtime changes."""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._versions = {}  # filename -> (mtime, hash)
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._versions.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "rb") as f:
+            version = hashlib.md5(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._versions[filename] = (mtime, version)
+        return version
+
+
+# ---------- Response Layer ----------
+def install_response_layer(app):
+    """Adds compression, validators and long-lived static caching to ``app``.
+
+    - ``url_for('static', ...)`` gets a ``v=<content hash>`` parameter, and
+      static files requested with the current hash are cacheable for
+      STATIC_MAX_AGE seconds (any edit changes the URL). Other static requests
+      revalidate with the ETag/Last-Modified Flask already sends.
+    - Buffered GET responses without an ETag get one from their body, so an
+      unchanged page or API result is answered with 304.
+    - Text, JSON, JS and SVG bodies of at least COMPRESS_MIN_SIZE bytes are
+      gzip (or brotli, if installed) compressed when the client accepts it.
+      Compressed static files are kept in memory per ETag.
+    Streamed responses (SSE, ?stream=) are left alone.
+    """
+    versions = StaticVersions(app.static_folder)
+    compressed_static = TTLCache(ttl=24 * 3600, maxsize=256)
+
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            version = versions.get(values["filename"])
+            if version:
+                values["v"] = version
+
+    @app.after_request
+    def compress_and_validate(response):
+        is_static = request.endpoint == "static"
+        if is_static and response.status_code == 200:
+            version = request.args.get("v")
+            if version and version == versions.get(request.view_args.get("filename", "")):
+                response.cache_control.public = True
+                response.cache_control.max_age = STATIC_MAX_AGE
+                response.cache_control.immutable = True
+                response.cache_control.no_cache = None
+            else:
+                response.cache_control.no_cache = True
+
+        if (request.method not in ("GET", "POST", "PUT", "PATCH", "DELETE")
+                or response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+                or "Content-Encoding" in response.headers
+                or not _compressible(response.mimetype)):
+            return response
+        if response.is_streamed and not (is_static and response.direct_passthrough):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if is_static:
+            # send_file hands over a file wrapper; these files are small, so read them in
+            response.direct_passthrough = False
+        data = response.get_data()
+
+        etag, weak = response.get_etag()
+        if request.method == "GET" and etag is None:
+            etag = hashlib.md5(data).hexdigest()
+            response.set_etag(etag, weak=True)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        encoding = _choose_encoding()
+        if encoding is None or len(data) < COMPRESS_MIN_SIZE:
+            return response
+
+        if is_static and etag:
+            body = compressed_static.get((etag, encoding))
+            if body is None:
+                body = _compress(data, encoding, best=True)
+                compressed_static.set((etag, encoding), body)
+        else:
+            body = _compress(data, encoding)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            # The compressed bytes differ from the original, so the validator can only be weak
+            response.set_etag(etag, weak=True)
+        return response
+
+    return versions
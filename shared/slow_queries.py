@@ -0,0 +1,249 @@
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import psycopg2
+
+from shared.metrics import add_query_listener, current_route
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%(?:\([^)]+\))?s")
+_WHITESPACE = re.compile(r"\s+")
+# EXPLAIN ANALYZE runs the statement again, so only plain reads are explained
+_READ_ONLY = re.compile(r"^\s*(?:select|with)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(?:insert|update|delete|merge|for\s+(?:no\s+key\s+)?update|for\s+(?:key\s+)?share|pg_notify|nextval|setval)\b",
+                     re.IGNORECASE)
+
+
+def _sql_text(cursor, query):
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    if hasattr(query, "as_string"):
+        try:
+            return query.as_string(cursor)
+        except (psycopg2.Error, TypeError):
+            return str(query)
+    return str(query)
+
+
+def normalize_sql(sql):
+    """SQL with literals and placeholders replaced by ``?`` and whitespace collapsed."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def _shape(value):
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def params_shape(vars):
+    """Types of the query parameters, never their values (they may be patient data)."""
+    if vars is None:
+        return None
+    if isinstance(vars, dict):
+        return {key: _shape(value) for key, value in vars.items()}
+    return [_shape(value) for value in vars]
+
+
+# ---------- Slow Query Log ----------
+class SlowQueryLog:
+    """Keeps the last ``size`` statements slower than ``threshold`` seconds.
+
+    Each one is printed and stored with its normalized SQL, parameter types,
+    duration and route. A sample (``explain_sample``) of slow reads, at most
+    one per statement every ``explain_interval`` seconds, is re-run as
+    ``EXPLAIN (ANALYZE, BUFFERS)`` on a background thread, in a read-only
+    transaction limited to ``explain_timeout`` seconds; the plan is attached
+    to the entry when it arrives.
+
+    ``targets`` maps a name ("primary", "replica") to DB settings. A plan is
+    taken on the target whose host, port and database the query ran on, over
+    one connection per target that the worker opens itself, so it never
+    takes a connection from the request pools.
+    """
+
+    def __init__(self, targets=None, threshold=0.2, size=200, explain_sample=0.2,
+                 explain_interval=300.0, explain_timeout=5.0, explain_queue=8):
+        self.targets = {name: config for name, config in (targets or {}).items() if config}
+        self._connections = {}  # target name -> the worker's own connection
+        self.threshold = threshold
+        self.explain_sample = explain_sample
+        self.explain_interval = explain_interval
+        self.explain_timeout = explain_timeout
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._last_explained = {}  # normalized sql -> monotonic time of the last EXPLAIN
+        self._queue = queue.Queue(maxsize=explain_queue)
+        self._worker = None
+        self._counters = {
+            "slow_queries": 0,
+            "explains_queued": 0,
+            "explains_captured": 0,
+            "explains_failed": 0,
+            "explains_dropped": 0,
+        }
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def observe(self, cursor, query, vars, seconds):
+        """Query listener: records ``query`` if it took at least the threshold."""
+        if seconds < self.threshold:
+            return
+        sql = _sql_text(cursor, query)
+        if sql.lstrip()[:7].upper() == "EXPLAIN":
+            return
+        normalized = normalize_sql(sql)
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "duration_ms": round(seconds * 1000, 1),
+            "route": current_route(),
+            "sql": normalized,
+            "params": params_shape(vars),
+            "rows": cursor.rowcount,
+            "target": self._target(cursor),
+            "plan": None,
+            "plan_status": "not sampled",
+        }
+        print(f"🐢 Slow query ({entry['duration_ms']:.0f} ms, {entry['route']}): {normalized[:300]}")
+
+        explain = None
+        if entry["target"] is not None and self._should_explain(sql, normalized):
+            try:
+                explain = cursor.mogrify(query, vars)
+            except (psycopg2.Error, TypeError, ValueError) as e:
+                entry["plan_status"] = f"not explained: {e}"
+        with self._lock:
+            self._counters["slow_queries"] += 1
+            self._entries.append(entry)
+        if explain is not None:
+            self._enqueue(entry, explain)
+
+    def _target(self, cursor):
+        """Name of the target ``cursor`` is connected to, or None if it is none of them."""
+        try:
+            info = cursor.connection.info
+            where = (info.host, str(info.port), info.dbname)
+        except (AttributeError, psycopg2.Error):
+            return None
+        for name, config in self.targets.items():
+            if (config["host"], str(config["port"]), config["dbname"]) == where:
+                return name
+        return None
+
+    def _should_explain(self, sql, normalized):
+        if not _READ_ONLY.match(sql) or _WRITES.search(sql):
+            return False
+        if random.random() >= self.explain_sample:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_explained.get(normalized)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            if len(self._last_explained) >= 1000:
+                self._last_explained.clear()
+            self._last_explained[normalized] = now
+        return True
+
+    def _enqueue(self, entry, statement):
+        try:
+            self._queue.put_nowait((entry, statement))
+        except queue.Full:
+            with self._lock:
+                entry["plan_status"] = "dropped (explain queue full)"
+                self._counters["explains_dropped"] += 1
+            return
+        with self._lock:
+            entry["plan_status"] = "pending"
+            self._counters["explains_queued"] += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            entry, statement = self._queue.get()
+            try:
+                plan = self._explain(entry["target"], statement)
+            except Exception as e:
+                # Not only psycopg2 errors: any exception escaping here would end the
+                # thread and leave every later entry pending
+                with self._lock:
+                    entry["plan_status"] = f"failed: {str(e).strip()}"
+                    self._counters["explains_failed"] += 1
+                continue
+            with self._lock:
+                entry["plan"] = plan
+                entry["plan_status"] = "captured"
+                self._counters["explains_captured"] += 1
+
+    def _connection(self, target):
+        conn = self._connections.get(target)
+        if conn is None or conn.closed:
+            conn = self._connections[target] = psycopg2.connect(
+                **self.targets[target], connect_timeout=int(self.explain_timeout) + 1)
+        return conn
+
+    def _explain(self, target, statement):
+        conn = self._connection(target)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION READ ONLY")
+                cur.execute("SELECT set_config('statement_timeout', %s, true)",
+                            (f"{int(self.explain_timeout * 1000)}ms",))
+                cur.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + statement)
+                return "\n".join(row[0] for row in cur.fetchall())
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # Reconnect for the next plan rather than reuse a broken connection
+            conn.close()
+            raise
+        finally:
+            if not conn.closed:
+                conn.rollback()
+
+    def entries(self):
+        """Logged statements, newest first."""
+        with self._lock:
+            return [dict(entry) for entry in reversed(self._entries)]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "threshold_ms": self.threshold * 1000,
+                "logged": len(self._entries),
+                "explain_sample": self.explain_sample,
+                "explain_interval_seconds": self.explain_interval,
+            })
+        return stats
+
+
+def create_slow_query_log(db_config, replica_config=None):
+    """Builds the log from the SLOW_QUERY_* environment variables and starts listening.
+
+    Plans for replica queries are taken on ``replica_config`` (see
+    read_db_config()). SLOW_QUERY_MS=0 turns it off.
+    """
+    log = SlowQueryLog(
+        {"primary": db_config, "replica": replica_config},
+        threshold=float(os.getenv("SLOW_QUERY_MS", "200")) / 1000,
+        size=int(os.getenv("SLOW_QUERY_LOG_SIZE", "200")),
+        explain_sample=float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.2")),
+        explain_interval=float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300")),
+        explain_timeout=float(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT", "5")),
+    )
+    if log.enabled:
+        add_query_listener(log.observe)
+    return log
@@ -0,0 +1,75 @@
+import os
+import uuid
+
+from flask import Response
+
+from shared.json_provider import dumps
+from shared.pagination import BadPageRequest
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+STREAM_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _encode(row):
+    return dumps(row)
+
+
+def requested_stream_format(args):
+    """Returns 'json' or 'ndjson' when ?stream= asks for a streamed body, else None."""
+    fmt = args.get("stream")
+    if not fmt:
+        return None
+    if fmt not in STREAM_FORMATS:
+        raise BadPageRequest(f"stream must be one of: {', '.join(STREAM_FORMATS)}")
+    return fmt
+
+
+def stream_query(conn, sql, params=None, fmt="json", batch_size=None, transform=None):
+    """Runs ``sql`` on a server-side cursor and streams the rows as they are fetched.
+
+    Only ``batch_size`` rows are held in memory at a time. ``fmt`` is 'json'
+    (one chunked array) or 'ndjson' (one object per line). The query runs and
+    the first batch is fetched before returning, so errors still surface as a
+    normal exception the caller can turn into a 500. From then on the
+    generator owns ``conn`` and closes it (returning it to the pool) when done.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+    cur.itersize = batch_size
+    try:
+        cur.execute(sql, params)
+        batch = cur.fetchmany(batch_size)
+    except Exception:
+        cur.close()
+        raise
+
+    def generate():
+        try:
+            first = True
+            if fmt == "json":
+                yield "["
+            current = batch
+            while current:
+                rows = [_encode(transform(r) if transform else r) for r in current]
+                if fmt == "json":
+                    yield ("" if first else ",") + ",".join(rows)
+                else:
+                    yield "\n".join(rows) + "\n"
+                first = False
+                current = cur.fetchmany(batch_size)
+            if fmt == "json":
+                yield "]"
+        except Exception as e:
+            # Headers are already sent, so all we can do is cut the body short
+            print(f"Error while streaming rows: {e}")
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+            conn.close()
+
+    return Response(generate(), mimetype=STREAM_FORMATS[fmt])
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The apps import the shared helpers from the repository root the same way
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,68 @@
+from datetime import date, datetime, timedelta
+
+from shared.availability import AvailabilityIndex
+
+DOCTOR = {
+    "doctor_id": 1, "first_name": "Ayesha", "last_name": "Khan", "specialization": "Cardiology",
+    "available_days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+    "available_hours": {"start": "09:00", "end": "11:00"},
+}
+
+
+class FakeCursor:
+    def __init__(self, appointments, queries):
+        self.appointments = appointments
+        self.queries = queries
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+        self.rows = [DOCTOR] if "FROM doctors" in sql else self.appointments
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, appointments, queries):
+        self.appointments = appointments
+        self.queries = queries
+
+    def cursor(self):
+        return FakeCursor(self.appointments, self.queries)
+
+    def close(self):
+        pass
+
+
+def make_index(appointments=()):
+    queries = []
+    index = AvailabilityIndex(lambda: FakeConnection(list(appointments), queries))
+    return index, queries
+
+
+def tomorrow_at(hour, minute=0):
+    return datetime.combine(date.today() + timedelta(days=1), datetime.min.time()).replace(hour=hour, minute=minute)
+
+
+def test_reload_counts_null_status_as_booked():
+    # Matches the appointments_no_double_booking predicate, so NULL-status rows are loaded
+    index, queries = make_index([{"appointment_id": 7, "doctor_id": 1, "appointment_date": tomorrow_at(9)}])
+    assert not index.is_free(1, tomorrow_at(9))
+    appointment_query = next(q for q in queries if "FROM appointments" in q)
+    assert "COALESCE(status, 'scheduled') <> 'cancelled'" in appointment_query
+
+
+def test_apply_treats_null_status_as_scheduled():
+    index, _ = make_index()
+    assert index.is_free(1, tomorrow_at(10))
+    index.apply(8, 1, tomorrow_at(10), None)
+    assert not index.is_free(1, tomorrow_at(10))
+    index.apply(8, 1, tomorrow_at(10), "cancelled")
+    assert index.is_free(1, tomorrow_at(10))
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from shared.intents import IntentRouter
+
+FAQ_PATH = os.path.join(os.path.dirname(__file__), "..", "patient_side", "chat_faq.json")
+
+
+@pytest.fixture
+def router():
+    return IntentRouter.from_file(FAQ_PATH)
+
+
+@pytest.mark.parametrize("message", [
+    "I need to see a doctor about chest pain",
+    "book an appointment, I can't breathe properly",
+    "I need to see a doctor, my cut won't stop bleeding",
+    "my father is unconscious, I need to see a doctor",
+    "medicine reminder, I think I took an overdose",
+])
+def test_red_flag_messages_go_to_the_model(router, message):
+    assert router.match(message) is None
+    assert router.stats()["red_flags"] == 1
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("I need to see a doctor", "book_appointment"),
+    ("show my appointments", "view_appointments"),
+    ("set a medication reminder", "set_reminder"),
+])
+def test_navigation_messages_are_answered_locally(router, message, intent):
+    match = router.match(message)
+    assert match is not None and match.id == intent